@@ -1,15 +1,163 @@
 import { NextResponse } from 'next/server';
-import { connectToDatabase } from '@/lib/db';
-import { generateBarcode, generateBarcodeBase64, generateUniqueCode } from '@/lib/barcode';
-import { generateA4Invoice, generateThermalInvoice } from '@/lib/pdf';
+import { connectToDatabase, getDbPoolStats, withTransaction } from '@/lib/db';
+import {
+  BARCODE_FORMATS,
+  BARCODE_HEIGHT_RANGE,
+  BARCODE_SCALE_RANGE,
+  InvalidBarcodeError,
+  generateUniqueCode,
+  getBarcode,
+  prerenderBarcode,
+} from '@/lib/barcode';
+import { generateLabelSheet, streamInvoicePdf } from '@/lib/pdf';
+import { EXPORT_FORMATS, invoiceExportStream } from '@/lib/export';
+import { MAX_ZIP_ENTRIES } from '@/lib/zip';
+import { clearPdfCache, getCachedPdf, pdfCacheKey, setCachedPdf } from '@/lib/pdf-cache';
+import { PdfPoolBusyError, assertPdfCapacity, getPdfPoolStats } from '@/lib/pdf-pool';
+import { buildSearchKeys, buildSearchPipeline, isSearchQuery, paginateSearchResults } from '@/lib/search';
+import { afterDateIdCursor, decodeCursor, encodeCursor, parseLimit } from '@/lib/pagination';
+import {
+  EMPTY_TOTALS,
+  GROUP_BY_OPTIONS,
+  REPORT_TIMEZONE,
+  buildSalesPipeline,
+  dateRangeFilter,
+  parseReportDate,
+} from '@/lib/reports';
+import { getScanIndexStats, indexProduct, lookupBarcode, refreshStock, unindexProduct } from '@/lib/scan-index';
+import { DEFAULT_SHOP_INFO, getShopInfo, invalidateShopInfo } from '@/lib/settings';
+import { DAILY_SALES, localDay, rebuildDailySales, recordDailySales, recordDailySalesMany } from '@/lib/rollups';
+import {
+  StockConflictError,
+  aggregateStockLines,
+  decrementStock,
+  describeShortages,
+  planStockAllocation,
+  readStock,
+  restoreStock,
+} from '@/lib/stock';
+import { buildProductDelta, recordProductDeletion } from '@/lib/sync';
+import { recordCustomerVisits } from '@/lib/customers';
+import { PRODUCT_FILE_FORMATS, importProducts, productExportStream } from '@/lib/product-import';
+import { getProductSummary, isProductListQuery, listProducts, parseProductListParams } from '@/lib/inventory';
+import { renderMetrics, span, startSpan, withRequestMetrics } from '@/lib/metrics';
+import {
+  STOCK_MOVEMENTS,
+  ensureSnapshotsCurrent,
+  parseStockDay,
+  recordStockMovements,
+  saleMovements,
+  stockMovement,
+  stockMovementReport,
+  stockOnDate,
+} from '@/lib/ledger';
+import { fromPaise, priceLines, validatePricing } from '@/lib/pricing.mjs';
+import { buildWhatsappLink, getRecentWhatsappLink, rememberWhatsappLink } from '@/lib/whatsapp';
 import { v4 as uuidv4 } from 'uuid';
 
+// Invoice PDF routes and the template/disposition each one serves
+const PDF_TEMPLATES = {
+  'pdf-a4': { template: 'a4', disposition: 'attachment' },
+  'pdf-thermal': { template: 'thermal', disposition: 'inline' },
+};
+
+// Invoice list rows leave out line items; the count is enough for the table.
+const INVOICE_LIST_PROJECTION = {
+  id: 1,
+  date: 1,
+  customer: 1,
+  discountPercent: 1,
+  gstPercent: 1,
+  subTotal: 1,
+  grandTotal: 1,
+  paymentMode: 1,
+  itemCount: { $size: { $ifNull: ['$items', []] } },
+};
+
+// Upper bound on POST /api/invoices/batch, which runs as one transaction.
+const MAX_INVOICES_PER_BATCH = 500;
+
+// Allowed clock skew for sale times reported by clients.
+const MAX_CLIENT_CLOCK_SKEW_MS = 5 * 60 * 1000;
+
+// How old a replayed offline sale may be and still keep its own date. Older
+// ones are dated on arrival rather than reopening long-closed days.
+const MAX_OFFLINE_AGE_MS = parseInt(process.env.MAX_OFFLINE_AGE_MS || String(7 * 24 * 60 * 60 * 1000), 10);
+
+// Invoices are dated by the server, except sales replayed from the offline
+// outbox (POST /api/invoices/batch), which keep the time they were rung up so
+// they land on the right day in reports.
+function saleDate(body, { offline = false } = {}) {
+  const now = Date.now();
+  const reported = offline ? parseReportDate(body.date) : null;
+  if (reported && reported.getTime() <= now + MAX_CLIENT_CLOCK_SKEW_MS && reported.getTime() >= now - MAX_OFFLINE_AGE_MS) {
+    return new Date(Math.min(reported.getTime(), now)).toISOString();
+  }
+  return new Date(now).toISOString();
+}
+
+// Totals are priced here from the lines; subTotal and grandTotal sent by the
+// client are ignored. Call validatePricing(body) first.
+function buildInvoice(body, idempotencyKey, { offline = false } = {}) {
+  const discountPercent = Number(body.discountPercent || 0);
+  const gstPercent = Number(body.gstPercent || 0);
+  const items = body.items.map((item) => ({ ...item, price: Number(item.price) }));
+  const totals = priceLines(items, discountPercent, gstPercent);
+  const invoice = {
+    id: uuidv4(),
+    date: saleDate(body, { offline }),
+    customer: body.customer,
+    discountPercent,
+    gstPercent,
+    items,
+    subTotal: fromPaise(totals.subTotal),
+    grandTotal: fromPaise(totals.grandTotal),
+    paymentMode: body.paymentMode || 'Cash' // Add payment mode
+  };
+  if (idempotencyKey) invoice.idempotencyKey = idempotencyKey;
+  return invoice;
+}
+
+// The share message is rendered once, at creation, and stored with the bill.
+async function attachWhatsappLink(invoice) {
+  if (!invoice.customer?.whatsapp) return;
+  invoice.whatsappLink = buildWhatsappLink(invoice, await getShopInfo());
+}
+
+// Lines carry their category so rollups can be broken down by it; older
+// clients do not send one, so fill the gaps from the products.
+async function fillItemCategories(products, items) {
+  const uncategorized = items.filter(item => item.productId && !item.category);
+  if (uncategorized.length === 0) return;
+
+  const categories = await products
+    .find({ id: { $in: [...new Set(uncategorized.map(item => item.productId))] } }, { projection: { id: 1, category: 1 } })
+    .toArray();
+  const categoryById = new Map(categories.map(product => [product.id, product.category]));
+  for (const item of uncategorized) {
+    item.category = categoryById.get(item.productId) || 'General';
+  }
+}
+
 // Helper function to get collection
 async function getCollection(collectionName) {
   const { db } = await connectToDatabase();
   return db.collection(collectionName);
 }
 
+// Serves a cached barcode PNG, answering revalidations with 304.
+function barcodeResponse(request, { png, etag }) {
+  const headers = {
+    'Content-Type': 'image/png',
+    'Cache-Control': 'public, max-age=31536000, immutable',
+    ETag: etag,
+  };
+  if (request.headers.get('if-none-match') === etag) {
+    return new NextResponse(null, { status: 304, headers });
+  }
+  return new NextResponse(png, { headers });
+}
+
 // Product APIs
 async function handleProducts(request, method, segments) {
   const products = await getCollection('products');
@@ -20,21 +168,38 @@ async function handleProducts(request, method, segments) {
     const query = searchParams.get('query');
     const barcode = searchParams.get('barcode');
 
-    let filter = {};
-    if (query) {
-      filter = {
-        $or: [
-          { name: { $regex: query, $options: 'i' } },
-          { code: { $regex: query, $options: 'i' } },
-          { category: { $regex: query, $options: 'i' } }
-        ]
-      };
-    }
     if (barcode) {
-      filter = { barcode };
+      const productList = await products
+        .find({ barcode }, { projection: { searchKeys: 0 } })
+        .toArray();
+      return NextResponse.json(productList);
+    }
+
+    const hasQuery = isSearchQuery(query);
+    if (hasQuery || isProductListQuery(searchParams)) {
+      const { filter, sort, error } = parseProductListParams(searchParams);
+      if (error) {
+        return NextResponse.json({ error }, { status: 400 });
+      }
+      const limit = parseLimit(searchParams.get('limit'), 50, 200);
+      const cursor = searchParams.get('cursor');
+
+      let page;
+      if (hasQuery) {
+        const rows = await span('search', () => products
+          .aggregate(buildSearchPipeline(query, { limit, cursor, filter }))
+          .toArray());
+        page = paginateSearchResults(rows, limit);
+      } else {
+        page = await span('list', () => listProducts(products, { filter, sort, limit, cursor }));
+      }
+
+      const headers = {};
+      if (page.nextCursor) headers['X-Next-Cursor'] = page.nextCursor;
+      return NextResponse.json(page.items, { headers });
     }
 
-    const productList = await products.find(filter).toArray();
+    const productList = await products.find({}, { projection: { searchKeys: 0 } }).toArray();
     return NextResponse.json(productList);
   }
 
@@ -55,33 +220,136 @@ async function handleProducts(request, method, segments) {
       barcode,
       createdAt: new Date().toISOString()
     };
-
-    await products.insertOne(newProduct);
+    newProduct.updatedAt = newProduct.createdAt;
+
+    const { db } = await connectToDatabase();
+    await withTransaction(async (session) => {
+      await products.insertOne({ ...newProduct, searchKeys: buildSearchKeys(newProduct) }, { session: session || undefined });
+      await recordStockMovements(db, [stockMovement(newProduct.id, 'restock', newProduct.stock, { date: newProduct.createdAt })], session);
+    });
+    prerenderBarcode(barcode);
+    indexProduct(newProduct);
     return NextResponse.json(newProduct, { status: 201 });
   }
 
+  // GET /api/products/sync?since=<token> - Changes for the offline snapshot
+  if (method === 'GET' && segments.length === 1 && segments[0] === 'sync') {
+    const { searchParams } = new URL(request.url);
+    const { db } = await connectToDatabase();
+    const delta = await buildProductDelta(db, searchParams.get('since'));
+    return NextResponse.json(delta, { headers: { 'Cache-Control': 'no-store' } });
+  }
+
+  // GET /api/products/summary - Category counts and low/out-of-stock totals
+  if (method === 'GET' && segments.length === 1 && segments[0] === 'summary') {
+    const summary = await getProductSummary(products);
+    return NextResponse.json(summary);
+  }
+
+  // POST /api/products/import?format=csv|ndjson - Bulk import; streams NDJSON progress back
+  if (method === 'POST' && segments.length === 1 && segments[0] === 'import') {
+    const { searchParams } = new URL(request.url);
+    const contentType = request.headers.get('content-type') || '';
+    const format = searchParams.get('format') || (/ndjson|json/.test(contentType) ? 'ndjson' : 'csv');
+    if (!PRODUCT_FILE_FORMATS[format]) {
+      return NextResponse.json({ error: 'format must be csv or ndjson' }, { status: 400 });
+    }
+    if (!request.body) {
+      return NextResponse.json({ error: 'Request body is empty' }, { status: 400 });
+    }
+
+    const { db } = await connectToDatabase();
+    const events = importProducts(db, request.body, format, {
+      onInserted: async (inserted) => {
+        inserted.forEach(indexProduct);
+        await recordStockMovements(db, inserted.map((product) => stockMovement(product.id, 'restock', product.stock, { date: product.createdAt })));
+      },
+    });
+    const encoder = new TextEncoder();
+    const stream = new ReadableStream({
+      async pull(controller) {
+        try {
+          const { value, done } = await events.next();
+          if (done) {
+            controller.close();
+            return;
+          }
+          controller.enqueue(encoder.encode(`${JSON.stringify(value)}\n`));
+        } catch (error) {
+          console.error('Product import error:', error);
+          controller.enqueue(encoder.encode(`${JSON.stringify({ type: 'failed', error: error.message })}\n`));
+          controller.close();
+        }
+      },
+      cancel() {
+        return events.return();
+      },
+    });
+    return new NextResponse(stream, { headers: { 'Content-Type': 'application/x-ndjson', 'Cache-Control': 'no-store' } });
+  }
+
+  // GET /api/products/export?format=csv|ndjson
+  if (method === 'GET' && segments.length === 1 && segments[0] === 'export') {
+    const { searchParams } = new URL(request.url);
+    const format = searchParams.get('format') || 'csv';
+    if (!PRODUCT_FILE_FORMATS[format]) {
+      return NextResponse.json({ error: 'format must be csv or ndjson' }, { status: 400 });
+    }
+
+    const { db } = await connectToDatabase();
+    const { contentType, extension } = PRODUCT_FILE_FORMATS[format];
+    return new NextResponse(productExportStream(db, format), {
+      headers: {
+        'Content-Type': contentType,
+        'Content-Disposition': `attachment; filename="products.${extension}"`,
+        'Cache-Control': 'no-store',
+      },
+    });
+  }
+
+  // GET /api/products/:id/movements?limit=&cursor= - Stock ledger, newest first
+  if (method === 'GET' && segments.length === 2 && segments[1] === 'movements') {
+    const id = segments[0];
+    const { searchParams } = new URL(request.url);
+    const filter = { productId: id };
+    const after = decodeCursor(searchParams.get('cursor'));
+    if (after) {
+      Object.assign(filter, afterDateIdCursor(after));
+    }
+
+    const limit = parseLimit(searchParams.get('limit'), 50, 200);
+    const movements = await getCollection(STOCK_MOVEMENTS);
+    const rows = await movements
+      .find(filter, { projection: { _id: 0 } })
+      .sort({ date: -1, id: -1 })
+      .limit(limit + 1)
+      .toArray();
+
+    const movementList = rows.slice(0, limit);
+    const headers = {};
+    if (rows.length > limit) {
+      const last = movementList[movementList.length - 1];
+      headers['X-Next-Cursor'] = encodeCursor({ d: last.date, i: last.id });
+    }
+    return NextResponse.json(movementList, { headers });
+  }
+
   // GET /api/products/:id
   if (method === 'GET' && segments.length >= 1) {
     const id = segments[0];
     
     // Check for barcode endpoints
     if (segments.length === 2 && segments[1] === 'barcode') {
-      const product = await products.findOne({ id });
+      const product = await products.findOne({ id }, { projection: { barcode: 1 } });
       if (!product) {
         return NextResponse.json({ error: 'Product not found' }, { status: 404 });
       }
 
-      const png = await generateBarcode(product.barcode);
-      return new NextResponse(png, {
-        headers: {
-          'Content-Type': 'image/png',
-          'Cache-Control': 'public, max-age=31536000',
-        },
-      });
+      return barcodeResponse(request, await span('barcode', () => getBarcode(product.barcode, { persist: true })));
     }
 
     // Get single product
-    const product = await products.findOne({ id });
+    const product = await products.findOne({ id }, { projection: { searchKeys: 0 } });
     if (!product) {
       return NextResponse.json({ error: 'Product not found' }, { status: 404 });
     }
@@ -93,36 +361,69 @@ async function handleProducts(request, method, segments) {
     const id = segments[0];
     const body = await request.json();
 
+    // Stock is only touched when the edit sends it
+    const setsStock = body.stock !== undefined;
+    if (setsStock && !(Number.isInteger(body.stock) && body.stock >= 0)) {
+      return NextResponse.json({ error: 'stock must be a whole number of 0 or more' }, { status: 400 });
+    }
+
+    const existing = await products.findOne({ id }, { projection: { code: 1 } });
+    if (!existing) {
+      return NextResponse.json({ error: 'Product not found' }, { status: 404 });
+    }
+
     const updateData = {
       name: body.name,
       category: body.category,
-      stock: body.stock,
       mrp: body.mrp,
       sellPrice: body.sellPrice,
+      updatedAt: new Date().toISOString(),
     };
-
-    const result = await products.updateOne(
-      { id },
-      { $set: updateData }
-    );
-
-    if (result.matchedCount === 0) {
+    if (setsStock) updateData.stock = body.stock;
+    updateData.searchKeys = buildSearchKeys({ ...updateData, code: existing.code });
+
+    // The change in stock goes to the ledger: a restock when it rises, an
+    // adjustment (count correction, breakage) when it falls
+    const { db } = await connectToDatabase();
+    const updated = await withTransaction(async (session) => {
+      const before = await products.findOneAndUpdate(
+        { id },
+        { $set: updateData },
+        { projection: { stock: 1 }, returnDocument: 'before', session: session || undefined }
+      );
+      if (!before) return null;
+
+      const delta = setsStock ? updateData.stock - (before.stock || 0) : 0;
+      await recordStockMovements(db, [
+        stockMovement(id, delta > 0 ? 'restock' : 'adjustment', delta, {
+          date: updateData.updatedAt,
+          ...(body.stockNote ? { note: String(body.stockNote) } : {}),
+        }),
+      ], session);
+      return products.findOne({ id }, { projection: { searchKeys: 0 }, session: session || undefined });
+    });
+
+    if (!updated) {
       return NextResponse.json({ error: 'Product not found' }, { status: 404 });
     }
 
-    const updated = await products.findOne({ id });
+    indexProduct(updated);
     return NextResponse.json(updated);
   }
 
   // DELETE /api/products/:id
   if (method === 'DELETE' && segments.length === 1) {
     const id = segments[0];
-    const result = await products.deleteOne({ id });
+    const deleted = await products.findOneAndDelete({ id }, { projection: { stock: 1 } });
 
-    if (result.deletedCount === 0) {
+    if (!deleted) {
       return NextResponse.json({ error: 'Product not found' }, { status: 404 });
     }
 
+    const { db } = await connectToDatabase();
+    await recordStockMovements(db, [stockMovement(id, 'adjustment', -(deleted.stock || 0), { note: 'Product deleted' })]);
+    await recordProductDeletion(db, id);
+    unindexProduct(id);
     return NextResponse.json({ success: true });
   }
 
@@ -134,185 +435,334 @@ async function handleInvoices(request, method, segments) {
   const invoices = await getCollection('invoices');
   const customers = await getCollection('customers');
 
-  // GET /api/invoices
+  // GET /api/invoices?from=&to=&whatsapp=&paymentMode=&minTotal=&maxTotal=&limit=&cursor=
   if (method === 'GET' && segments.length === 0) {
-    const invoiceList = await invoices.find({}).sort({ date: -1 }).toArray();
-    return NextResponse.json(invoiceList);
+    const { searchParams } = new URL(request.url);
+    const from = parseReportDate(searchParams.get('from'));
+    const to = parseReportDate(searchParams.get('to'));
+    if (from === undefined || to === undefined) {
+      return NextResponse.json({ error: 'from and to must be ISO 8601 dates' }, { status: 400 });
+    }
+
+    const filter = dateRangeFilter(from, to);
+    const whatsapp = searchParams.get('whatsapp');
+    const paymentMode = searchParams.get('paymentMode');
+    const minTotal = parseFloat(searchParams.get('minTotal'));
+    const maxTotal = parseFloat(searchParams.get('maxTotal'));
+    if (whatsapp) filter['customer.whatsapp'] = whatsapp;
+    if (paymentMode) filter.paymentMode = paymentMode;
+    if (!Number.isNaN(minTotal) || !Number.isNaN(maxTotal)) {
+      filter.grandTotal = {};
+      if (!Number.isNaN(minTotal)) filter.grandTotal.$gte = minTotal;
+      if (!Number.isNaN(maxTotal)) filter.grandTotal.$lte = maxTotal;
+    }
+
+    const after = decodeCursor(searchParams.get('cursor'));
+    if (after) {
+      Object.assign(filter, afterDateIdCursor(after));
+    }
+
+    const limit = parseLimit(searchParams.get('limit'), 50, 200);
+    const rows = await invoices
+      .find(filter, { projection: INVOICE_LIST_PROJECTION })
+      .sort({ date: -1, id: -1 })
+      .limit(limit + 1)
+      .toArray();
+
+    const invoiceList = rows.slice(0, limit);
+    const headers = {};
+    if (rows.length > limit) {
+      const last = invoiceList[invoiceList.length - 1];
+      headers['X-Next-Cursor'] = encodeCursor({ d: last.date, i: last.id });
+    }
+    return NextResponse.json(invoiceList, { headers });
   }
 
   // POST /api/invoices - Create new invoice
   if (method === 'POST' && segments.length === 0) {
     const body = await request.json();
-    
-    const invoice = {
-      id: uuidv4(),
-      date: new Date().toISOString(),
-      customer: body.customer,
-      discountPercent: body.discountPercent || 0,
-      gstPercent: body.gstPercent || 0,
-      items: body.items,
-      subTotal: body.subTotal,
-      grandTotal: body.grandTotal,
-      paymentMode: body.paymentMode || 'Cash' // Add payment mode
-    };
+    const pricingError = validatePricing(body);
+    if (pricingError) {
+      return NextResponse.json({ error: pricingError }, { status: 400 });
+    }
 
-    // Reduce stock for each item in the invoice
-    const products = await getCollection('products');
-    for (const item of invoice.items) {
-      if (item.productId) {
-        const product = await products.findOne({ id: item.productId });
-        if (product) {
-          const newStock = Math.max(0, product.stock - item.qty);
-          await products.updateOne(
-            { id: item.productId },
-            { $set: { stock: newStock } }
-          );
-        }
+    // Clients retrying a sale (e.g. replaying the offline outbox) send a key so
+    // the bill is created at most once; a repeat returns the original invoice.
+    const idempotencyKey = request.headers.get('idempotency-key') || body.idempotencyKey || null;
+    if (idempotencyKey) {
+      const existing = await invoices.findOne({ idempotencyKey });
+      if (existing) {
+        return NextResponse.json({ invoice: existing, whatsappLink: existing.whatsappLink || null, replayed: true });
       }
     }
 
-    await invoices.insertOne(invoice);
+    const invoice = buildInvoice(body, idempotencyKey);
+    await span('whatsapp', () => attachWhatsappLink(invoice));
 
-    // Save customer if provided
-    if (body.customer?.name && body.customer?.whatsapp) {
-      const existingCustomer = await customers.findOne({ 
-        whatsapp: body.customer.whatsapp 
-      });
-      
-      if (!existingCustomer) {
-        await customers.insertOne({
-          id: uuidv4(),
-          name: body.customer.name,
-          whatsapp: body.customer.whatsapp,
-          createdAt: new Date().toISOString()
-        });
+    // Decrement stock and insert the invoice atomically. Lines that would
+    // oversell abort the whole bill with a 409 listing what is short.
+    const products = await getCollection('products');
+    const stockLines = aggregateStockLines(invoice.items);
+    await fillItemCategories(products, invoice.items);
+
+    const { db } = await connectToDatabase();
+    try {
+      await span('checkout', () => withTransaction(async (session) => {
+        await decrementStock(products, stockLines, session);
+        try {
+          await invoices.insertOne(invoice, { session: session || undefined });
+        } catch (error) {
+          if (!session) await restoreStock(products, stockLines);
+          throw error;
+        }
+        await recordDailySales(db, invoice, session);
+        await recordStockMovements(db, saleMovements([invoice]), session);
+        await recordCustomerVisits(customers, [invoice], session);
+      }));
+    } catch (error) {
+      if (error instanceof StockConflictError) {
+        const shortages = await describeShortages(products, stockLines);
+        return NextResponse.json(
+          { error: 'Insufficient stock', shortages },
+          { status: 409 }
+        );
+      }
+      if (idempotencyKey && error?.code === 11000) {
+        // Lost a race with a concurrent retry of the same sale
+        const existing = await invoices.findOne({ idempotencyKey });
+        return NextResponse.json({ invoice: existing, whatsappLink: existing.whatsappLink || null, replayed: true });
       }
+      throw error;
     }
+    refreshStock(stockLines).catch((error) => console.error('Scan index stock refresh error:', error));
 
-    // Generate WhatsApp message with formatted bill
-let whatsappLink = null;
-
-if (body.customer?.whatsapp) {
-  // 1) Normalize phone to WhatsApp E.164-like (digits only, with country code)
-  let phone = (body.customer.whatsapp || '').replace(/\D/g, '');
-  // If it's a 10-digit Indian mobile, prepend 91
-  if (/^[6-9]\d{9}$/.test(phone)) phone = `91${phone}`;
-  // Trim leading 0s (landlines often have them)
-  phone = phone.replace(/^0+/, '');
-
-  // 2) Get shop info
-  const settings = await getCollection('settings');
-  const shopInfo = (await settings.findOne({ id: 'shop' })) || {
-    name: 'Jewelry Store',
-    phone: '',
-    address: ''
-  };
-
-  // 3) Format date (DD/MM/YYYY to avoid ambiguity)
-  const invoiceDate = new Date(invoice.date).toLocaleDateString('en-IN', {
-    day: '2-digit', month: '2-digit', year: 'numeric'
-  });
-
-  // 4) Build items list
-  const itemsList = invoice.items.map((item, idx) =>
-    `${idx + 1}. 💍 *${item.name}* (${item.qty}) – ₹${(item.qty * item.price).toFixed(2)}`
-  ).join('\n');
-
-  // 5) Calculations
-  const discountAmount = (invoice.subTotal || 0) * ((invoice.discountPercent || 0) / 100);
-  const amountAfterDiscount = (invoice.subTotal || 0) - discountAmount;
-  const gstAmount = amountAfterDiscount * ((invoice.gstPercent || 0) / 100);
-
-  // 6) Compose message (plain UTF-16 JS string, with \n line breaks)
-  let billText = `🙏 Thank you for shopping with ${shopInfo.name || 'Jewelry Store'}! 🙏
+    return NextResponse.json({ invoice, whatsappLink: invoice.whatsappLink || null }, { status: 201 });
+  }
 
-🏪 ${shopInfo.name || 'Jewelry Store'}
-📍 ${shopInfo.address || '123 Main Street'}
-📞 ${shopInfo.phone || '+91-9876543210'}
+  // POST /api/invoices/batch - Ingest many bills, each with its own idempotency key
+  if (method === 'POST' && segments.length === 1 && segments[0] === 'batch') {
+    const body = await request.json();
+    const bills = Array.isArray(body.invoices) ? body.invoices : null;
+    if (!bills || bills.length === 0) {
+      return NextResponse.json({ error: 'invoices must be a non-empty array' }, { status: 400 });
+    }
+    if (bills.length > MAX_INVOICES_PER_BATCH) {
+      return NextResponse.json({ error: `At most ${MAX_INVOICES_PER_BATCH} invoices per batch` }, { status: 400 });
+    }
 
-━━━━━━━━━━━━━━━━━━━
-🧾 INVOICE DETAILS
-━━━━━━━━━━━━━━━━━━━
-📄 Invoice No: ${String(invoice.id || '').substring(0, 8)}
-📅 Date: ${invoiceDate}
-👤 Customer: ${invoice.customer?.name || 'Walk-in Customer'}
-━━━━━━━━━━━━━━━━━━━
+    const results = bills.map((bill) => ({ idempotencyKey: bill?.idempotencyKey ?? null }));
+    const firstIndexByKey = new Map();
+    const repeats = [];
+    let pending = [];
+    bills.forEach((bill, index) => {
+      const key = bill?.idempotencyKey;
+      const pricingError = bill ? validatePricing(bill) : null;
+      if (typeof key !== 'string' || !key) {
+        Object.assign(results[index], { status: 'invalid', error: 'idempotencyKey is required' });
+      } else if (pricingError) {
+        Object.assign(results[index], { status: 'invalid', error: pricingError });
+      } else if (firstIndexByKey.has(key)) {
+        repeats.push([index, firstIndexByKey.get(key)]);
+      } else {
+        firstIndexByKey.set(key, index);
+        pending.push({ index, invoice: buildInvoice(bill, key, { offline: true }), lines: aggregateStockLines(bill.items) });
+      }
+    });
+    await span('whatsapp', async () => {
+      for (const { invoice } of pending) {
+        await attachWhatsappLink(invoice);
+      }
+    });
 
-💎 ITEMS PURCHASED
-${itemsList}
+    const products = await getCollection('products');
+    await fillItemCategories(products, pending.flatMap(({ invoice }) => invoice.items));
+    const { db } = await connectToDatabase();
+    const sold = [];
+
+    // A plan can be overtaken by a concurrent sale or a concurrent retry of the
+    // same bills; both are resolved by planning again from fresh state.
+    for (let attempt = 1; pending.length > 0; attempt++) {
+      const existing = await invoices
+        .find({ idempotencyKey: { $in: pending.map(({ invoice }) => invoice.idempotencyKey) } }, { projection: { id: 1, idempotencyKey: 1 } })
+        .toArray();
+      const existingIds = new Map(existing.map((row) => [row.idempotencyKey, row.id]));
+      for (const { index, invoice } of pending) {
+        if (existingIds.has(invoice.idempotencyKey)) {
+          Object.assign(results[index], { status: 'duplicate', invoiceId: existingIds.get(invoice.idempotencyKey) });
+        }
+      }
+      pending = pending.filter(({ invoice }) => !existingIds.has(invoice.idempotencyKey));
+
+      try {
+        const outcome = await withTransaction(async (session) => {
+          const stockById = await readStock(products, [...new Set(pending.flatMap(({ lines }) => lines.map((line) => line.productId)))], session);
+          const plan = planStockAllocation(stockById, pending);
+          await decrementStock(products, plan.lines, session);
+
+          let created = plan.accepted;
+          let insertError = null;
+          if (created.length > 0) {
+            try {
+              await invoices.insertMany(created.map(({ invoice }) => invoice), { ordered: false, session: session || undefined });
+            } catch (error) {
+              if (session) throw error;
+              // Without a transaction the inserts that went in stand. Find
+              // them by id, give back the stock of the rest, and record the
+              // sales that did go in before reporting any other failure.
+              const insertedIds = new Set((await invoices
+                .find({ id: { $in: created.map(({ invoice }) => invoice.id) } }, { projection: { _id: 0, id: 1 } })
+                .toArray()).map((row) => row.id));
+              const failed = created.filter(({ invoice }) => !insertedIds.has(invoice.id));
+              await restoreStock(products, aggregateStockLines(failed.flatMap(({ invoice }) => invoice.items)));
+              created = created.filter(({ invoice }) => insertedIds.has(invoice.id));
+              // Keys a concurrent retry beat us to are reported as duplicates next time round
+              const onlyDuplicates = error?.writeErrors?.length > 0 && error.writeErrors.every((writeError) => writeError.code === 11000);
+              if (!onlyDuplicates) insertError = error;
+            }
+            await recordDailySalesMany(db, created.map(({ invoice }) => invoice), session);
+            await recordStockMovements(db, saleMovements(created.map(({ invoice }) => invoice)), session);
+            await recordCustomerVisits(customers, created.map(({ invoice }) => invoice), session);
+          }
+          if (insertError) throw insertError;
+          return { created, rejected: plan.rejected };
+        });
 
-━━━━━━━━━━━━━━━━━━━
-💰 BILLING SUMMARY
-━━━━━━━━━━━━━━━━━━━
-💵 Subtotal: ₹${(invoice.subTotal || 0).toFixed(2)}`;
+        for (const { index, invoice, lines } of outcome.created) {
+          Object.assign(results[index], { status: 'created', invoiceId: invoice.id });
+          sold.push(...lines);
+        }
+        for (const { bill, shortages } of outcome.rejected) {
+          Object.assign(results[bill.index], { status: 'rejected', error: 'Insufficient stock', shortages });
+        }
+        // Bills lost to a concurrent retry are reported as duplicates next time round
+        const settled = new Set([...outcome.created, ...outcome.rejected.map(({ bill }) => bill)]);
+        pending = pending.filter((bill) => !settled.has(bill));
+      } catch (error) {
+        const retryable = error instanceof StockConflictError || error?.code === 11000;
+        if (!retryable || attempt >= 3) throw error;
+      }
+    }
+    refreshStock(sold).catch((error) => console.error('Scan index stock refresh error:', error));
 
-  if ((invoice.discountPercent || 0) > 0) {
-    billText += `\n💸 *Discount (${invoice.discountPercent}%):* -₹${discountAmount.toFixed(2)}`;
-  }
+    // A key repeated within the batch resolves to the first bill's invoice
+    for (const [index, firstIndex] of repeats) {
+      Object.assign(results[index], { status: 'duplicate', invoiceId: results[firstIndex].invoiceId ?? null });
+    }
 
-  if ((invoice.gstPercent || 0) > 0) {
-    billText += `\n🧮 *GST (${invoice.gstPercent}%):* +₹${gstAmount.toFixed(2)}`;
+    return NextResponse.json({ results });
   }
 
-  billText += `
-
-💳 Payment Mode: ${invoice.paymentMode || 'Cash'}
-💰 Grand Total: ₹${(invoice.grandTotal || 0).toFixed(2)}
-
-━━━━━━━━━━━━━━━━━━━
-🌟 We appreciate your trust and loyalty!
-💬 For queries, contact us at ${shopInfo.phone || '+91-9876543210'}.`;
+  // GET /api/invoices/export?from=&to=&format=zip|pdf|csv
+  if (method === 'GET' && segments.length === 1 && segments[0] === 'export') {
+    const { searchParams } = new URL(request.url);
+    const format = searchParams.get('format') || 'zip';
+    const from = parseReportDate(searchParams.get('from'));
+    const to = parseReportDate(searchParams.get('to'));
+    if (!EXPORT_FORMATS[format]) {
+      return NextResponse.json({ error: `format must be one of ${Object.keys(EXPORT_FORMATS).join(', ')}` }, { status: 400 });
+    }
+    if (from === undefined || to === undefined) {
+      return NextResponse.json({ error: 'from and to must be ISO 8601 dates' }, { status: 400 });
+    }
 
-  // 7) Correct URL encoding — ONLY encodeURIComponent
-  const encoded = encodeURIComponent(billText);
+    const filter = dateRangeFilter(from, to);
+    if (format !== 'csv') {
+      const count = await invoices.countDocuments(filter);
+      // A PDF needs at least one page
+      if (format === 'pdf' && count === 0) {
+        return NextResponse.json({ error: 'No invoices in this period' }, { status: 404 });
+      }
+      if (format === 'zip' && count > MAX_ZIP_ENTRIES) {
+        return NextResponse.json({ error: `A ZIP export holds at most ${MAX_ZIP_ENTRIES} invoices; narrow the date range` }, { status: 400 });
+      }
+    }
 
-  // Use api.whatsapp.com or wa.me — both are fine
-  whatsappLink = `https://api.whatsapp.com/send?phone=${phone}&text=${encoded}`;
-  // Or: whatsappLink = `https://wa.me/${phone}?text=${encoded}`;
-}
+    let shopInfo = null;
+    if (format !== 'csv') {
+      assertPdfCapacity();
+      shopInfo = await getShopInfo();
+    }
 
-    return NextResponse.json({ invoice, whatsappLink }, { status: 201 });
+    const cursor = invoices.find(filter).sort({ date: 1, id: 1 }).batchSize(100);
+    const { contentType, extension } = EXPORT_FORMATS[format];
+    const period = [from, to].map((date) => (date ? date.toISOString().substring(0, 10) : 'all')).join('_');
+    return new NextResponse(invoiceExportStream(format, cursor, shopInfo), {
+      headers: {
+        'Content-Type': contentType,
+        'Content-Disposition': `attachment; filename="invoices-${period}.${extension}"`,
+        'Cache-Control': 'no-store',
+      },
+    });
   }
 
-
   // GET /api/invoices/:id
   if (method === 'GET' && segments.length >= 1) {
     const id = segments[0];
 
+    // GET /api/invoices/:id/whatsapp - Stored share link for the bill
+    if (segments.length === 2 && segments[1] === 'whatsapp') {
+      const recent = getRecentWhatsappLink(id);
+      if (recent) {
+        return NextResponse.json({ whatsappLink: recent });
+      }
+
+      const invoice = await invoices.findOne({ id }, { projection: { _id: 0 } });
+      if (!invoice) {
+        return NextResponse.json({ error: 'Invoice not found' }, { status: 404 });
+      }
+      if (!invoice.customer?.whatsapp) {
+        return NextResponse.json({ error: 'Invoice has no WhatsApp number' }, { status: 404 });
+      }
+      if (!invoice.whatsappLink) {
+        // Bills from before links were stored get theirs rendered once
+        await attachWhatsappLink(invoice);
+        await invoices.updateOne({ id }, { $set: { whatsappLink: invoice.whatsappLink } });
+      }
+      rememberWhatsappLink(id, invoice.whatsappLink);
+      return NextResponse.json({ whatsappLink: invoice.whatsappLink });
+    }
+
     // Check for PDF endpoints
-    if (segments.length === 2) {
+    if (segments.length === 2 && PDF_TEMPLATES[segments[1]]) {
+      const { template, disposition } = PDF_TEMPLATES[segments[1]];
+
+      // Looked up before the ETag and cache checks, so a missing invoice is a
+      // 404 however the request is made
       const invoice = await invoices.findOne({ id });
       if (!invoice) {
         return NextResponse.json({ error: 'Invoice not found' }, { status: 404 });
       }
 
-      const settings = await getCollection('settings');
-      const shopInfo = await settings.findOne({ id: 'shop' }) || {
-        name: 'Jewelry Store',
-        phone: '',
-        address: '',
-        gst: ''
+      const shopInfo = await getShopInfo();
+
+      // A rendered invoice only changes when the shop header does
+      const cacheKey = pdfCacheKey(id, template, shopInfo.version);
+      const headers = {
+        'Content-Type': 'application/pdf',
+        'Content-Disposition': `${disposition}; filename="invoice-${template === 'thermal' ? 'thermal-' : ''}${id}.pdf"`,
+        'Cache-Control': 'private, no-cache',
+        ETag: `"${cacheKey}"`,
       };
 
-      if (segments[1] === 'pdf-a4') {
-        const pdfBuffer = await generateA4Invoice(invoice, shopInfo);
-        return new NextResponse(pdfBuffer, {
-          headers: {
-            'Content-Type': 'application/pdf',
-            'Content-Disposition': `attachment; filename="invoice-${id}.pdf"`,
-          },
-        });
+      if (request.headers.get('if-none-match') === headers.ETag) {
+        return new NextResponse(null, { status: 304, headers });
       }
 
-      if (segments[1] === 'pdf-thermal') {
-        const pdfBuffer = await generateThermalInvoice(invoice, shopInfo);
-        return new NextResponse(pdfBuffer, {
-          headers: {
-            'Content-Type': 'application/pdf',
-            'Content-Disposition': `inline; filename="invoice-thermal-${id}.pdf"`,
-          },
-        });
+      const cached = await getCachedPdf(cacheKey);
+      if (cached) {
+        return new NextResponse(cached, { headers });
       }
+
+      // Layout finishes after the headers are sent, so this span only
+      // reaches the histogram, not Server-Timing.
+      const endPdfSpan = startSpan('pdf');
+      const stream = streamInvoicePdf(template, invoice, shopInfo, {
+        onComplete: (pdf) => {
+          endPdfSpan();
+          setCachedPdf(cacheKey, pdf);
+        },
+      });
+      return new NextResponse(stream, { headers });
     }
 
     // Get single invoice
@@ -334,13 +784,7 @@ async function handleSettings(request, method, segments) {
   if (method === 'GET' && segments[0] === 'shop') {
     const shopInfo = await settings.findOne({ id: 'shop' });
     if (!shopInfo) {
-      const defaultInfo = {
-        id: 'shop',
-        name: 'Jewelry Store',
-        phone: '',
-        address: '',
-        gst: ''
-      };
+      const defaultInfo = { ...DEFAULT_SHOP_INFO };
       await settings.insertOne(defaultInfo);
       return NextResponse.json(defaultInfo);
     }
@@ -352,13 +796,16 @@ async function handleSettings(request, method, segments) {
     const body = await request.json();
     
     // Remove any _id field from the body to avoid MongoDB immutable field error
-    const { _id, ...updateData } = body;
+    const { _id, version, ...updateData } = body;
     
+    // Every change bumps the version, which keys the rendered-PDF cache
     await settings.updateOne(
       { id: 'shop' },
-      { $set: { ...updateData, id: 'shop' } },
+      { $set: { ...updateData, id: 'shop' }, $inc: { version: 1 } },
       { upsert: true }
     );
+    invalidateShopInfo();
+    await clearPdfCache();
 
     const updated = await settings.findOne({ id: 'shop' });
     return NextResponse.json(updated);
@@ -367,8 +814,336 @@ async function handleSettings(request, method, segments) {
   return NextResponse.json({ error: 'Method not allowed' }, { status: 405 });
 }
 
+// Barcode APIs
+const MAX_LABELS_PER_SHEET = 5000;
+
+// Label sheet layout fields: default and allowed [min, max]. Sizes are in mm.
+const LABEL_LAYOUT = {
+  labelWidth: { default: 100, range: [20, 300] },
+  labelHeight: { default: 15, range: [10, 300] },
+  columns: { default: 1, range: [1, 10] },
+  rows: { default: 1, range: [1, 40] },
+};
+
+// Returns { layout } with defaults filled in, or { error } for a value out of range.
+function parseLabelLayout(layout = {}) {
+  const parsed = {};
+  for (const [field, { default: fallback, range: [min, max] }] of Object.entries(LABEL_LAYOUT)) {
+    const value = layout?.[field] ?? fallback;
+    const valid = field === 'columns' || field === 'rows' ? Number.isInteger(value) : Number.isFinite(value);
+    if (!valid || value < min || value > max) {
+      return { error: `layout.${field} must be ${min}-${max}` };
+    }
+    parsed[field] = value;
+  }
+  return { layout: parsed };
+}
+
+async function handleBarcodes(request, method, segments) {
+  // GET /api/barcodes/:text?format=&scale=&height= - Render by barcode text, no DB read
+  if (method === 'GET' && segments.length === 1) {
+    const text = segments[0];
+    const { searchParams } = new URL(request.url);
+    const format = searchParams.get('format') || 'code128';
+    const scale = parseInt(searchParams.get('scale') || '3', 10);
+    const height = parseInt(searchParams.get('height') || '10', 10);
+
+    if (!BARCODE_FORMATS.includes(format)) {
+      return NextResponse.json(
+        { error: `format must be one of ${BARCODE_FORMATS.join(', ')}` },
+        { status: 400 }
+      );
+    }
+    const [minScale, maxScale] = BARCODE_SCALE_RANGE;
+    const [minHeight, maxHeight] = BARCODE_HEIGHT_RANGE;
+    if (!(scale >= minScale && scale <= maxScale) || !(height >= minHeight && height <= maxHeight)) {
+      return NextResponse.json(
+        { error: `scale must be ${minScale}-${maxScale} and height ${minHeight}-${maxHeight}` },
+        { status: 400 }
+      );
+    }
+
+    // Only labels of catalogue products are worth keeping on disk
+    const persist = Boolean(await lookupBarcode(text));
+    return barcodeResponse(request, await span('barcode', () => getBarcode(text, { format, scale, height, persist })));
+  }
+
+  // POST /api/barcodes/sheet - One print-ready PDF for many labels
+  if (method === 'POST' && segments[0] === 'sheet') {
+    const body = await request.json();
+    const { layout, error: layoutError } = parseLabelLayout(body.layout);
+    if (layoutError) {
+      return NextResponse.json({ error: layoutError }, { status: 400 });
+    }
+    const badCopies = (body.items || []).some((item) => {
+      const copies = item?.copies ?? 1;
+      return !Number.isInteger(copies) || copies < 0 || copies > MAX_LABELS_PER_SHEET;
+    });
+    if (badCopies) {
+      return NextResponse.json({ error: `copies must be a whole number from 0 to ${MAX_LABELS_PER_SHEET}` }, { status: 400 });
+    }
+
+    const requested = (body.items || []).filter(item => item.productId && (item.copies ?? 1) > 0);
+    const totalLabels = requested.reduce((sum, item) => sum + (item.copies ?? 1), 0);
+
+    if (requested.length === 0) {
+      return NextResponse.json({ error: 'items must list at least one productId' }, { status: 400 });
+    }
+    if (totalLabels > MAX_LABELS_PER_SHEET) {
+      return NextResponse.json(
+        { error: `A sheet can hold at most ${MAX_LABELS_PER_SHEET} labels` },
+        { status: 400 }
+      );
+    }
+
+    const products = await getCollection('products');
+    const productList = await products
+      .find(
+        { id: { $in: requested.map(item => item.productId) } },
+        { projection: { _id: 0, id: 1, name: 1, code: 1, barcode: 1, sellPrice: 1 } }
+      )
+      .toArray();
+    const productById = new Map(productList.map(product => [product.id, product]));
+
+    const missing = requested.filter(item => !productById.has(item.productId));
+    if (missing.length > 0) {
+      return NextResponse.json(
+        { error: 'Product not found', productIds: missing.map(item => item.productId) },
+        { status: 404 }
+      );
+    }
+
+    // Each distinct barcode is rendered (or pulled from cache) once
+    const images = new Map();
+    await Promise.all(productList.map(async (product) => {
+      images.set(product.id, (await getBarcode(product.barcode, { persist: true })).png);
+    }));
+
+    const labels = [];
+    for (const item of requested) {
+      const product = productById.get(item.productId);
+      for (let i = 0; i < (item.copies ?? 1); i++) {
+        labels.push({ product, image: images.get(product.id) });
+      }
+    }
+
+    const pdfBuffer = await generateLabelSheet(labels, layout);
+    return new NextResponse(pdfBuffer, {
+      headers: {
+        'Content-Type': 'application/pdf',
+        'Content-Disposition': 'inline; filename="labels.pdf"',
+      },
+    });
+  }
+
+  return NextResponse.json({ error: 'Method not allowed' }, { status: 405 });
+}
+
+// Adds code, name and category to ledger rows keyed by productId, in code
+// order. Rows of deleted products keep their id and no name.
+async function withProductDetails(db, rows) {
+  const details = await db.collection('products')
+    .find({ id: { $in: rows.map((row) => row.productId) } }, { projection: { _id: 0, id: 1, code: 1, name: 1, category: 1 } })
+    .toArray();
+  const byId = new Map(details.map((product) => [product.id, product]));
+  return rows
+    .map((row) => {
+      const { code = null, name = null, category = null } = byId.get(row.productId) || {};
+      return { productId: row.productId, code, name, category, ...row };
+    })
+    .sort((a, b) => String(a.code ?? '').localeCompare(String(b.code ?? '')));
+}
+
+// Report APIs
+async function handleReports(request, method, segments) {
+  // GET /api/reports/sales?from=&to=&groupBy=&recent=
+  if (method === 'GET' && segments[0] === 'sales') {
+    const { searchParams } = new URL(request.url);
+    const from = parseReportDate(searchParams.get('from'));
+    const to = parseReportDate(searchParams.get('to'));
+    const groupBy = searchParams.get('groupBy') || 'day';
+
+    if (from === undefined || to === undefined) {
+      return NextResponse.json({ error: 'from and to must be ISO 8601 dates' }, { status: 400 });
+    }
+    if (!GROUP_BY_OPTIONS.includes(groupBy)) {
+      return NextResponse.json(
+        { error: `groupBy must be one of ${GROUP_BY_OPTIONS.join(', ')}` },
+        { status: 400 }
+      );
+    }
+
+    const invoices = await getCollection('invoices');
+    const recentLimit = parseLimit(searchParams.get('recent'), 0, 20);
+
+    const dailySales = await getCollection(DAILY_SALES);
+    const fromDay = from ? localDay(from) : null;
+    const toDay = to ? localDay(new Date(to.getTime() - 1)) : null;
+
+    const [[result], recent] = await Promise.all([
+      dailySales.aggregate(buildSalesPipeline({ fromDay, toDay, groupBy })).toArray(),
+      recentLimit > 0
+        ? invoices
+            .find(dateRangeFilter(from, to), { projection: { items: 0 } })
+            .sort({ date: -1 })
+            .limit(recentLimit)
+            .toArray()
+        : [],
+    ]);
+
+    return NextResponse.json({
+      from: from ? from.toISOString() : null,
+      to: to ? to.toISOString() : null,
+      groupBy,
+      timezone: REPORT_TIMEZONE,
+      totals: result?.totals[0] || EMPTY_TOTALS,
+      series: result?.series || [],
+      recent,
+    });
+  }
+
+  // GET /api/reports/stock?date=&productId= - Stock per product at the end of a day
+  if (method === 'GET' && segments[0] === 'stock') {
+    const { searchParams } = new URL(request.url);
+    const day = parseStockDay(searchParams.get('date'));
+    if (day === undefined) {
+      return NextResponse.json({ error: 'date must be YYYY-MM-DD or an ISO 8601 date' }, { status: 400 });
+    }
+    const productIds = searchParams.getAll('productId');
+
+    const { db } = await connectToDatabase();
+    await ensureSnapshotsCurrent(db);
+    const date = day || localDay(new Date());
+    const stock = await span('ledger', () => stockOnDate(db, date, productIds.length > 0 ? productIds : null));
+    const rows = await withProductDetails(db, [...stock].map(([productId, qty]) => ({ productId, stock: qty })));
+
+    return NextResponse.json({
+      date,
+      timezone: REPORT_TIMEZONE,
+      units: rows.reduce((sum, row) => sum + row.stock, 0),
+      products: rows.filter((row) => row.stock !== 0),
+    });
+  }
+
+  // GET /api/reports/stock-movements?from=&to=&productId= - Opening, sold,
+  // restocked, adjusted and closing stock per product for a period of days
+  if (method === 'GET' && segments[0] === 'stock-movements') {
+    const { searchParams } = new URL(request.url);
+    const fromDay = parseStockDay(searchParams.get('from'));
+    const toDay = parseStockDay(searchParams.get('to'));
+    if (fromDay === undefined || toDay === undefined) {
+      return NextResponse.json({ error: 'from and to must be YYYY-MM-DD or ISO 8601 dates' }, { status: 400 });
+    }
+    const to = toDay || localDay(new Date());
+    const from = fromDay || `${to.slice(0, 7)}-01`;
+    if (from > to) {
+      return NextResponse.json({ error: 'from must not be after to' }, { status: 400 });
+    }
+    const productIds = searchParams.getAll('productId');
+
+    const { db } = await connectToDatabase();
+    await ensureSnapshotsCurrent(db);
+    const report = await span('ledger', () => stockMovementReport(db, from, to, productIds.length > 0 ? productIds : null));
+    const rows = await withProductDetails(db, report);
+
+    return NextResponse.json({ from, to, timezone: REPORT_TIMEZONE, products: rows });
+  }
+
+  // POST /api/reports/rebuild - Recompute daily rollups from raw invoices
+  if (method === 'POST' && segments[0] === 'rebuild') {
+    const { db } = await connectToDatabase();
+    const summary = await rebuildDailySales(db, withTransaction);
+    if (!summary) {
+      return NextResponse.json({ error: 'A rebuild is already running' }, { status: 409 });
+    }
+    return NextResponse.json({ success: true, ...summary });
+  }
+
+  return NextResponse.json({ error: 'Method not allowed' }, { status: 405 });
+}
+
+// Customer APIs
+async function handleCustomers(request, method, segments) {
+  // GET /api/customers/:whatsapp?limit= - Profile with running totals and recent invoices
+  if (method === 'GET' && segments.length === 1) {
+    const whatsapp = segments[0];
+    const { searchParams } = new URL(request.url);
+    const limit = parseLimit(searchParams.get('limit'), 10, 50);
+
+    const customers = await getCollection('customers');
+    const invoices = await getCollection('invoices');
+    const [profile, recentInvoices] = await Promise.all([
+      customers.findOne({ whatsapp }, { projection: { _id: 0 } }),
+      invoices
+        .find({ 'customer.whatsapp': whatsapp }, { projection: INVOICE_LIST_PROJECTION })
+        .sort({ date: -1, id: -1 })
+        .limit(limit)
+        .toArray(),
+    ]);
+
+    if (!profile && recentInvoices.length === 0) {
+      return NextResponse.json({ error: 'Customer not found' }, { status: 404 });
+    }
+    return NextResponse.json({ ...(profile || { whatsapp }), recentInvoices });
+  }
+
+  return NextResponse.json({ error: 'Method not allowed' }, { status: 405 });
+}
+
+// Scanner API
+async function handleScan(request, method, segments) {
+  // GET /api/scan/:barcode - Product for a scanned barcode, served from memory
+  if (method === 'GET' && segments.length === 1) {
+    const product = await lookupBarcode(segments[0]);
+    if (!product) {
+      return NextResponse.json({ error: 'Product not found' }, { status: 404 });
+    }
+    return NextResponse.json(product, { headers: { 'Cache-Control': 'no-store' } });
+  }
+
+  return NextResponse.json({ error: 'Method not allowed' }, { status: 405 });
+}
+
+// System APIs
+async function handleSystem(request, method, segments) {
+  // GET /api/system/stats - Runtime statistics for the worker and connection pools
+  if (method === 'GET' && segments[0] === 'stats') {
+    return NextResponse.json({ pdfPool: getPdfPoolStats(), scanIndex: getScanIndexStats(), mongoPool: getDbPoolStats() });
+  }
+
+  return NextResponse.json({ error: 'Method not allowed' }, { status: 405 });
+}
+
+// GET /api/metrics - Prometheus text exposition
+function handleMetrics() {
+  const pdfPool = getPdfPoolStats();
+  const mongoPool = getDbPoolStats();
+  const body = renderMetrics([
+    { name: 'pos_mongo_pool_open_connections', help: 'Open MongoDB connections.', value: mongoPool.open },
+    { name: 'pos_mongo_pool_in_use_connections', help: 'MongoDB connections checked out.', value: mongoPool.inUse },
+    { name: 'pos_mongo_pool_waiting_requests', help: 'Operations waiting for a MongoDB connection.', value: mongoPool.waiting },
+    { name: 'pos_pdf_queue_depth', help: 'PDF jobs waiting for a worker.', value: pdfPool.queueDepth },
+    { name: 'pos_pdf_busy_workers', help: 'PDF workers rendering.', value: pdfPool.busy },
+  ]);
+  return new NextResponse(body, {
+    headers: { 'Content-Type': 'text/plain; version=0.0.4; charset=utf-8', 'Cache-Control': 'no-store' },
+  });
+}
+
+// Maps errors that escape a handler to a response
+function errorResponse(error) {
+  if (error instanceof PdfPoolBusyError) {
+    return NextResponse.json({ error: error.message }, { status: 503, headers: { 'Retry-After': '2' } });
+  }
+  if (error instanceof InvalidBarcodeError) {
+    return NextResponse.json({ error: error.message }, { status: 400 });
+  }
+  console.error('API Error:', error);
+  return NextResponse.json({ error: error.message }, { status: 500 });
+}
+
 // Main router
-export async function GET(request, { params }) {
+export const GET = withRequestMetrics('GET', async (request, { params }) => {
   try {
     const path = params?.path || [];
     
@@ -379,7 +1154,12 @@ export async function GET(request, { params }) {
         endpoints: {
           products: '/api/products',
           invoices: '/api/invoices',
-          settings: '/api/settings'
+          settings: '/api/settings',
+          reports: '/api/reports/sales',
+          barcodes: '/api/barcodes/:text',
+          scan: '/api/scan/:barcode',
+          customers: '/api/customers/:whatsapp',
+          metrics: '/api/metrics'
         }
       });
     }
@@ -387,72 +1167,92 @@ export async function GET(request, { params }) {
     const [resource, ...segments] = path;
 
     if (resource === 'products') {
-      return handleProducts(request, 'GET', segments);
+      return await handleProducts(request, 'GET', segments);
     }
     if (resource === 'invoices') {
-      return handleInvoices(request, 'GET', segments);
+      return await handleInvoices(request, 'GET', segments);
     }
     if (resource === 'settings') {
-      return handleSettings(request, 'GET', segments);
+      return await handleSettings(request, 'GET', segments);
+    }
+    if (resource === 'reports') {
+      return await handleReports(request, 'GET', segments);
+    }
+    if (resource === 'barcodes') {
+      return await handleBarcodes(request, 'GET', segments);
+    }
+    if (resource === 'customers') {
+      return await handleCustomers(request, 'GET', segments);
+    }
+    if (resource === 'scan') {
+      return await handleScan(request, 'GET', segments);
+    }
+    if (resource === 'system') {
+      return await handleSystem(request, 'GET', segments);
+    }
+    if (resource === 'metrics') {
+      return handleMetrics();
     }
 
     return NextResponse.json({ error: 'Resource not found' }, { status: 404 });
   } catch (error) {
-    console.error('API Error:', error);
-    return NextResponse.json({ error: error.message }, { status: 500 });
+    return errorResponse(error);
   }
-}
+});
 
-export async function POST(request, { params }) {
+export const POST = withRequestMetrics('POST', async (request, { params }) => {
   try {
     const path = params?.path || [];
     const [resource, ...segments] = path;
 
     if (resource === 'products') {
-      return handleProducts(request, 'POST', segments);
+      return await handleProducts(request, 'POST', segments);
     }
     if (resource === 'invoices') {
-      return handleInvoices(request, 'POST', segments);
+      return await handleInvoices(request, 'POST', segments);
+    }
+    if (resource === 'reports') {
+      return await handleReports(request, 'POST', segments);
+    }
+    if (resource === 'barcodes') {
+      return await handleBarcodes(request, 'POST', segments);
     }
 
     return NextResponse.json({ error: 'Resource not found' }, { status: 404 });
   } catch (error) {
-    console.error('API Error:', error);
-    return NextResponse.json({ error: error.message }, { status: 500 });
+    return errorResponse(error);
   }
-}
+});
 
-export async function PUT(request, { params }) {
+export const PUT = withRequestMetrics('PUT', async (request, { params }) => {
   try {
     const path = params?.path || [];
     const [resource, ...segments] = path;
 
     if (resource === 'products') {
-      return handleProducts(request, 'PUT', segments);
+      return await handleProducts(request, 'PUT', segments);
     }
     if (resource === 'settings') {
-      return handleSettings(request, 'PUT', segments);
+      return await handleSettings(request, 'PUT', segments);
     }
 
     return NextResponse.json({ error: 'Resource not found' }, { status: 404 });
   } catch (error) {
-    console.error('API Error:', error);
-    return NextResponse.json({ error: error.message }, { status: 500 });
+    return errorResponse(error);
   }
-}
+});
 
-export async function DELETE(request, { params }) {
+export const DELETE = withRequestMetrics('DELETE', async (request, { params }) => {
   try {
     const path = params?.path || [];
     const [resource, ...segments] = path;
 
     if (resource === 'products') {
-      return handleProducts(request, 'DELETE', segments);
+      return await handleProducts(request, 'DELETE', segments);
     }
 
     return NextResponse.json({ error: 'Resource not found' }, { status: 404 });
   } catch (error) {
-    console.error('API Error:', error);
-    return NextResponse.json({ error: error.message }, { status: 500 });
+    return errorResponse(error);
   }
-}
+});
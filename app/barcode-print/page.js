@@ -48,7 +48,7 @@ export default function BarcodePrintPage() {
     if (selectedProduct && !barcodeImages[selectedProduct.id]) {
       // Preload the image
       const img = new Image();
-      img.src = `/api/products/${selectedProduct.id}/barcode`;
+      img.src = `/api/barcodes/${encodeURIComponent(selectedProduct.barcode)}`;
       img.onload = () => {
         setBarcodeImages(prev => ({
           ...prev,
@@ -61,129 +61,49 @@ export default function BarcodePrintPage() {
     }
   }, [selectedProduct, barcodeImages]);
 
-  const handlePrint = () => {
+  const handlePrint = async () => {
     if (!selectedProduct) {
       toast.error('Please select a product first');
       return;
     }
-    
-    // Create a new window for printing
+
+    // Open the window synchronously so the popup blocker allows it
     const printWindow = window.open('', '_blank');
     printWindowRef.current = printWindow;
-    
-    // Write HTML content to the print window
-    printWindow.document.write(`
-      <!DOCTYPE html>
-      <html>
-      <head>
-        <title>Barcode Print</title>
-        <style>
-          @page {
-            size: 100mm 15mm;
-            margin: 0;
-          }
-          body {
-            margin: 0;
-            padding: 0;
-            font-family: Arial, sans-serif;
-          }
-          .label {
-            width: 100mm;
-            height: 15mm;
-            position: relative;
-            border: 1px solid #ccc;
-            box-sizing: border-box;
-            page-break-inside: avoid;
-          }
-          .left-section {
-            position: absolute;
-            left: 0;
-            top: 0;
-            bottom: 0;
-            width: 48mm;
-            padding: 2mm;
-            box-sizing: border-box;
-          }
-          .center-line {
-            position: absolute;
-            left: 48mm;
-            top: 1mm;
-            bottom: 1mm;
-            width: 1px;
-            border-left: 1px dashed #999;
-          }
-          .right-section {
-            position: absolute;
-            right: 0;
-            top: 0;
-            bottom: 0;
-            width: 48mm;
-            padding: 2mm;
-            box-sizing: border-box;
-            display: flex;
-            flex-direction: column;
-            justify-content: center;
-            align-items: center;
-          }
-          .barcode-img {
-            height: 8mm;
-            width: 40mm;
-            object-fit: contain;
-            -webkit-print-color-adjust: exact;
-            color-adjust: exact;
-            print-color-adjust: exact;
-          }
-          .price {
-            font-size: 9pt;
-            font-weight: bold;
-            margin-top: 1mm;
-          }
-          .product-name {
-            font-size: 8pt;
-            font-weight: bold;
-            line-height: 1.2;
-          }
-          .product-code {
-            font-size: 7pt;
-            margin-top: 1mm;
-          }
-          .tail {
-            position: absolute;
-            right: 0;
-            top: 0;
-            width: 3mm;
-            height: 15mm;
-            background-color: #000;
-          }
-        </style>
-      </head>
-      <body>
-        ${Array.from({ length: quantity }).map(() => `
-          <div class="label">
-            <div class="left-section">
-              <div class="product-name">${selectedProduct.name.substring(0, 30)}</div>
-              <div class="product-code">Code: ${selectedProduct.code}</div>
-            </div>
-            <div class="center-line"></div>
-            <div class="right-section">
-              <img src="/api/products/${selectedProduct.id}/barcode" class="barcode-img" alt="Barcode" />
-              <div class="price">₹${selectedProduct.sellPrice}</div>
-            </div>
-            <div class="tail"></div>
-          </div>
-        `).join('')}
-      </body>
-      </html>
-    `);
-    
-    printWindow.document.close();
-    
-    // Wait for content to load, then print
-    setTimeout(() => {
-      printWindow.focus();
-      printWindow.print();
-      // printWindow.close(); // Don't close immediately to allow user to review
-    }, 500);
+
+    try {
+      // The whole sheet is rendered server-side as one PDF
+      const response = await fetch('/api/barcodes/sheet', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          items: [{ productId: selectedProduct.id, copies: quantity }],
+          layout: { labelWidth: 100, labelHeight: 15 }
+        })
+      });
+
+      if (!response.ok) {
+        printWindow.close();
+        toast.error('Failed to generate labels');
+        return;
+      }
+
+      const pdfUrl = URL.createObjectURL(await response.blob());
+      printWindow.location.href = pdfUrl;
+
+      // Wait for the PDF viewer to load, then print
+      setTimeout(() => {
+        try {
+          printWindow.focus();
+          printWindow.print();
+        } catch (e) {
+          console.log('Auto-print failed, please use Ctrl+P to print');
+        }
+      }, 1000);
+    } catch (error) {
+      printWindow.close();
+      toast.error('Failed to generate labels');
+    }
   };
 
   return (
@@ -356,7 +276,7 @@ function LabelPreview({ product }) {
       {/* Right Section - Barcode & Price */}
       <div className="absolute right-0 top-0 bottom-0" style={{ width: '48mm', padding: '2mm', boxSizing: 'border-box', display: 'flex', flexDirection: 'column', justifyContent: 'center', alignItems: 'center' }}>
         <img
-          src={`/api/products/${product.id}/barcode`}
+          src={`/api/barcodes/${encodeURIComponent(product.barcode)}`}
           alt="Barcode"
           style={{ height: '8mm', width: '40mm', objectFit: 'contain' }}
         />
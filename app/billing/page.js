@@ -1,6 +1,6 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useMemo } from 'react';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
@@ -9,9 +9,26 @@ import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '@
 import { Dialog, DialogContent, DialogDescription, DialogFooter, DialogHeader, DialogTitle } from '@/components/ui/dialog';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { toast } from 'sonner';
-import { Search, Trash2, Plus, Minus, ShoppingBag, Share2, Printer } from 'lucide-react';
+import { Search, Trash2, Plus, Minus, ShoppingBag, Share2, Printer, CloudOff, RotateCcw, AlertTriangle } from 'lucide-react';
 import useCartStore from '@/store/cartStore';
 import useSettingsStore from '@/store/settingsStore';
+import { formatRupees, fromPaise, lineTotalPaise, totalsFromSubTotal } from '@/lib/pricing.mjs';
+import {
+  countLocalProducts,
+  countQueuedInvoices,
+  discardFailedInvoice,
+  findLocalByBarcode,
+  flushInvoiceOutbox,
+  isOfflineStoreAvailable,
+  listFailedInvoices,
+  queueInvoice,
+  retryFailedInvoice,
+  searchLocalProducts,
+  syncProducts,
+} from '@/lib/offline';
+
+// How often the local product snapshot pulls changes from the server
+const PRODUCT_SYNC_INTERVAL_MS = 30000;
 
 export default function BillingPage() {
   const [searchQuery, setSearchQuery] = useState('');
@@ -26,15 +43,19 @@ export default function BillingPage() {
   const [isSearching, setIsSearching] = useState(false);
   const [barcodeInput, setBarcodeInput] = useState('');
   const [currentInvoice, setCurrentInvoice] = useState(null);
+  const [snapshotReady, setSnapshotReady] = useState(false);
+  const [queuedInvoices, setQueuedInvoices] = useState(0);
+  const [failedInvoices, setFailedInvoices] = useState([]);
+  const [returningCustomer, setReturningCustomer] = useState(null);
   const { shopInfo } = useSettingsStore();
 
-  const { items, addItem, updateQuantity, removeItem, clearCart } = useCartStore();
+  const { items, subTotalPaise, addItem, updateQuantity, removeItem, clearCart } = useCartStore();
 
-  const subTotal = items.reduce((sum, item) => sum + (item.sellPrice * item.qty), 0);
-  const discountAmount = subTotal * (discount / 100);
-  const amountAfterDiscount = subTotal - discountAmount;
-  const gstAmount = amountAfterDiscount * (gstPercent / 100);
-  const grandTotal = amountAfterDiscount + gstAmount;
+  // Same arithmetic the server uses to price the invoice
+  const totals = useMemo(
+    () => totalsFromSubTotal(subTotalPaise, discount, gstPercent),
+    [subTotalPaise, discount, gstPercent]
+  );
 
   // Load shop info on mount and set default GST
   useEffect(() => {
@@ -46,12 +67,78 @@ export default function BillingPage() {
     });
   }, []);
 
+  // Sends queued sales; refused ones are reported once and listed for review
+  const replayOutbox = async () => {
+    try {
+      const { sent, rejected } = await flushInvoiceOutbox();
+      if (sent > 0) toast.success(`${sent} offline invoice${sent === 1 ? '' : 's'} synced`);
+      for (const { invoice, error } of rejected) {
+        toast.error(`Offline invoice for ${invoice.customer?.name || 'walk-in'} was refused: ${error.error || 'unknown error'}`);
+      }
+    } catch (error) {
+      console.error('Outbox replay failed:', error);
+    }
+    setQueuedInvoices(await countQueuedInvoices().catch(() => 0));
+    setFailedInvoices(await listFailedInvoices().catch(() => []));
+  };
+
+  const handleRetryFailed = async (idempotencyKey) => {
+    await retryFailedInvoice(idempotencyKey);
+    await replayOutbox();
+  };
+
+  const handleDiscardFailed = async (idempotencyKey) => {
+    await discardFailedInvoice(idempotencyKey);
+    setFailedInvoices(await listFailedInvoices());
+  };
+
+  // Keep the local product snapshot current and replay sales queued offline
+  useEffect(() => {
+    if (!isOfflineStoreAvailable()) return;
+    let cancelled = false;
+
+    const sync = () => {
+      syncProducts()
+        .then(() => !cancelled && setSnapshotReady(true))
+        .catch(() => {
+          // Offline: keep using the snapshot we have
+        });
+    };
+
+    const flush = () => {
+      if (!cancelled) replayOutbox();
+    };
+
+    // Anything in the snapshot already is usable before the first sync returns
+    countQueuedInvoices().then((count) => !cancelled && setQueuedInvoices(count)).catch(() => {});
+    listFailedInvoices().then((failed) => !cancelled && setFailedInvoices(failed)).catch(() => {});
+    countLocalProducts().then((count) => !cancelled && count > 0 && setSnapshotReady(true)).catch(() => {});
+
+    sync();
+    flush();
+    const timer = setInterval(sync, PRODUCT_SYNC_INTERVAL_MS);
+    const onOnline = () => {
+      sync();
+      flush();
+    };
+    window.addEventListener('online', onOnline);
+    return () => {
+      cancelled = true;
+      clearInterval(timer);
+      window.removeEventListener('online', onOnline);
+    };
+  }, []);
+
   // Search products
   const handleSearch = async () => {
     if (!searchQuery.trim()) return;
 
     setIsSearching(true);
     try {
+      if (snapshotReady) {
+        setSearchResults(await searchLocalProducts(searchQuery));
+        return;
+      }
       const response = await fetch(`/api/products?query=${encodeURIComponent(searchQuery)}`);
       const data = await response.json();
       setSearchResults(data);
@@ -65,20 +152,45 @@ export default function BillingPage() {
   // Search by barcode
   const handleBarcodeSearch = async (barcode) => {
     try {
-      const response = await fetch(`/api/products?barcode=${encodeURIComponent(barcode)}`);
-      const data = await response.json();
-      if (data.length > 0) {
-        addItem(data[0]);
-        toast.success(`Added ${data[0].name} to cart`);
-        setBarcodeInput('');
-      } else {
-        toast.error('Product not found');
+      let product = snapshotReady ? await findLocalByBarcode(barcode) : null;
+      if (!product) {
+        // Not synced yet (or no snapshot): ask the server
+        const response = await fetch(`/api/scan/${encodeURIComponent(barcode)}`);
+        if (response.status === 404) {
+          toast.error('Product not found');
+          return;
+        }
+        product = await response.json();
+      }
+      if (product.stock <= 0) {
+        toast.error(`${product.name} is out of stock`);
+        return;
       }
+      addItem(product);
+      toast.success(`Added ${product.name} to cart`);
+      setBarcodeInput('');
     } catch (error) {
       toast.error('Failed to search by barcode');
     }
   };
 
+  // Recognise a returning customer by WhatsApp number and fill in their name
+  const handleCustomerLookup = async () => {
+    const whatsapp = customerPhone.trim();
+    if (!whatsapp) return;
+    try {
+      const response = await fetch(`/api/customers/${encodeURIComponent(whatsapp)}?limit=1`);
+      if (!response.ok) return;
+      const customer = await response.json();
+      if (customer.visits > 0) setReturningCustomer(customer);
+      if (!customerName.trim() && customer.name) {
+        setCustomerName(customer.name);
+      }
+    } catch (error) {
+      // Offline or unknown number: carry on as a new customer
+    }
+  };
+
   // Handle barcode input
   const handleBarcodeInput = (e) => {
     if (e.key === 'Enter') {
@@ -112,18 +224,39 @@ export default function BillingPage() {
         items: items.map(item => ({
           productId: item.id,
           name: item.name,
+          category: item.category,
           price: item.sellPrice,
           qty: item.qty
         })),
-        subTotal,
-        grandTotal
+        // Informational; the server prices the bill from the items
+        subTotal: fromPaise(totals.subTotal),
+        grandTotal: fromPaise(totals.grandTotal),
+        // Lets the server drop a duplicate if this sale is retried or replayed
+        idempotencyKey: crypto.randomUUID(),
+        date: new Date().toISOString()
       };
 
-      const response = await fetch('/api/invoices', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(invoiceData)
-      });
+      let response;
+      try {
+        response = await fetch('/api/invoices', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json', 'Idempotency-Key': invoiceData.idempotencyKey },
+          body: JSON.stringify(invoiceData)
+        });
+      } catch (networkError) {
+        if (!isOfflineStoreAvailable()) throw networkError;
+        // No connection: keep the sale and send it when we are back online
+        await queueInvoice(invoiceData);
+        setQueuedInvoices(await countQueuedInvoices());
+        clearCart();
+        setCustomerName('');
+        setCustomerPhone('');
+        setReturningCustomer(null);
+        setDiscount(0);
+        setSearchResults([]);
+        toast.warning('Offline - invoice saved and will be sent when the connection returns');
+        return;
+      }
 
       const data = await response.json();
 
@@ -134,9 +267,15 @@ export default function BillingPage() {
         clearCart();
         setCustomerName('');
         setCustomerPhone('');
+        setReturningCustomer(null);
         setDiscount(0);
         setSearchResults([]);
         toast.success('Invoice created successfully!');
+      } else if (response.status === 409 && data.shortages) {
+        const details = data.shortages
+          .map(line => `${line.name}: ${line.available} left, ${line.requested} requested`)
+          .join('; ');
+        toast.error(`Insufficient stock - ${details}`);
       } else {
         toast.error('Failed to create invoice');
       }
@@ -175,9 +314,64 @@ export default function BillingPage() {
     <div className="space-y-6">
       <div className="flex items-center justify-between">
         <h1 className="text-3xl font-bold">Billing</h1>
-        <ShoppingBag className="h-8 w-8 text-primary" />
+        <div className="flex items-center gap-3">
+          {queuedInvoices > 0 && (
+            <span className="flex items-center gap-1 text-sm text-muted-foreground">
+              <CloudOff className="h-4 w-4" />
+              {queuedInvoices} invoice{queuedInvoices === 1 ? '' : 's'} waiting to sync
+            </span>
+          )}
+          <ShoppingBag className="h-8 w-8 text-primary" />
+        </div>
       </div>
 
+      {/* Offline bills the server refused */}
+      {failedInvoices.length > 0 && (
+        <Card className="border-red-300">
+          <CardHeader>
+            <CardTitle className="flex items-center gap-2 text-red-600">
+              <AlertTriangle className="h-5 w-5" />
+              Offline invoices needing attention ({failedInvoices.length})
+            </CardTitle>
+          </CardHeader>
+          <CardContent>
+            <Table>
+              <TableHeader>
+                <TableRow>
+                  <TableHead>Customer</TableHead>
+                  <TableHead>Queued</TableHead>
+                  <TableHead>Items</TableHead>
+                  <TableHead>Reason</TableHead>
+                  <TableHead>Action</TableHead>
+                </TableRow>
+              </TableHeader>
+              <TableBody>
+                {failedInvoices.map((invoice) => (
+                  <TableRow key={invoice.idempotencyKey}>
+                    <TableCell className="font-medium">{invoice.customer?.name || 'Walk-in'}</TableCell>
+                    <TableCell>{new Date(invoice.queuedAt).toLocaleString()}</TableCell>
+                    <TableCell>{(invoice.items || []).map((item) => `${item.name} x${item.qty}`).join(', ')}</TableCell>
+                    <TableCell className="text-red-600">{invoice.lastError?.error || 'Refused'}</TableCell>
+                    <TableCell>
+                      <div className="flex gap-2">
+                        <Button size="sm" variant="outline" onClick={() => handleRetryFailed(invoice.idempotencyKey)}>
+                          <RotateCcw className="h-4 w-4 mr-1" />
+                          Retry
+                        </Button>
+                        <Button size="sm" variant="destructive" onClick={() => handleDiscardFailed(invoice.idempotencyKey)}>
+                          <Trash2 className="h-4 w-4 mr-1" />
+                          Discard
+                        </Button>
+                      </div>
+                    </TableCell>
+                  </TableRow>
+                ))}
+              </TableBody>
+            </Table>
+          </CardContent>
+        </Card>
+      )}
+
       <div className="grid grid-cols-1 lg:grid-cols-3 gap-6">
         {/* Left Section - Product Search */}
         <div className="lg:col-span-2 space-y-6">
@@ -300,7 +494,7 @@ export default function BillingPage() {
                             </Button>
                           </div>
                         </TableCell>
-                        <TableCell className="font-semibold">₹{(item.sellPrice * item.qty).toFixed(2)}</TableCell>
+                        <TableCell className="font-semibold">₹{formatRupees(lineTotalPaise(item.sellPrice, item.qty))}</TableCell>
                         <TableCell>
                           <Button
                             size="sm"
@@ -342,11 +536,21 @@ export default function BillingPage() {
                   id="customerPhone"
                   placeholder="91XXXXXXXXXX"
                   value={customerPhone}
-                  onChange={(e) => setCustomerPhone(e.target.value)}
+                  onChange={(e) => {
+                    setCustomerPhone(e.target.value);
+                    setReturningCustomer(null);
+                  }}
+                  onBlur={handleCustomerLookup}
                 />
-                <p className="text-xs text-muted-foreground">
-                  Leave empty if you don't want to share via WhatsApp
-                </p>
+                {returningCustomer ? (
+                  <p className="text-xs text-muted-foreground">
+                    Returning customer - {returningCustomer.visits} visit{returningCustomer.visits === 1 ? '' : 's'}, ₹{(returningCustomer.lifetimeSpend || 0).toFixed(2)} spent
+                  </p>
+                ) : (
+                  <p className="text-xs text-muted-foreground">
+                    Leave empty if you don't want to share via WhatsApp
+                  </p>
+                )}
               </div>
               <div className="space-y-2">
                 <Label htmlFor="discount">Discount (%)</Label>
@@ -400,27 +604,27 @@ export default function BillingPage() {
               <div className="space-y-2">
                 <div className="flex justify-between">
                   <span className="text-muted-foreground">Subtotal:</span>
-                  <span className="font-semibold">₹{subTotal.toFixed(2)}</span>
+                  <span className="font-semibold">₹{formatRupees(totals.subTotal)}</span>
                 </div>
                 {discount > 0 && (
                   <div className="flex justify-between text-red-600">
                     <span>Discount ({discount}%):</span>
-                    <span>-₹{discountAmount.toFixed(2)}</span>
+                    <span>-₹{formatRupees(totals.discount)}</span>
                   </div>
                 )}
                 <div className="flex justify-between">
                   <span className="text-muted-foreground">Amount after discount:</span>
-                  <span className="font-semibold">₹{amountAfterDiscount.toFixed(2)}</span>
+                  <span className="font-semibold">₹{formatRupees(totals.taxable)}</span>
                 </div>
                 {gstPercent > 0 && (
                   <div className="flex justify-between">
                     <span>GST ({gstPercent}%):</span>
-                    <span>+₹{gstAmount.toFixed(2)}</span>
+                    <span>+₹{formatRupees(totals.gst)}</span>
                   </div>
                 )}
                 <div className="flex justify-between text-lg font-bold border-t pt-2">
                   <span>Grand Total:</span>
-                  <span>₹{grandTotal.toFixed(2)}</span>
+                  <span>₹{formatRupees(totals.grandTotal)}</span>
                 </div>
               </div>
 
@@ -8,11 +8,14 @@ import { Badge } from '@/components/ui/badge';
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '@/components/ui/table';
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, PieChart, Pie, Cell } from 'recharts';
 import { TrendingUp, IndianRupee, Percent, Calendar } from 'lucide-react';
-import { format } from 'date-fns';
+import { format, parseISO } from 'date-fns';
+
+const RANGE_DAYS = { '7': 7, '30': 30, '90': 90 };
 
 export default function DashboardPage() {
   const router = useRouter();
-  const [salesData, setSalesData] = useState([]);
+  const [report, setReport] = useState(null);
+  const [paymentReport, setPaymentReport] = useState(null);
   const [loading, setLoading] = useState(true);
   const [timeRange, setTimeRange] = useState('7'); // 7 days by default
 
@@ -23,22 +26,20 @@ export default function DashboardPage() {
   const fetchSalesData = async () => {
     setLoading(true);
     try {
-      const response = await fetch('/api/invoices');
-      const invoices = await response.json();
-      
-      // Filter by time range
-      const now = new Date();
-      const filteredInvoices = invoices.filter(invoice => {
-        const invoiceDate = new Date(invoice.date);
-        const daysDiff = (now - invoiceDate) / (1000 * 60 * 60 * 24);
-        
-        if (timeRange === '7') return daysDiff <= 7;
-        if (timeRange === '30') return daysDiff <= 30;
-        if (timeRange === '90') return daysDiff <= 90;
-        return true; // all time
-      });
-      
-      setSalesData(filteredInvoices);
+      // Totals and series are summarized on the server for the selected range
+      const params = new URLSearchParams();
+      if (RANGE_DAYS[timeRange]) {
+        const from = new Date(Date.now() - RANGE_DAYS[timeRange] * 24 * 60 * 60 * 1000);
+        params.append('from', from.toISOString());
+      }
+
+      const [dailyResponse, paymentResponse] = await Promise.all([
+        fetch(`/api/reports/sales?${params.toString()}&groupBy=day&recent=5`),
+        fetch(`/api/reports/sales?${params.toString()}&groupBy=paymentMode`),
+      ]);
+
+      setReport(await dailyResponse.json());
+      setPaymentReport(await paymentResponse.json());
     } catch (error) {
       console.error('Failed to fetch sales data:', error);
     } finally {
@@ -47,44 +48,30 @@ export default function DashboardPage() {
   };
 
   // Calculate metrics
-  const totalSales = salesData.reduce((sum, invoice) => sum + invoice.grandTotal, 0);
-  const totalDiscount = salesData.reduce((sum, invoice) => {
-    const discountAmount = invoice.subTotal * (invoice.discountPercent / 100);
-    return sum + discountAmount;
-  }, 0);
-  const totalInvoices = salesData.length;
+  const totals = report?.totals || { sales: 0, discount: 0, invoices: 0, discountedInvoices: 0 };
+  const totalSales = totals.sales;
+  const totalDiscount = totals.discount;
+  const totalInvoices = totals.invoices;
   
   // Calculate profit (assuming 30% margin for demo purposes)
   const totalProfit = totalSales * 0.3;
   
   // Prepare chart data
-  const dailySalesData = salesData.reduce((acc, invoice) => {
-    const date = format(new Date(invoice.date), 'MMM dd');
-    if (!acc[date]) {
-      acc[date] = { date, sales: 0, count: 0 };
-    }
-    acc[date].sales += invoice.grandTotal;
-    acc[date].count += 1;
-    return acc;
-  }, {});
-  
-  const chartData = Object.values(dailySalesData);
+  const chartData = (report?.series || []).map(point => ({
+    date: format(parseISO(point.key), 'MMM dd'),
+    sales: point.sales,
+    count: point.count,
+  }));
   
   // Payment method distribution
-  const paymentMethodData = salesData.reduce((acc, invoice) => {
-    const method = invoice.paymentMode || 'Cash';
-    if (!acc[method]) {
-      acc[method] = { name: method, value: 0 };
-    }
-    acc[method].value += 1;
-    return acc;
-  }, {});
-  
-  const paymentData = Object.values(paymentMethodData);
+  const paymentData = (paymentReport?.series || []).map(point => ({
+    name: point.key,
+    value: point.count,
+  }));
   const COLORS = ['#0088FE', '#00C49F', '#FFBB28', '#FF8042', '#8884D8'];
 
   // Recent invoices
-  const recentInvoices = salesData.slice(0, 5);
+  const recentInvoices = report?.recent || [];
 
   return (
     <div className="space-y-6">
@@ -152,7 +139,7 @@ export default function DashboardPage() {
           </CardHeader>
           <CardContent>
             <div className="text-2xl font-bold">₹{totalDiscount.toFixed(2)}</div>
-            <p className="text-xs text-muted-foreground">Across {salesData.filter(i => i.discountPercent > 0).length} invoices</p>
+            <p className="text-xs text-muted-foreground">Across {totals.discountedInvoices} invoices</p>
           </CardContent>
         </Card>
         
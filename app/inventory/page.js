@@ -1,6 +1,6 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useRouter } from 'next/navigation';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -9,9 +9,13 @@ import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '@
 import { Badge } from '@/components/ui/badge';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { toast } from 'sonner';
-import { Search, Plus, Edit, Trash2, Package, AlertTriangle, Filter } from 'lucide-react';
+import { Search, Plus, Edit, Trash2, Package, AlertTriangle, Filter, Upload, Download } from 'lucide-react';
 import Image from 'next/image';
 
+// Products fetched per page, and rows shown in the low-stock alert
+const PAGE_SIZE = 100;
+const LOW_STOCK_ALERT_LIMIT = 20;
+
 export default function InventoryPage() {
   const router = useRouter();
   const [products, setProducts] = useState([]);
@@ -22,46 +26,60 @@ export default function InventoryPage() {
   const [filterCategory, setFilterCategory] = useState('all');
   const [filterStock, setFilterStock] = useState('all');
   const [showFilters, setShowFilters] = useState(false);
+  const [isImporting, setIsImporting] = useState(false);
+  const importInput = useRef(null);
+
+  const [summary, setSummary] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchProducts();
   }, []);
 
+  // Query string for the current search and filters; the server does the
+  // filtering so only the visible page is downloaded.
+  const listParams = (query, category, stock, threshold) => {
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+    if (query) params.append('query', query);
+    if (category !== 'all') params.append('category', category);
+    if (stock === 'low') {
+      params.append('maxStock', String(threshold - 1));
+    } else if (stock === 'out') {
+      params.append('maxStock', '0');
+    } else if (stock === 'adequate') {
+      params.append('minStock', String(threshold));
+    }
+    return params;
+  };
+
+  // Category list, stock badges and the low-stock alert
+  const fetchSummary = async () => {
+    const response = await fetch('/api/products/summary');
+    if (!response.ok) throw new Error('Failed to fetch summary');
+    const data = await response.json();
+    setSummary(data);
+    setCategories(data.categories.map(({ category }) => category));
+
+    const lowStockResponse = await fetch(
+      `/api/products?maxStock=${data.lowStockThreshold - 1}&sort=stock&limit=${LOW_STOCK_ALERT_LIMIT}`
+    );
+    if (lowStockResponse.ok) {
+      setLowStockItems(await lowStockResponse.json());
+    }
+    return data;
+  };
+
   const fetchProducts = async (query = '', category = 'all', stock = 'all') => {
     setIsLoading(true);
     try {
-      let url = '/api/products';
-      const params = new URLSearchParams();
-      
-      if (query) params.append('query', query);
-      
-      const response = await fetch(url + (params.toString() ? `?${params.toString()}` : ''));
+      const { lowStockThreshold } = await fetchSummary();
+      const params = listParams(query, category, stock, lowStockThreshold);
+      const response = await fetch(`/api/products?${params.toString()}`);
       const data = await response.json();
-      
-      // Apply category filter
-      let filteredData = data;
-      if (category !== 'all') {
-        filteredData = filteredData.filter(product => product.category === category);
-      }
-      
-      // Apply stock filter
-      if (stock === 'low') {
-        filteredData = filteredData.filter(product => product.stock < 10);
-      } else if (stock === 'out') {
-        filteredData = filteredData.filter(product => product.stock === 0);
-      } else if (stock === 'adequate') {
-        filteredData = filteredData.filter(product => product.stock >= 10);
-      }
-      
-      setProducts(filteredData);
-      
-      // Get unique categories
-      const uniqueCategories = [...new Set(data.map(product => product.category))];
-      setCategories(uniqueCategories);
-      
-      // Filter low stock items (less than 10)
-      const lowStock = filteredData.filter(product => product.stock < 10);
-      setLowStockItems(lowStock);
+
+      setProducts(data);
+      setNextCursor(response.headers.get('X-Next-Cursor'));
     } catch (error) {
       toast.error('Failed to fetch products');
     } finally {
@@ -69,11 +87,25 @@ export default function InventoryPage() {
     }
   };
 
-  const handleSearch = () => {
-    fetchProducts(searchQuery, filterCategory, filterStock);
+  const loadMore = async () => {
+    if (!nextCursor || !summary) return;
+    setIsLoadingMore(true);
+    try {
+      const params = listParams(searchQuery, filterCategory, filterStock, summary.lowStockThreshold);
+      params.append('cursor', nextCursor);
+      const response = await fetch(`/api/products?${params.toString()}`);
+      const data = await response.json();
+
+      setProducts(previous => [...previous, ...data]);
+      setNextCursor(response.headers.get('X-Next-Cursor'));
+    } catch (error) {
+      toast.error('Failed to fetch products');
+    } finally {
+      setIsLoadingMore(false);
+    }
   };
 
-  const handleFilterChange = () => {
+  const handleSearch = () => {
     fetchProducts(searchQuery, filterCategory, filterStock);
   };
 
@@ -137,6 +169,59 @@ export default function InventoryPage() {
     }
   };
 
+  // Streams the chosen CSV/NDJSON file to the import endpoint and follows its progress
+  const handleImport = async (e) => {
+    const file = e.target.files?.[0];
+    e.target.value = '';
+    if (!file) return;
+
+    setIsImporting(true);
+    const toastId = toast.loading(`Importing ${file.name}...`);
+    try {
+      const format = /\.(ndjson|jsonl)$/i.test(file.name) ? 'ndjson' : 'csv';
+      const response = await fetch(`/api/products/import?format=${format}`, { method: 'POST', body: file });
+      if (!response.ok || !response.body) {
+        toast.error('Import failed', { id: toastId });
+        return;
+      }
+
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+      const rowErrors = [];
+      let buffered = '';
+      let summary = null;
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += value;
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        for (const line of lines.filter(Boolean)) {
+          const event = JSON.parse(line);
+          if (event.type === 'error') rowErrors.push(event);
+          if (event.type === 'progress') toast.loading(`Imported ${event.inserted} of ${event.processed} rows...`, { id: toastId });
+          if (event.type === 'done') summary = event;
+          if (event.type === 'failed') throw new Error(event.error);
+        }
+      }
+
+      if (summary) {
+        toast.success(`Imported ${summary.inserted} products${summary.failed ? `, ${summary.failed} rows skipped` : ''}`, { id: toastId });
+      } else {
+        toast.error('Import did not finish', { id: toastId });
+      }
+      if (rowErrors.length > 0) {
+        console.warn('Rows not imported:', rowErrors);
+        const first = rowErrors.slice(0, 3).map(error => `row ${error.row}: ${error.error}`).join('; ');
+        toast.error(`Skipped rows - ${first}${rowErrors.length > 3 ? ` and ${rowErrors.length - 3} more` : ''}`);
+      }
+      fetchProducts(searchQuery, filterCategory, filterStock);
+    } catch (error) {
+      toast.error(`Import failed: ${error.message}`, { id: toastId });
+    } finally {
+      setIsImporting(false);
+    }
+  };
+
   return (
     <div className="space-y-6">
       <div className="flex items-center justify-between">
@@ -144,10 +229,27 @@ export default function InventoryPage() {
           <Package className="h-8 w-8 text-primary" />
           <h1 className="text-3xl font-bold">Inventory Management</h1>
         </div>
-        <Button onClick={() => router.push('/inventory/new')}>
-          <Plus className="h-4 w-4 mr-2" />
-          Add Product
-        </Button>
+        <div className="flex gap-2">
+          <input
+            ref={importInput}
+            type="file"
+            accept=".csv,.ndjson,.jsonl"
+            className="hidden"
+            onChange={handleImport}
+          />
+          <Button variant="outline" disabled={isImporting} onClick={() => importInput.current?.click()}>
+            <Upload className="h-4 w-4 mr-2" />
+            {isImporting ? 'Importing...' : 'Import'}
+          </Button>
+          <Button variant="outline" onClick={() => window.open('/api/products/export?format=csv', '_blank')}>
+            <Download className="h-4 w-4 mr-2" />
+            Export
+          </Button>
+          <Button onClick={() => router.push('/inventory/new')}>
+            <Plus className="h-4 w-4 mr-2" />
+            Add Product
+          </Button>
+        </div>
       </div>
 
       {/* Low Stock Notifications */}
@@ -156,7 +258,7 @@ export default function InventoryPage() {
           <CardHeader>
             <CardTitle className="flex items-center gap-2">
               <AlertTriangle className="h-5 w-5 text-yellow-600" />
-              Low Stock Alert ({lowStockItems.length})
+              Low Stock Alert ({summary?.lowStock ?? lowStockItems.length})
             </CardTitle>
           </CardHeader>
           <CardContent>
@@ -221,7 +323,7 @@ export default function InventoryPage() {
                   <label className="text-sm font-medium mb-1 block">Category</label>
                   <Select value={filterCategory} onValueChange={(value) => {
                     setFilterCategory(value);
-                    handleFilterChange();
+                    fetchProducts(searchQuery, value, filterStock);
                   }}>
                     <SelectTrigger>
                       <SelectValue placeholder="Select category" />
@@ -239,15 +341,15 @@ export default function InventoryPage() {
                   <label className="text-sm font-medium mb-1 block">Stock Status</label>
                   <Select value={filterStock} onValueChange={(value) => {
                     setFilterStock(value);
-                    handleFilterChange();
+                    fetchProducts(searchQuery, filterCategory, value);
                   }}>
                     <SelectTrigger>
                       <SelectValue placeholder="Select stock status" />
                     </SelectTrigger>
                     <SelectContent>
                       <SelectItem value="all">All Stock</SelectItem>
-                      <SelectItem value="adequate">Adequate Stock (10+)</SelectItem>
-                      <SelectItem value="low">Low Stock (&lt; 10)</SelectItem>
+                      <SelectItem value="adequate">Adequate Stock ({summary?.lowStockThreshold ?? 10}+)</SelectItem>
+                      <SelectItem value="low">Low Stock (&lt; {summary?.lowStockThreshold ?? 10})</SelectItem>
                       <SelectItem value="out">Out of Stock (0)</SelectItem>
                     </SelectContent>
                   </Select>
@@ -274,7 +376,16 @@ export default function InventoryPage() {
       {/* Products Table */}
       <Card>
         <CardHeader>
-          <CardTitle>Products ({products.length})</CardTitle>
+          <CardTitle>
+            Products ({summary && searchQuery === '' && filterCategory === 'all' && filterStock === 'all' ? summary.total : products.length})
+          </CardTitle>
+          {summary && (
+            <div className="flex flex-wrap gap-2 pt-2">
+              <Badge variant="secondary">{summary.units} units in stock</Badge>
+              <Badge variant="outline">Low stock: {summary.lowStock}</Badge>
+              <Badge variant="destructive">Out of stock: {summary.outOfStock}</Badge>
+            </div>
+          )}
         </CardHeader>
         <CardContent>
           {isLoading ? (
@@ -320,7 +431,7 @@ export default function InventoryPage() {
                       <TableCell>₹{product.sellPrice}</TableCell>
                       <TableCell>
                         <img
-                          src={`/api/products/${product.id}/barcode`}
+                          src={`/api/barcodes/${encodeURIComponent(product.barcode)}`}
                           alt="Barcode"
                           className="h-8"
                         />
@@ -347,6 +458,13 @@ export default function InventoryPage() {
                   ))}
                 </TableBody>
               </Table>
+              {nextCursor && (
+                <div className="flex justify-center pt-4">
+                  <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+                    {isLoadingMore ? 'Loading...' : 'Load More'}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </CardContent>
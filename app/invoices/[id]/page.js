@@ -6,7 +6,8 @@ import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '@/components/ui/table';
 import { toast } from 'sonner';
-import { ArrowLeft, FileText, Download } from 'lucide-react';
+import { ArrowLeft, FileText, Download, Share2 } from 'lucide-react';
+import { formatRupees, invoiceTotals, lineTotalPaise } from '@/lib/pricing.mjs';
 
 export default function InvoiceViewPage() {
   const router = useRouter();
@@ -39,6 +40,20 @@ export default function InvoiceViewPage() {
     window.open(`/api/invoices/${params.id}/pdf-${type}`, '_blank');
   };
 
+  const shareOnWhatsApp = async () => {
+    try {
+      const response = await fetch(`/api/invoices/${params.id}/whatsapp`);
+      if (!response.ok) {
+        toast.error('Failed to prepare WhatsApp message');
+        return;
+      }
+      const { whatsappLink } = await response.json();
+      window.open(whatsappLink, '_blank');
+    } catch (error) {
+      toast.error('Failed to prepare WhatsApp message');
+    }
+  };
+
   if (isLoading) {
     return (
       <div className="flex items-center justify-center h-96">
@@ -51,6 +66,8 @@ export default function InvoiceViewPage() {
     return null;
   }
 
+  const totals = invoiceTotals(invoice);
+
   return (
     <div className="max-w-4xl mx-auto space-y-6">
       <div className="flex items-center justify-between">
@@ -72,6 +89,12 @@ export default function InvoiceViewPage() {
             <Download className="h-4 w-4 mr-2" />
             Thermal PDF
           </Button>
+          {invoice.customer?.whatsapp && (
+            <Button variant="outline" onClick={shareOnWhatsApp}>
+              <Share2 className="h-4 w-4 mr-2" />
+              WhatsApp
+            </Button>
+          )}
         </div>
       </div>
 
@@ -137,7 +160,7 @@ export default function InvoiceViewPage() {
                   <TableCell className="text-right">₹{item.price.toFixed(2)}</TableCell>
                   <TableCell className="text-right">{item.qty}</TableCell>
                   <TableCell className="text-right font-semibold">
-                    ₹{(item.price * item.qty).toFixed(2)}
+                    ₹{formatRupees(lineTotalPaise(item.price, item.qty))}
                   </TableCell>
                 </TableRow>
               ))}
@@ -154,17 +177,23 @@ export default function InvoiceViewPage() {
         <CardContent className="space-y-3">
           <div className="flex justify-between">
             <span className="text-muted-foreground">Subtotal</span>
-            <span className="font-semibold">₹{invoice.subTotal.toFixed(2)}</span>
+            <span className="font-semibold">₹{totals.subTotal.toFixed(2)}</span>
           </div>
           {invoice.discountPercent > 0 && (
             <div className="flex justify-between text-red-600">
               <span>Discount ({invoice.discountPercent}%)</span>
-              <span>-₹{(invoice.subTotal * invoice.discountPercent / 100).toFixed(2)}</span>
+              <span>-₹{totals.discount.toFixed(2)}</span>
+            </div>
+          )}
+          {invoice.gstPercent > 0 && (
+            <div className="flex justify-between">
+              <span>GST ({invoice.gstPercent}%)</span>
+              <span>+₹{totals.gst.toFixed(2)}</span>
             </div>
           )}
           <div className="flex justify-between text-lg font-bold border-t pt-3">
             <span>Grand Total</span>
-            <span>₹{invoice.grandTotal.toFixed(2)}</span>
+            <span>₹{totals.grandTotal.toFixed(2)}</span>
           </div>
         </CardContent>
       </Card>
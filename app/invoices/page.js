@@ -11,17 +11,25 @@ import { FileText, Eye } from 'lucide-react';
 export default function InvoicesPage() {
   const router = useRouter();
   const [invoices, setInvoices] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchInvoices();
   }, []);
 
-  const fetchInvoices = async () => {
+  // Pages through the history newest first; the server returns the next page
+  // token in the X-Next-Cursor header.
+  const fetchInvoices = async (cursor = null) => {
     try {
-      const response = await fetch('/api/invoices');
+      const params = new URLSearchParams({ limit: '50' });
+      if (cursor) params.append('cursor', cursor);
+
+      const response = await fetch(`/api/invoices?${params.toString()}`);
       const data = await response.json();
-      setInvoices(data);
+      setInvoices(prev => (cursor ? [...prev, ...data] : data));
+      setNextCursor(response.headers.get('X-Next-Cursor'));
     } catch (error) {
       toast.error('Failed to fetch invoices');
     } finally {
@@ -29,6 +37,12 @@ export default function InvoicesPage() {
     }
   };
 
+  const loadMore = async () => {
+    setIsLoadingMore(true);
+    await fetchInvoices(nextCursor);
+    setIsLoadingMore(false);
+  };
+
   return (
     <div className="space-y-6">
       <div className="flex items-center justify-between">
@@ -40,7 +54,7 @@ export default function InvoicesPage() {
 
       <Card>
         <CardHeader>
-          <CardTitle>All Invoices ({invoices.length})</CardTitle>
+          <CardTitle>Invoices ({invoices.length}{nextCursor ? '+' : ''})</CardTitle>
         </CardHeader>
         <CardContent>
           {isLoading ? (
@@ -84,7 +98,7 @@ export default function InvoicesPage() {
                           )}
                         </div>
                       </TableCell>
-                      <TableCell>{invoice.items.length}</TableCell>
+                      <TableCell>{invoice.itemCount ?? invoice.items?.length ?? 0}</TableCell>
                       <TableCell>
                         {invoice.discountPercent > 0 ? `${invoice.discountPercent}%` : '-'}
                       </TableCell>
@@ -104,6 +118,13 @@ export default function InvoicesPage() {
                   ))}
                 </TableBody>
               </Table>
+              {nextCursor && (
+                <div className="flex justify-center pt-4">
+                  <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+                    {isLoadingMore ? 'Loading...' : 'Load More'}
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </CardContent>
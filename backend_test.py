@@ -4,13 +4,17 @@ Comprehensive Backend API Tests for Jewelry POS System
 Tests all backend APIs: Products, Invoices, Settings, Barcode, PDF generation
 """
 
+import os
 import requests
 import json
 import time
 from typing import Dict, Any, Optional
 
 # Base URL from environment
-BASE_URL = "https://posmate-4.preview.emergentagent.com/api"
+BASE_URL = os.environ.get("BASE_URL", "http://localhost:3000/api").rstrip("/")
+
+# One pooled session for every call, so requests reuse keep-alive connections
+session = requests.Session()
 
 # Test data storage
 test_data = {
@@ -33,7 +37,7 @@ def make_request(method: str, endpoint: str, **kwargs) -> tuple[bool, Optional[D
     """Make HTTP request and return (success, response_data, error_message)"""
     url = f"{BASE_URL}{endpoint}"
     try:
-        response = requests.request(method, url, timeout=30, **kwargs)
+        response = session.request(method, url, timeout=30, **kwargs)
         
         # Check if response is JSON
         try:
@@ -295,7 +299,7 @@ def test_barcode_generation():
     url = f"{BASE_URL}/products/{product_id}/barcode"
     
     try:
-        response = requests.get(url, timeout=30)
+        response = session.get(url, timeout=30)
         
         if response.status_code == 200:
             content_type = response.headers.get('Content-Type', '')
@@ -453,7 +457,7 @@ def test_pdf_generation_a4():
     url = f"{BASE_URL}/invoices/{invoice_id}/pdf-a4"
     
     try:
-        response = requests.get(url, timeout=30)
+        response = session.get(url, timeout=30)
         
         if response.status_code == 200:
             content_type = response.headers.get('Content-Type', '')
@@ -487,7 +491,7 @@ def test_pdf_generation_thermal():
     url = f"{BASE_URL}/invoices/{invoice_id}/pdf-thermal"
     
     try:
-        response = requests.get(url, timeout=30)
+        response = session.get(url, timeout=30)
         
         if response.status_code == 200:
             content_type = response.headers.get('Content-Type', '')
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Load tests and benchmarks for the Jewelry POS API
+Seeds a catalogue, drives a mixed counter workload (scans, searches, checkouts,
+PDF downloads, dashboard loads) from concurrent workers and reports throughput
+and p50/p95/p99 latency per endpoint. With a stored baseline, a run fails when
+an endpoint is slower or less successful than allowed.
+
+Point the server at a throwaway database (e.g. DB_NAME=jewelry_pos_bench) and run:
+    BASE_URL=http://localhost:3000/api python benchmark.py --save-baseline
+    BASE_URL=http://localhost:3000/api python benchmark.py
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from requests.adapters import HTTPAdapter
+
+from backend_test import BASE_URL, make_request, session
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+CATEGORIES = ["Rings", "Chains", "Bangles", "Earrings", "Pendants", "Bracelets", "Anklets", "Necklaces"]
+WORDS = ["Gold", "Silver", "Diamond", "Ruby", "Pearl", "Emerald", "Classic", "Bridal", "Daily", "Antique"]
+
+# Range the dashboard page opens with (its "last 7 days" default).
+DASHBOARD_RANGE_DAYS = 7
+
+# Share of requests per workload; roughly what a busy counter produces.
+WORKLOAD_MIX = {
+    "scan": 40,
+    "search": 25,
+    "checkout": 15,
+    "pdf": 10,
+    "dashboard": 10,
+}
+
+# ============================================================================
+# SEEDING
+# ============================================================================
+
+def seed_products(count: int, prefix: str) -> List[Dict]:
+    """Create `count` products through the bulk import endpoint and return them"""
+    rows = ["code,name,category,stock,mrp,sellPrice"]
+    for i in range(count):
+        name = f"{random.choice(WORDS)} {random.choice(WORDS)} {random.choice(CATEGORIES)[:-1]} {i}"
+        price = random.randint(5, 500) * 100
+        rows.append(f"{prefix}-{i:05d},{name},{random.choice(CATEGORIES)},1000000,{price + 500},{price}")
+
+    success, _, error = make_request(
+        "POST", "/products/import?format=csv",
+        data="\n".join(rows).encode(), headers={"Content-Type": "text/csv"}
+    )
+    if not success:
+        raise RuntimeError(f"Seeding failed: {error}")
+
+    success, products, error = make_request("GET", f"/products?query={prefix}&limit=200")
+    if not success or not products:
+        raise RuntimeError(f"Seeded products not found: {error}")
+    # The search is paged; the first page is plenty to draw workloads from
+    return products
+
+def seed_invoices(products: List[Dict], count: int) -> List[str]:
+    """Create a few invoices so PDF downloads have something to render"""
+    invoice_ids = []
+    for _ in range(count):
+        success, data, _ = make_request("POST", "/invoices", json=checkout_body(products))
+        if success and data:
+            invoice_ids.append(data["invoice"]["id"])
+    return invoice_ids
+
+def checkout_body(products: List[Dict]) -> Dict:
+    lines = random.sample(products, k=min(len(products), random.randint(1, 4)))
+    items = [
+        {"productId": p["id"], "name": p["name"], "qty": random.randint(1, 2), "price": p["sellPrice"]}
+        for p in lines
+    ]
+    sub_total = sum(item["qty"] * item["price"] for item in items)
+    return {
+        "customer": {"name": "Bench Customer", "whatsapp": f"98{random.randint(10000000, 99999999)}"},
+        "items": items,
+        "discountPercent": 0,
+        "gstPercent": 3,
+        "subTotal": sub_total,
+        "grandTotal": round(sub_total * 1.03, 2),
+        "paymentMode": random.choice(["Cash", "Card", "UPI"]),
+        "idempotencyKey": str(uuid.uuid4()),
+    }
+
+# ============================================================================
+# WORKLOADS
+# ============================================================================
+
+class Workloads:
+    """One request per call, timed by the runner"""
+
+    def __init__(self, products: List[Dict], invoice_ids: List[str]):
+        self.products = products
+        self.invoice_ids = invoice_ids
+        self.lock = threading.Lock()
+        # The dashboard page fetches its two reports in parallel
+        self.page_pool = ThreadPoolExecutor(max_workers=32)
+
+    def scan(self):
+        product = random.choice(self.products)
+        return make_request("GET", f"/scan/{product['barcode']}")
+
+    def search(self):
+        product = random.choice(self.products)
+        words = product["name"].split()
+        query = " ".join(word[:random.randint(2, len(word))] for word in words[:2])
+        return make_request("GET", "/products", params={"query": query, "limit": 20})
+
+    def checkout(self):
+        result = make_request("POST", "/invoices", json=checkout_body(self.products))
+        if result[0] and result[1]:
+            with self.lock:
+                self.invoice_ids.append(result[1]["invoice"]["id"])
+        return result
+
+    def pdf(self):
+        with self.lock:
+            invoice_id = random.choice(self.invoice_ids)
+        template = random.choice(["pdf-a4", "pdf-thermal"])
+        return make_request("GET", f"/invoices/{invoice_id}/{template}")
+
+    def dashboard(self):
+        # Same two reports app/dashboard/page.js requests, fetched in
+        # parallel as the page does; timed as one page load
+        since = (datetime.now(timezone.utc) - timedelta(days=DASHBOARD_RANGE_DAYS)).isoformat()
+        requests_made = [
+            self.page_pool.submit(make_request, "GET", "/reports/sales", params={"from": since, "groupBy": "day", "recent": 5}),
+            self.page_pool.submit(make_request, "GET", "/reports/sales", params={"from": since, "groupBy": "paymentMode"}),
+        ]
+        results = [future.result() for future in requests_made]
+        return next((result for result in results if not result[0]), results[0])
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_load(workloads: Workloads, concurrency: int, duration: float, warmup: float) -> Dict[str, Dict]:
+    """Run the mix from `concurrency` workers; returns stats per workload"""
+    names = list(WORKLOAD_MIX)
+    weights = [WORKLOAD_MIX[name] for name in names]
+    samples: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    lock = threading.Lock()
+
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    def worker():
+        rng = random.Random()
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            name = rng.choices(names, weights)[0]
+            t0 = time.perf_counter()
+            success, _, _ = getattr(workloads, name)()
+            elapsed = time.perf_counter() - t0
+            if t0 < measure_from:
+                continue
+            with lock:
+                if success:
+                    samples[name].append(elapsed)
+                else:
+                    errors[name] += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+
+    stats = {}
+    for name in names:
+        values = sorted(samples[name])
+        total = len(values) + errors[name]
+        if total == 0:
+            continue
+        stats[name] = {
+            "requests": total,
+            "rps": round(total / duration, 2),
+            "errorRate": round(errors[name] / total, 4),
+            "p50Ms": round(percentile(values, 0.50) * 1000, 1),
+            "p95Ms": round(percentile(values, 0.95) * 1000, 1),
+            "p99Ms": round(percentile(values, 0.99) * 1000, 1),
+        }
+    return stats
+
+def compare_with_baseline(stats: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Regressions beyond tolerance, as readable messages"""
+    regressions = []
+    for name, base in baseline.get("endpoints", {}).items():
+        current = stats.get(name)
+        if not current:
+            regressions.append(f"{name}: no requests completed")
+            continue
+        for metric in ("p95Ms", "p99Ms"):
+            # Small absolute differences are noise, whatever the ratio
+            limit = max(base[metric] * (1 + tolerance), base[metric] + 5)
+            if current[metric] > limit:
+                regressions.append(f"{name}: {metric} {current[metric]}ms > {limit:.1f}ms (baseline {base[metric]}ms)")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {current['rps']}/s < baseline {base['rps']}/s")
+        if current["errorRate"] > base["errorRate"] + 0.01:
+            regressions.append(f"{name}: error rate {current['errorRate']:.2%} (baseline {base['errorRate']:.2%})")
+    return regressions
+
+def print_stats(stats: Dict, baseline: Optional[Dict]):
+    print(f"\n{'endpoint':<12}{'req':>8}{'req/s':>9}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, s in stats.items():
+        line = f"{name:<12}{s['requests']:>8}{s['rps']:>9}{s['errorRate']*100:>6.1f}%{s['p50Ms']:>8}ms{s['p95Ms']:>7}ms{s['p99Ms']:>7}ms"
+        base = (baseline or {}).get("endpoints", {}).get(name)
+        if base:
+            line += f"   (baseline p95 {base['p95Ms']}ms, {base['rps']}/s)"
+        print(line)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("BENCH_CONCURRENCY", "16")))
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds measured per run")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds of load before measuring")
+    parser.add_argument("--products", type=int, default=500, help="Products to seed")
+    parser.add_argument("--baseline", default=os.environ.get("BENCH_BASELINE", DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%)")
+    args = parser.parse_args()
+    if not os.environ.get("BASE_URL"):
+        # The benchmark writes hundreds of products and invoices; never aim it at a default
+        parser.error("set BASE_URL to the API of a server with a throwaway database, e.g. BASE_URL=http://localhost:3000/api")
+
+    # make_request shares one session; let every worker keep a connection
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=args.concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    print(f"Base URL: {BASE_URL}")
+    prefix = f"BENCH{uuid.uuid4().hex[:6].upper()}"
+    products = seed_products(args.products, prefix)
+    invoice_ids = seed_invoices(products, 20)
+    if not invoice_ids:
+        print("❌ Could not create invoices to benchmark against")
+        return 1
+    print(f"Seeded {args.products} products ({prefix}-*) and {len(invoice_ids)} invoices")
+    print(f"Running {args.concurrency} workers for {args.duration:.0f}s after {args.warmup:.0f}s warm-up...")
+
+    stats = run_load(Workloads(products, invoice_ids), args.concurrency, args.duration, args.warmup)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_stats(stats, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "recordedAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "concurrency": args.concurrency,
+                "duration": args.duration,
+                "endpoints": stats,
+            }, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not baseline:
+        print("\nNo baseline found; run with --save-baseline to record one")
+        return 0
+    if baseline.get("concurrency") != args.concurrency:
+        print(f"\n⚠️  Baseline was recorded with {baseline.get('concurrency')} workers, this run used {args.concurrency}")
+
+    regressions = compare_with_baseline(stats, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print("\n✅ No regressions against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,12 @@
+// Runs once when the Next.js server starts.
+export async function register() {
+  if (process.env.NEXT_RUNTIME !== 'nodejs') return;
+
+  const { runStartupMigrations, warmUp } = await import('@/lib/warmup');
+  // Next.js serves requests only once register resolves.
+  await runStartupMigrations();
+
+  if (process.env.DB_WARMUP === 'false') return;
+  // Not awaited: requests that arrive meanwhile join the same connect.
+  warmUp();
+}
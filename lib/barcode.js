@@ -1,19 +1,53 @@
 import bwipjs from 'bwip-js';
+import { createHash } from 'crypto';
+import { promises as fs } from 'fs';
+import path from 'path';
+import { LRUCache } from '@/lib/cache';
 
-export async function generateBarcode(text, format = 'code128') {
+export const BARCODE_FORMATS = ['code128', 'code39', 'ean13', 'ean8', 'upca', 'qrcode'];
+
+const DEFAULT_OPTIONS = { format: 'code128', scale: 3, height: 10 };
+
+// Sizes accepted from clients; anything larger only costs memory and CPU.
+export const BARCODE_SCALE_RANGE = [1, 5];
+export const BARCODE_HEIGHT_RANGE = [5, 30];
+
+// Raised for text the format cannot encode (e.g. letters in an EAN-13).
+export class InvalidBarcodeError extends Error {
+  constructor(message) {
+    super(message);
+    this.name = 'InvalidBarcodeError';
+  }
+}
+
+// Rendered barcodes are deterministic for (text, format, scale, height), so
+// they are cached in memory under a hash of those inputs. Product labels at
+// the default size are also kept on disk; the set of those is bounded by the
+// catalogue, unlike arbitrary text from GET /api/barcodes/:text.
+const CACHE_DIR = process.env.BARCODE_CACHE_DIR || path.join(process.cwd(), '.cache', 'barcodes');
+
+const memoryCache = new LRUCache({
+  maxEntries: parseInt(process.env.BARCODE_CACHE_ENTRIES || '5000', 10),
+  maxSize: 64 * 1024 * 1024,
+  sizeOf: (png) => png.length,
+});
+
+// Renders already in progress, so a sheet of identical labels triggers one render.
+const pending = new Map();
+
+export async function generateBarcode(text, format = 'code128', { scale = 3, height = 10 } = {}) {
   try {
     const png = await bwipjs.toBuffer({
       bcid: format,
       text: text,
-      scale: 3,
-      height: 10,
+      scale,
+      height,
       includetext: false,
     });
 
     return png;
   } catch (error) {
-    console.error('Barcode generation error:', error);
-    throw new Error('Failed to generate barcode');
+    throw new InvalidBarcodeError(`Cannot encode "${text}" as ${format}: ${error.message || error}`);
   }
 }
 
@@ -21,9 +55,91 @@ export function generateBarcodeBase64(png) {
   return `data:image/png;base64,${png.toString('base64')}`;
 }
 
+export function barcodeCacheKey(text, options = {}) {
+  const { format, scale, height } = { ...DEFAULT_OPTIONS, ...options };
+  return createHash('sha1').update(`${format}|${scale}|${height}|${text}`).digest('hex');
+}
+
+async function readFromDisk(key) {
+  try {
+    return await fs.readFile(path.join(CACHE_DIR, `${key}.png`));
+  } catch (error) {
+    return null;
+  }
+}
+
+async function writeToDisk(key, png) {
+  try {
+    await fs.mkdir(CACHE_DIR, { recursive: true });
+    // Write then rename so a concurrent reader never sees a half-written file.
+    const tmpFile = path.join(CACHE_DIR, `${key}.${process.pid}.tmp`);
+    await fs.writeFile(tmpFile, png);
+    await fs.rename(tmpFile, path.join(CACHE_DIR, `${key}.png`));
+  } catch (error) {
+    console.error('Barcode cache write error:', error);
+  }
+}
+
+function isDefaultSize({ format, scale, height }) {
+  return format === DEFAULT_OPTIONS.format && scale === DEFAULT_OPTIONS.scale && height === DEFAULT_OPTIONS.height;
+}
+
+// Returns { png, etag } from memory, then disk, rendering only on a miss.
+// Pass persist: true for product barcodes to keep default-size renders on disk.
+export async function getBarcode(text, options = {}) {
+  const { format, scale, height, persist = false } = { ...DEFAULT_OPTIONS, ...options };
+  const key = barcodeCacheKey(text, { format, scale, height });
+  const onDisk = persist && isDefaultSize({ format, scale, height });
+  const etag = `"${key}"`;
+
+  const cached = memoryCache.get(key);
+  if (cached) return { png: cached, etag };
+
+  if (!pending.has(key)) {
+    pending.set(key, (async () => {
+      let png = onDisk ? await readFromDisk(key) : null;
+      if (!png) {
+        png = await generateBarcode(text, format, { scale, height });
+        if (onDisk) writeToDisk(key, png);
+      }
+      memoryCache.set(key, png);
+      return png;
+    })().finally(() => pending.delete(key)));
+  }
+
+  return { png: await pending.get(key), etag };
+}
+
+// Warms the cache for a newly created product without holding up the response.
+export function prerenderBarcode(text, options = {}) {
+  setImmediate(() => {
+    getBarcode(text, { ...options, persist: true }).catch((error) => console.error('Barcode prerender error:', error));
+  });
+}
+
 export function generateUniqueCode() {
   const prefix = 'JWL';
   const timestamp = Date.now().toString(36).toUpperCase();
   const random = Math.random().toString(36).substring(2, 6).toUpperCase();
   return `${prefix}${timestamp}${random}`;
 }
+
+// Code generator for bulk imports, producing the same shape as
+// generateUniqueCode. The four trailing characters count up from a random
+// start instead of being drawn independently, so codes from one import never
+// collide with each other. Independent draws would collide at a few thousand
+// codes per millisecond.
+const CODE_SUFFIX_SPACE = 36 ** 4;
+
+export function createCodeSequence() {
+  const prefix = `JWL${Date.now().toString(36).toUpperCase()}`;
+  const start = Math.floor(Math.random() * CODE_SUFFIX_SPACE);
+  let issued = 0;
+  return () => {
+    if (issued >= CODE_SUFFIX_SPACE) {
+      throw new Error(`Cannot generate more than ${CODE_SUFFIX_SPACE} codes in one import`);
+    }
+    const suffix = ((start + issued++) % CODE_SUFFIX_SPACE).toString(36).toUpperCase().padStart(4, '0');
+    return `${prefix}${suffix}`;
+  };
+}
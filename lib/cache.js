@@ -0,0 +1,51 @@
+// Small LRU keyed by string. A Map keeps insertion order, so re-inserting on
+// every hit leaves the least recently used entry at the front. Entries can be
+// bounded by count and, when a size function is given, by total size.
+export class LRUCache {
+  constructor({ maxEntries = 1000, maxSize = Infinity, sizeOf = () => 0 } = {}) {
+    this.maxEntries = maxEntries;
+    this.maxSize = maxSize;
+    this.sizeOf = sizeOf;
+    this.size = 0;
+    this.entries = new Map();
+  }
+
+  get(key) {
+    if (!this.entries.has(key)) return undefined;
+    const value = this.entries.get(key);
+    this.entries.delete(key);
+    this.entries.set(key, value);
+    return value;
+  }
+
+  has(key) {
+    return this.entries.has(key);
+  }
+
+  set(key, value) {
+    this.delete(key);
+    const size = this.sizeOf(value);
+    if (size > this.maxSize) return;
+
+    this.entries.set(key, value);
+    this.size += size;
+    while (this.entries.size > this.maxEntries || this.size > this.maxSize) {
+      this.delete(this.entries.keys().next().value);
+    }
+  }
+
+  delete(key) {
+    if (!this.entries.has(key)) return;
+    this.size -= this.sizeOf(this.entries.get(key));
+    this.entries.delete(key);
+  }
+
+  clear() {
+    this.entries.clear();
+    this.size = 0;
+  }
+
+  get count() {
+    return this.entries.size;
+  }
+}
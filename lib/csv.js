@@ -0,0 +1,77 @@
+// RFC 4180 CSV helpers.
+
+function escapeField(value) {
+  if (value === null || value === undefined) return '';
+  const text = String(value);
+  return /[",\r\n]/.test(text) ? `"${text.replace(/"/g, '""')}"` : text;
+}
+
+export function toCsvRow(values) {
+  return `${values.map(escapeField).join(',')}\r\n`;
+}
+
+// Streaming RFC 4180 parser. Takes an async iterable of text chunks and yields
+// one array of fields per record; quoted fields may span chunks and lines.
+export async function* parseCsv(chunks) {
+  let row = [];
+  let field = '';
+  let inQuotes = false;
+  // Saw a quote inside a quoted field: either an escaped quote or the end
+  let quoteSeen = false;
+
+  for await (const chunk of chunks) {
+    for (let i = 0; i < chunk.length; i++) {
+      const ch = chunk[i];
+      if (inQuotes) {
+        if (quoteSeen) {
+          quoteSeen = false;
+          if (ch === '"') {
+            field += '"';
+            continue;
+          }
+          inQuotes = false;
+        } else if (ch === '"') {
+          quoteSeen = true;
+          continue;
+        } else {
+          field += ch;
+          continue;
+        }
+      }
+
+      if (ch === '"' && field === '') {
+        inQuotes = true;
+      } else if (ch === ',') {
+        row.push(field);
+        field = '';
+      } else if (ch === '\n') {
+        row.push(field);
+        yield row;
+        row = [];
+        field = '';
+      } else if (ch !== '\r') {
+        field += ch;
+      }
+    }
+  }
+
+  if (field !== '' || row.length > 0) {
+    row.push(field);
+    yield row;
+  }
+}
+
+// Yields the lines of an async iterable of text chunks (for NDJSON).
+export async function* splitLines(chunks) {
+  let buffered = '';
+  for await (const chunk of chunks) {
+    buffered += chunk;
+    let newline = buffered.indexOf('\n');
+    while (newline !== -1) {
+      yield buffered.substring(0, newline).replace(/\r$/, '');
+      buffered = buffered.substring(newline + 1);
+      newline = buffered.indexOf('\n');
+    }
+  }
+  if (buffered) yield buffered;
+}
@@ -0,0 +1,91 @@
+import { v4 as uuidv4 } from 'uuid';
+import { runOnce } from '@/lib/locks';
+
+// Customer profiles keyed by WhatsApp number (unique index). Each invoice
+// upserts its customer and bumps running totals, so the counter can greet a
+// repeat customer without scanning their invoices.
+
+function isNamedCustomer(invoice) {
+  return Boolean(invoice.customer?.name && invoice.customer?.whatsapp);
+}
+
+// Upserts the customers of the given invoices: one write per customer, with
+// visits, lifetime spend and last visit merged across their bills.
+export async function recordCustomerVisits(customers, invoices, session) {
+  const visits = new Map();
+  for (const invoice of invoices.filter(isNamedCustomer)) {
+    const { name, whatsapp } = invoice.customer;
+    const visit = visits.get(whatsapp) || { name, visits: 0, spend: 0, lastVisit: invoice.date };
+    visit.name = name;
+    visit.visits += 1;
+    visit.spend += invoice.grandTotal || 0;
+    if (invoice.date > visit.lastVisit) visit.lastVisit = invoice.date;
+    visits.set(whatsapp, visit);
+  }
+  if (visits.size === 0) return;
+
+  const now = new Date().toISOString();
+  await customers.bulkWrite(
+    [...visits].map(([whatsapp, visit]) => ({
+      updateOne: {
+        filter: { whatsapp },
+        update: {
+          $setOnInsert: { id: uuidv4(), whatsapp, createdAt: now },
+          $set: { name: visit.name },
+          $inc: { visits: visit.visits, lifetimeSpend: visit.spend },
+          $max: { lastVisit: visit.lastVisit },
+        },
+        upsert: true,
+      },
+    })),
+    { ordered: false, session: session || undefined }
+  );
+}
+
+const BACKFILL_LOCK_TTL_MS = 10 * 60 * 1000;
+
+// Customers saved before the running totals existed get them computed once
+// from their invoices, from runStartupMigrations. Only customers still
+// without totals are written, so checkouts already counted by $inc are never
+// overwritten or counted again, and a rerun changes nothing.
+export async function backfillCustomerStats(db) {
+  return runOnce(db, 'customer-stats-backfill', BACKFILL_LOCK_TTL_MS, () => mergeCustomerStats(db));
+}
+
+async function mergeCustomerStats(db) {
+  await db.collection('invoices').aggregate([
+    { $match: { 'customer.whatsapp': { $nin: [null, ''] } } },
+    {
+      $group: {
+        _id: '$customer.whatsapp',
+        visits: { $sum: 1 },
+        lifetimeSpend: { $sum: { $ifNull: ['$grandTotal', 0] } },
+        lastVisit: { $max: '$date' },
+      },
+    },
+    { $project: { _id: 0, whatsapp: '$_id', visits: 1, lifetimeSpend: 1, lastVisit: 1 } },
+    {
+      $merge: {
+        into: 'customers',
+        on: 'whatsapp',
+        // Customers that already have totals keep them
+        whenMatched: [
+          { $set: { _stale: { $eq: [{ $type: '$visits' }, 'missing'] } } },
+          {
+            $set: {
+              visits: { $cond: ['$_stale', '$$new.visits', '$visits'] },
+              lifetimeSpend: { $cond: ['$_stale', '$$new.lifetimeSpend', '$lifetimeSpend'] },
+              lastVisit: { $cond: ['$_stale', { $max: ['$lastVisit', '$$new.lastVisit'] }, '$lastVisit'] },
+            },
+          },
+          { $unset: '_stale' },
+        ],
+        whenNotMatched: 'discard',
+      },
+    },
+  ]).toArray();
+  await db.collection('customers').updateMany(
+    { visits: { $exists: false } },
+    { $set: { visits: 0, lifetimeSpend: 0 } }
+  );
+}
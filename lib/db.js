@@ -1,25 +1,216 @@
 import { MongoClient } from 'mongodb';
+import { backfillSearchKeys } from '@/lib/search';
+import { PRODUCT_TOMBSTONES, TOMBSTONE_TTL_SECONDS, backfillUpdatedAt } from '@/lib/sync';
+import { monitorCommands } from '@/lib/metrics';
+import { STOCK_MOVEMENTS, STOCK_SNAPSHOTS } from '@/lib/ledger';
 
 const MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
 const DB_NAME = process.env.DB_NAME || 'jewelry_pos';
 
+// Reads a whole, non-negative number from the environment. Anything else falls
+// back to the default with a warning rather than reaching the driver as NaN.
+function envInt(name, fallback) {
+  const value = process.env[name];
+  if (value === undefined || value === '') return fallback;
+  if (!/^\d+$/.test(value.trim())) {
+    console.warn(`Ignoring ${name}=${JSON.stringify(value)}: expected a whole number of 0 or more`);
+    return fallback;
+  }
+  return parseInt(value, 10);
+}
+
+// Driver options. Unset timeouts keep the driver defaults.
+const CLIENT_OPTIONS = Object.fromEntries(Object.entries({
+  maxPoolSize: envInt('MONGO_MAX_POOL_SIZE', 10),
+  minPoolSize: envInt('MONGO_MIN_POOL_SIZE', 2),
+  maxIdleTimeMS: envInt('MONGO_MAX_IDLE_TIME_MS'),
+  waitQueueTimeoutMS: envInt('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+  connectTimeoutMS: envInt('MONGO_CONNECT_TIMEOUT_MS'),
+  socketTimeoutMS: envInt('MONGO_SOCKET_TIMEOUT_MS'),
+  serverSelectionTimeoutMS: envInt('MONGO_SERVER_SELECTION_TIMEOUT_MS'),
+  readPreference: process.env.MONGO_READ_PREFERENCE || undefined,
+  // Command timings feed the histograms on GET /api/metrics
+  monitorCommands: true,
+}).filter(([, value]) => value !== undefined));
+
+// Indexes every collection needs. Created once per process on first connect;
+// createIndexes is a no-op for indexes that already exist.
+const INDEXES = {
+  products: [
+    { key: { id: 1 }, name: 'id_unique', unique: true },
+    { key: { barcode: 1 }, name: 'barcode_unique', unique: true },
+    { key: { code: 1 }, name: 'code_unique', unique: true },
+    { key: { searchKeys: 1, name: 1, id: 1 }, name: 'search_keys_name_id' },
+    { key: { updatedAt: 1 }, name: 'updated_at' },
+    { key: { name: 1, id: 1 }, name: 'name_id' },
+    { key: { stock: 1, id: 1 }, name: 'stock_id' },
+    { key: { category: 1, name: 1, id: 1 }, name: 'category_name_id' },
+    { key: { category: 1, stock: 1, id: 1 }, name: 'category_stock_id' },
+  ],
+  invoices: [
+    { key: { id: 1 }, name: 'id_unique', unique: true },
+    { key: { date: -1, id: -1 }, name: 'date_id' },
+    { key: { 'customer.whatsapp': 1, date: -1, id: -1 }, name: 'customer_whatsapp_date_id' },
+    { key: { paymentMode: 1, date: -1, id: -1 }, name: 'payment_mode_date_id' },
+    {
+      key: { idempotencyKey: 1 },
+      name: 'idempotency_key_unique',
+      unique: true,
+      partialFilterExpression: { idempotencyKey: { $type: 'string' } },
+    },
+  ],
+  customers: [
+    { key: { whatsapp: 1 }, name: 'whatsapp_unique', unique: true },
+  ],
+  daily_sales: [
+    { key: { date: 1 }, name: 'date_unique', unique: true },
+  ],
+  [STOCK_MOVEMENTS]: [
+    { key: { productId: 1, date: -1, id: -1 }, name: 'product_date_id' },
+    { key: { day: 1 }, name: 'day' },
+  ],
+  [STOCK_SNAPSHOTS]: [
+    { key: { month: 1, productId: 1 }, name: 'month_product_unique', unique: true },
+  ],
+  [PRODUCT_TOMBSTONES]: [
+    { key: { deletedAt: 1 }, name: 'deleted_at_ttl', expireAfterSeconds: TOMBSTONE_TTL_SECONDS },
+  ],
+};
+
 let cachedClient = null;
 let cachedDb = null;
+// The connect in progress, shared by every caller that arrives before it
+// finishes so a burst of first requests opens one client, not one each.
+let connecting = null;
+
+// Connection pool counters, fed by the driver's CMAP events.
+const poolStats = {
+  created: 0,
+  closed: 0,
+  checkedOut: 0,
+  checkedIn: 0,
+  checkOutStarted: 0,
+  checkOutFailed: 0,
+  cleared: 0,
+  totalWaitMs: 0,
+  maxWaitMs: 0,
+};
+
+function monitorPool(client) {
+  client.on('connectionCreated', () => { poolStats.created += 1; });
+  client.on('connectionClosed', () => { poolStats.closed += 1; });
+  client.on('connectionCheckOutStarted', () => { poolStats.checkOutStarted += 1; });
+  client.on('connectionCheckOutFailed', () => { poolStats.checkOutFailed += 1; });
+  client.on('connectionPoolCleared', () => { poolStats.cleared += 1; });
+  client.on('connectionCheckedOut', (event) => {
+    poolStats.checkedOut += 1;
+    // durationMS is reported by newer drivers only.
+    if (typeof event.durationMS === 'number') {
+      poolStats.totalWaitMs += event.durationMS;
+      poolStats.maxWaitMs = Math.max(poolStats.maxWaitMs, event.durationMS);
+    }
+  });
+  client.on('connectionCheckedIn', () => { poolStats.checkedIn += 1; });
+}
+
+async function ensureIndexes(db) {
+  for (const [collectionName, indexes] of Object.entries(INDEXES)) {
+    try {
+      await db.collection(collectionName).createIndexes(indexes);
+    } catch (error) {
+      // Usually duplicate data blocking a unique index. Keep serving requests
+      // and let the operator clean up the collection.
+      console.error(`Index creation failed for ${collectionName}:`, error);
+    }
+  }
+  await backfillSearchKeys(db);
+  await backfillUpdatedAt(db);
+}
+
+async function connect() {
+  const client = new MongoClient(MONGO_URL, CLIENT_OPTIONS);
+  monitorPool(client);
+  monitorCommands(client);
+  try {
+    await client.connect();
+    const db = client.db(DB_NAME);
+    await ensureIndexes(db);
+    cachedClient = client;
+    cachedDb = db;
+    return { client, db };
+  } catch (error) {
+    await client.close().catch(() => {});
+    throw error;
+  }
+}
 
 export async function connectToDatabase() {
   if (cachedClient && cachedDb) {
     return { client: cachedClient, db: cachedDb };
   }
+  if (!connecting) {
+    // A failed attempt is forgotten so the next request retries.
+    connecting = connect().finally(() => {
+      connecting = null;
+    });
+  }
+  return connecting;
+}
 
-  const client = await MongoClient.connect(MONGO_URL, {
-    maxPoolSize: 10,
-    minPoolSize: 2,
-  });
+// Pool configuration and counters for GET /api/system/stats.
+export function getDbPoolStats() {
+  return {
+    connected: Boolean(cachedClient),
+    maxPoolSize: CLIENT_OPTIONS.maxPoolSize,
+    minPoolSize: CLIENT_OPTIONS.minPoolSize,
+    readPreference: CLIENT_OPTIONS.readPreference || 'primary',
+    open: poolStats.created - poolStats.closed,
+    inUse: poolStats.checkedOut - poolStats.checkedIn,
+    waiting: poolStats.checkOutStarted - poolStats.checkedOut - poolStats.checkOutFailed,
+    created: poolStats.created,
+    closed: poolStats.closed,
+    checkOuts: poolStats.checkedOut,
+    checkOutFailures: poolStats.checkOutFailed,
+    cleared: poolStats.cleared,
+    avgWaitMs: poolStats.checkedOut > 0 && poolStats.totalWaitMs > 0
+      ? Math.round((poolStats.totalWaitMs / poolStats.checkedOut) * 100) / 100
+      : null,
+    maxWaitMs: poolStats.totalWaitMs > 0 ? poolStats.maxWaitMs : null,
+  };
+}
 
-  const db = client.db(DB_NAME);
+// Set once we learn whether the deployment supports multi-document
+// transactions (replica sets and mongos do, a standalone mongod does not).
+let transactionsSupported = null;
 
-  cachedClient = client;
-  cachedDb = db;
+function isTransactionUnsupported(error) {
+  return error?.code === 20 || /Transaction numbers are only allowed/i.test(error?.message || '');
+}
 
-  return { client, db };
+// Runs fn(session) inside a transaction. On a standalone server fn is called
+// with a null session and is responsible for its own compensation.
+export async function withTransaction(fn) {
+  const { client } = await connectToDatabase();
+  if (transactionsSupported === false) {
+    return fn(null);
+  }
+
+  const session = client.startSession();
+  try {
+    let result;
+    // Transactions must read from the primary whatever MONGO_READ_PREFERENCE says.
+    await session.withTransaction(async () => {
+      result = await fn(session);
+    }, { readPreference: 'primary' });
+    transactionsSupported = true;
+    return result;
+  } catch (error) {
+    if (transactionsSupported === null && isTransactionUnsupported(error)) {
+      transactionsSupported = false;
+      return fn(null);
+    }
+    throw error;
+  } finally {
+    await session.endSession();
+  }
 }
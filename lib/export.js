@@ -0,0 +1,157 @@
+import { generateA4Invoice, createInvoiceBatchPdf } from '@/lib/pdf';
+import { getCachedPdf, pdfCacheKey } from '@/lib/pdf-cache';
+import { toCsvRow } from '@/lib/csv';
+import { ZipWriter } from '@/lib/zip';
+import { invoiceTotals } from '@/lib/pricing.mjs';
+
+// Period exports for the accountant. Every format is a pull-based stream over a
+// Mongo cursor: the next invoice is only read once the client has taken the
+// previous output, so memory stays flat however long the period is.
+
+export const EXPORT_FORMATS = {
+  zip: { contentType: 'application/zip', extension: 'zip' },
+  pdf: { contentType: 'application/pdf', extension: 'pdf' },
+  csv: { contentType: 'text/csv; charset=utf-8', extension: 'csv' },
+};
+
+// PDFs rendered ahead of the one being written to the archive.
+const ZIP_RENDER_AHEAD = 4;
+
+const CSV_HEADER = [
+  'Invoice ID', 'Date', 'Customer', 'WhatsApp', 'Payment Mode', 'Items',
+  'Subtotal', 'Discount %', 'Discount', 'GST %', 'GST', 'Grand Total',
+];
+
+function csvLine(invoice) {
+  const { subTotal, discount, gst, grandTotal } = invoiceTotals(invoice);
+  return toCsvRow([
+    invoice.id,
+    invoice.date,
+    invoice.customer?.name || 'Walk-in',
+    invoice.customer?.whatsapp || '',
+    invoice.paymentMode || 'Cash',
+    (invoice.items || []).length,
+    subTotal.toFixed(2),
+    invoice.discountPercent || 0,
+    discount.toFixed(2),
+    invoice.gstPercent || 0,
+    gst.toFixed(2),
+    grandTotal.toFixed(2),
+  ]);
+}
+
+function csvStream(cursor) {
+  const encoder = new TextEncoder();
+  let headerSent = false;
+  return new ReadableStream({
+    async pull(controller) {
+      let text = headerSent ? '' : toCsvRow(CSV_HEADER);
+      headerSent = true;
+      // A batch of rows per pull keeps the chunk count reasonable
+      for (let i = 0; i < 200; i++) {
+        const invoice = await cursor.next();
+        if (!invoice) {
+          if (text) controller.enqueue(encoder.encode(text));
+          controller.close();
+          return;
+        }
+        text += csvLine(invoice);
+      }
+      controller.enqueue(encoder.encode(text));
+    },
+    cancel() {
+      return cursor.close();
+    },
+  });
+}
+
+// The response is already under way, so renders wait for the pool rather than
+// failing when it is busy, and one that times out (its worker is replaced) is
+// tried once more before the archive is abandoned.
+async function invoicePdf(invoice, shopInfo) {
+  const cached = await getCachedPdf(pdfCacheKey(invoice.id, 'a4', shopInfo.version));
+  if (cached) return cached;
+  try {
+    return await generateA4Invoice(invoice, shopInfo, { reserved: true });
+  } catch (error) {
+    console.error(`Export render of invoice ${invoice.id} failed, retrying:`, error.message);
+    return generateA4Invoice(invoice, shopInfo, { reserved: true });
+  }
+}
+
+function zipStream(cursor, shopInfo) {
+  const zip = new ZipWriter();
+  const ahead = [];
+  let exhausted = false;
+
+  const fill = async () => {
+    while (!exhausted && ahead.length < ZIP_RENDER_AHEAD) {
+      const invoice = await cursor.next();
+      if (!invoice) {
+        exhausted = true;
+        break;
+      }
+      const name = `invoice-${invoice.date.substring(0, 10)}-${invoice.id}.pdf`;
+      const pdf = invoicePdf(invoice, shopInfo);
+      pdf.catch(() => {}); // surfaced when awaited below
+      ahead.push({ name, date: new Date(invoice.date), pdf });
+    }
+  };
+
+  return new ReadableStream({
+    async pull(controller) {
+      await fill();
+      const next = ahead.shift();
+      if (!next) {
+        controller.enqueue(zip.finish());
+        controller.close();
+        return;
+      }
+      controller.enqueue(zip.addFile(next.name, await next.pdf, next.date));
+    },
+    cancel() {
+      return cursor.close();
+    },
+  });
+}
+
+// Pages are laid out on a worker. Each pull adds one invoice and waits for its
+// page to be written, so the next invoice is only read once the client wants
+// more. The document is opened up front so a busy renderer still answers 503.
+function pdfStream(cursor, shopInfo) {
+  let output = null;
+  let aborted = false;
+  const batch = createInvoiceBatchPdf(shopInfo, (chunk) => {
+    if (!aborted) output.enqueue(new Uint8Array(chunk));
+  });
+  return new ReadableStream({
+    start(controller) {
+      output = controller;
+    },
+    async pull(controller) {
+      try {
+        const invoice = await cursor.next();
+        if (!invoice) {
+          await batch.end();
+          controller.close();
+          return;
+        }
+        await batch.add(invoice);
+      } catch (error) {
+        batch.abort();
+        throw error;
+      }
+    },
+    cancel() {
+      aborted = true;
+      batch.abort();
+      return cursor.close();
+    },
+  });
+}
+
+export function invoiceExportStream(format, cursor, shopInfo) {
+  if (format === 'csv') return csvStream(cursor);
+  if (format === 'pdf') return pdfStream(cursor, shopInfo);
+  return zipStream(cursor, shopInfo);
+}
@@ -0,0 +1,126 @@
+import { decodeCursor, encodeCursor } from '@/lib/pagination';
+
+// Inventory listing and stock summary. Filters, sorting and the low-stock
+// counts run in MongoDB against the compound indexes in lib/db.js, so the
+// inventory screen only receives the page it shows.
+
+// Products with fewer units than this count as low stock.
+export const LOW_STOCK_THRESHOLD = parseInt(process.env.LOW_STOCK_THRESHOLD || '10', 10);
+
+// Sort orders for GET /api/products?sort=. Every order ends in a unique field
+// so the keyset cursor is unambiguous; all fields of one order share a direction.
+const PRODUCT_SORTS = {
+  name: [['name', 1], ['id', 1]],
+  code: [['code', 1]],
+  stock: [['stock', 1], ['id', 1]],
+  '-stock': [['stock', -1], ['id', -1]],
+};
+
+export const PRODUCT_SORT_NAMES = Object.keys(PRODUCT_SORTS);
+
+function readStockBound(value) {
+  if (value === null || value === undefined || value === '') return undefined;
+  const number = Number(value);
+  return Number.isFinite(number) ? number : null;
+}
+
+// Parses the list filters from the query string. Returns { filter, sort } or
+// { error } for a bad parameter.
+export function parseProductListParams(searchParams) {
+  const filter = {};
+
+  const category = searchParams.get('category');
+  if (category && category !== 'all') filter.category = category;
+
+  const minStock = readStockBound(searchParams.get('minStock'));
+  const maxStock = readStockBound(searchParams.get('maxStock'));
+  if (minStock === null || maxStock === null) {
+    return { error: 'minStock and maxStock must be numbers' };
+  }
+  if (minStock !== undefined || maxStock !== undefined) {
+    filter.stock = {};
+    if (minStock !== undefined) filter.stock.$gte = minStock;
+    if (maxStock !== undefined) filter.stock.$lte = maxStock;
+  }
+
+  const sort = searchParams.get('sort') || 'name';
+  if (!PRODUCT_SORTS[sort]) {
+    return { error: `sort must be one of ${PRODUCT_SORT_NAMES.join(', ')}` };
+  }
+  return { filter, sort };
+}
+
+// True when the request asks for a filtered or paged list rather than the
+// whole catalogue.
+export function isProductListQuery(searchParams) {
+  return ['category', 'minStock', 'maxStock', 'sort', 'limit', 'cursor'].some((name) => searchParams.has(name));
+}
+
+// Keyset condition resuming after the last row of the previous page.
+function afterSortKey(fields, after) {
+  return {
+    $or: fields.map(([field, direction], i) => ({
+      ...Object.fromEntries(fields.slice(0, i).map(([previous]) => [previous, after[previous]])),
+      [field]: { [direction > 0 ? '$gt' : '$lt']: after[field] },
+    })),
+  };
+}
+
+// One page of products matching filter in the given sort order. Returns
+// { items, nextCursor }.
+export async function listProducts(products, { filter, sort, limit, cursor }) {
+  const fields = PRODUCT_SORTS[sort];
+  const after = decodeCursor(cursor);
+  const query = after ? { $and: [filter, afterSortKey(fields, after)] } : filter;
+
+  const rows = await products
+    .find(query, { projection: { _id: 0, searchKeys: 0 } })
+    .sort(Object.fromEntries(fields))
+    .limit(limit + 1)
+    .toArray();
+
+  const items = rows.slice(0, limit);
+  let nextCursor = null;
+  if (rows.length > limit) {
+    const last = items[items.length - 1];
+    nextCursor = encodeCursor(Object.fromEntries(fields.map(([field]) => [field, last[field]])));
+  }
+  return { items, nextCursor };
+}
+
+// Category counts and stock totals for the whole catalogue in one pass.
+export async function getProductSummary(products, threshold = LOW_STOCK_THRESHOLD) {
+  const [result] = await products.aggregate([
+    { $project: { _id: 0, category: 1, stock: 1 } },
+    {
+      $facet: {
+        categories: [
+          { $group: { _id: '$category', count: { $sum: 1 } } },
+          { $sort: { _id: 1 } },
+          { $project: { _id: 0, category: '$_id', count: 1 } },
+        ],
+        stock: [
+          {
+            $group: {
+              _id: null,
+              total: { $sum: 1 },
+              units: { $sum: { $ifNull: ['$stock', 0] } },
+              lowStock: { $sum: { $cond: [{ $lt: [{ $ifNull: ['$stock', 0] }, threshold] }, 1, 0] } },
+              outOfStock: { $sum: { $cond: [{ $lte: [{ $ifNull: ['$stock', 0] }, 0] }, 1, 0] } },
+            },
+          },
+        ],
+      },
+    },
+  ]).toArray();
+
+  const stock = result?.stock[0] || { total: 0, units: 0, lowStock: 0, outOfStock: 0 };
+  return {
+    total: stock.total,
+    units: stock.units,
+    lowStock: stock.lowStock,
+    outOfStock: stock.outOfStock,
+    lowStockThreshold: threshold,
+    categories: result?.categories || [],
+  };
+}
@@ -0,0 +1,316 @@
+import { v4 as uuidv4 } from 'uuid';
+import { localDay } from '@/lib/rollups';
+import { aggregateStockLines } from '@/lib/stock';
+import { runOnce } from '@/lib/locks';
+
+// Stock ledger. products.stock stays the live counter that checkout guards
+// against; every change to it is also appended to stock_movements, so the
+// history can be audited and replayed. Month-end snapshots (closing stock and
+// per-type totals per product) bound the work of "stock on date X" and
+// movement reports to one month of movements plus one snapshot per product,
+// however many years the ledger covers.
+export const STOCK_MOVEMENTS = 'stock_movements';
+export const STOCK_SNAPSHOTS = 'stock_snapshots';
+
+export const MOVEMENT_TYPES = ['sale', 'restock', 'adjustment'];
+
+// How often reports check for months that have closed since the last snapshot.
+const COMPACTION_INTERVAL_MS = 60 * 60 * 1000;
+
+let compaction = null;
+let compactedAt = 0;
+
+// qty is signed: sales are negative, restocks positive, adjustments either.
+export function stockMovement(productId, type, qty, { date = new Date().toISOString(), ...fields } = {}) {
+  return { id: uuidv4(), productId, type, qty, date, day: localDay(date), ...fields };
+}
+
+// One sale movement per product per invoice.
+export function saleMovements(invoices) {
+  return invoices.flatMap((invoice) =>
+    aggregateStockLines(invoice.items).map((line) =>
+      stockMovement(line.productId, 'sale', -line.qty, { date: invoice.date, invoiceId: invoice.id })
+    )
+  );
+}
+
+// Appends movements. A movement dated in a month that is already
+// snapshotted (e.g. an offline bill replayed late) drops the snapshots from
+// that month on; the next report rebuilds them.
+export async function recordStockMovements(db, movements, session) {
+  const changes = movements.filter((movement) => movement.qty !== 0);
+  if (changes.length === 0) return;
+  await db.collection(STOCK_MOVEMENTS).insertMany(changes, { ordered: false, session: session || undefined });
+
+  const earliest = changes.reduce((min, movement) => (movement.day < min ? movement.day : min), changes[0].day);
+  if (monthOf(earliest) < monthOf(localDay(new Date()))) {
+    await db.collection(STOCK_SNAPSHOTS).deleteMany({ month: { $gte: monthOf(earliest) } }, { session: session || undefined });
+    compactedAt = 0;
+  }
+}
+
+function monthOf(day) {
+  return day.slice(0, 7);
+}
+
+function nextMonth(month) {
+  const [year, m] = month.split('-').map(Number);
+  return m === 12 ? `${year + 1}-01` : `${year}-${String(m + 1).padStart(2, '0')}`;
+}
+
+function previousMonth(month) {
+  const [year, m] = month.split('-').map(Number);
+  return m === 1 ? `${year - 1}-12` : `${year}-${String(m - 1).padStart(2, '0')}`;
+}
+
+function lastDayOfMonth(month) {
+  const [year, m] = month.split('-').map(Number);
+  return `${month}-${String(new Date(Date.UTC(year, m, 0)).getUTCDate()).padStart(2, '0')}`;
+}
+
+// Reads a report day: YYYY-MM-DD as given, or an ISO timestamp mapped to its
+// day in the report timezone. Returns null when missing and undefined when
+// the value does not parse.
+export function parseStockDay(value) {
+  if (!value) return null;
+  if (/^\d{4}-\d{2}-\d{2}$/.test(value)) {
+    return Number.isNaN(new Date(`${value}T00:00:00Z`).getTime()) ? undefined : value;
+  }
+  const date = new Date(value);
+  return Number.isNaN(date.getTime()) ? undefined : localDay(date);
+}
+
+// YYYY-MM-DD of the day before.
+export function previousDay(day) {
+  const date = new Date(`${day}T00:00:00Z`);
+  date.setUTCDate(date.getUTCDate() - 1);
+  return date.toISOString().slice(0, 10);
+}
+
+function emptyTotals() {
+  return Object.fromEntries(MOVEMENT_TYPES.map((type) => [type, 0]));
+}
+
+// Sums movements in a day range per product and type. Returns a Map of
+// productId -> { sale, restock, adjustment }.
+async function sumMovements(db, dayRange, productIds) {
+  const match = { day: dayRange };
+  if (productIds) match.productId = { $in: productIds };
+  const rows = await db.collection(STOCK_MOVEMENTS).aggregate([
+    { $match: match },
+    { $group: { _id: { productId: '$productId', type: '$type' }, qty: { $sum: '$qty' } } },
+  ]).toArray();
+
+  const totals = new Map();
+  for (const { _id, qty } of rows) {
+    const entry = totals.get(_id.productId) || emptyTotals();
+    entry[_id.type] = (entry[_id.type] || 0) + qty;
+    totals.set(_id.productId, entry);
+  }
+  return totals;
+}
+
+function net(totals) {
+  return MOVEMENT_TYPES.reduce((sum, type) => sum + (totals[type] || 0), 0);
+}
+
+// Writes snapshots for every month that has closed since the last one. Each
+// month costs one aggregation over that month's movements; a marker document
+// (productId null) records that the month is done, including quiet months.
+export async function compactStockSnapshots(db) {
+  const snapshots = db.collection(STOCK_SNAPSHOTS);
+  const currentMonth = monthOf(localDay(new Date()));
+
+  const last = await snapshots.findOne({ productId: null }, { sort: { month: -1 }, projection: { month: 1 } });
+  let month;
+  if (last) {
+    month = nextMonth(last.month);
+  } else {
+    const first = await db.collection(STOCK_MOVEMENTS).findOne({}, { sort: { day: 1 }, projection: { day: 1 } });
+    if (!first) return { months: 0 };
+    month = monthOf(first.day);
+  }
+
+  let months = 0;
+  let previous = last?.month;
+  for (; month < currentMonth; month = nextMonth(month)) {
+    const closings = new Map();
+    if (previous) {
+      const rows = await snapshots
+        .find({ month: previous, productId: { $type: 'string' } }, { projection: { productId: 1, closing: 1 } })
+        .toArray();
+      for (const row of rows) closings.set(row.productId, row.closing);
+    }
+    const activity = await sumMovements(db, { $gte: `${month}-01`, $lte: lastDayOfMonth(month) });
+
+    const monthTotals = emptyTotals();
+    const ops = [];
+    for (const productId of new Set([...closings.keys(), ...activity.keys()])) {
+      const opening = closings.get(productId) || 0;
+      const totals = { ...emptyTotals(), ...activity.get(productId) };
+      const closing = opening + net(totals);
+      MOVEMENT_TYPES.forEach((type) => { monthTotals[type] += totals[type]; });
+      // Products with nothing on hand and no activity drop out until they move again
+      if (closing === 0 && !activity.has(productId)) continue;
+      ops.push({
+        replaceOne: {
+          filter: { month, productId },
+          replacement: { month, productId, opening, ...totals, closing },
+          upsert: true,
+        },
+      });
+    }
+    ops.push({
+      replaceOne: {
+        filter: { month, productId: null },
+        replacement: { month, productId: null, ...monthTotals, products: ops.length },
+        upsert: true,
+      },
+    });
+    await snapshots.bulkWrite(ops, { ordered: false });
+    previous = month;
+    months += 1;
+  }
+  return { months };
+}
+
+// Compacts at most once per COMPACTION_INTERVAL_MS per process; concurrent
+// callers share the run.
+export function ensureSnapshotsCurrent(db) {
+  if (compaction) return compaction;
+  if (Date.now() - compactedAt < COMPACTION_INTERVAL_MS) return Promise.resolve();
+  compaction = compactStockSnapshots(db)
+    .then(() => { compactedAt = Date.now(); })
+    .finally(() => { compaction = null; });
+  return compaction;
+}
+
+// Latest snapshotted month before `month`, or null.
+async function snapshotBefore(db, month) {
+  const marker = await db.collection(STOCK_SNAPSHOTS)
+    .findOne({ productId: null, month: { $lt: month } }, { sort: { month: -1 }, projection: { month: 1 } });
+  return marker?.month || null;
+}
+
+async function snapshotRows(db, filter, productIds) {
+  const query = { ...filter, productId: productIds ? { $in: productIds } : { $type: 'string' } };
+  return db.collection(STOCK_SNAPSHOTS).find(query, { projection: { _id: 0 } }).toArray();
+}
+
+// Stock per product at the end of `day` (YYYY-MM-DD, report timezone): the
+// closing of the last snapshot before that month plus the movements since.
+export async function stockOnDate(db, day, productIds = null) {
+  const base = await snapshotBefore(db, monthOf(day));
+  const stock = new Map();
+  if (base) {
+    for (const row of await snapshotRows(db, { month: base }, productIds)) {
+      stock.set(row.productId, row.closing);
+    }
+  }
+  const range = base ? { $gt: lastDayOfMonth(base), $lte: day } : { $lte: day };
+  for (const [productId, totals] of await sumMovements(db, range, productIds)) {
+    stock.set(productId, (stock.get(productId) || 0) + net(totals));
+  }
+  return stock;
+}
+
+// Opening stock, movements by type and closing stock per product for the
+// days from..to inclusive. Whole months inside the range come from
+// snapshots; only the partial months at either end read movements.
+export async function stockMovementReport(db, fromDay, toDay, productIds = null) {
+  const [opening, closing] = await Promise.all([
+    stockOnDate(db, previousDay(fromDay), productIds),
+    stockOnDate(db, toDay, productIds),
+  ]);
+
+  // Months firstFull..coveredTo lie entirely inside the range and are snapshotted
+  const firstFull = fromDay.endsWith('-01') ? monthOf(fromDay) : nextMonth(monthOf(fromDay));
+  const lastFull = toDay === lastDayOfMonth(monthOf(toDay)) ? monthOf(toDay) : previousMonth(monthOf(toDay));
+  const lastSnapshot = await snapshotBefore(db, nextMonth(monthOf(toDay)));
+  const coveredTo = lastSnapshot && lastSnapshot < lastFull ? lastSnapshot : lastSnapshot && lastFull;
+
+  const totals = new Map();
+  const add = (productId, entry) => {
+    const current = totals.get(productId) || emptyTotals();
+    MOVEMENT_TYPES.forEach((type) => { current[type] += entry[type] || 0; });
+    totals.set(productId, current);
+  };
+
+  if (coveredTo && firstFull <= coveredTo) {
+    for (const row of await snapshotRows(db, { month: { $gte: firstFull, $lte: coveredTo } }, productIds)) {
+      add(row.productId, row);
+    }
+    if (fromDay < `${firstFull}-01`) {
+      for (const [productId, entry] of await sumMovements(db, { $gte: fromDay, $lt: `${firstFull}-01` }, productIds)) {
+        add(productId, entry);
+      }
+    }
+    if (lastDayOfMonth(coveredTo) < toDay) {
+      for (const [productId, entry] of await sumMovements(db, { $gt: lastDayOfMonth(coveredTo), $lte: toDay }, productIds)) {
+        add(productId, entry);
+      }
+    }
+  } else {
+    for (const [productId, entry] of await sumMovements(db, { $gte: fromDay, $lte: toDay }, productIds)) {
+      add(productId, entry);
+    }
+  }
+
+  const ids = new Set([...opening.keys(), ...closing.keys(), ...totals.keys()]);
+  return [...ids].map((productId) => ({
+    productId,
+    opening: opening.get(productId) || 0,
+    ...(totals.get(productId) || emptyTotals()),
+    closing: closing.get(productId) || 0,
+  }));
+}
+
+// Long enough to open every product of a large catalogue; renewed as it goes.
+const BACKFILL_LOCK_TTL_MS = 10 * 60 * 1000;
+
+// Writes the opening balance of one product: the adjustment that makes its
+// movements add up to its stock. Inside a transaction the $set on the product
+// makes a concurrent sale conflict and retry, so the stock read and the
+// movements summed belong to the same moment. Keyed by product, so running it
+// twice writes nothing the second time.
+async function openProductLedger(db, productId, session) {
+  const product = await db.collection('products').findOneAndUpdate(
+    { id: productId },
+    { $set: { ledgerOpenedAt: new Date().toISOString() } },
+    { projection: { stock: 1 }, session: session || undefined }
+  );
+  if (!product) return;
+
+  const [recorded] = await db.collection(STOCK_MOVEMENTS).aggregate([
+    { $match: { productId } },
+    { $group: { _id: null, qty: { $sum: '$qty' } } },
+  ], { session: session || undefined }).toArray();
+  const qty = (product.stock || 0) - (recorded?.qty || 0);
+  if (qty === 0) return;
+
+  try {
+    await db.collection(STOCK_MOVEMENTS).insertOne(
+      { _id: `opening:${productId}`, ...stockMovement(productId, 'adjustment', qty, { note: 'Opening balance' }) },
+      { session: session || undefined }
+    );
+  } catch (error) {
+    if (error?.code !== 11000) throw error;
+  }
+}
+
+// Databases from before the ledger get one opening-balance adjustment per
+// product, once (see runOnce). inTransaction is withTransaction from lib/db,
+// passed in because lib/db imports this module. Without transactions (a
+// standalone mongod) a sale landing on a product while it is being opened can
+// be counted twice; run it before the server takes requests.
+export async function backfillStockLedger(db, inTransaction) {
+  return runOnce(db, 'ledger-backfill', BACKFILL_LOCK_TTL_MS, async (lock) => {
+    const cursor = db.collection('products').find({}, { projection: { _id: 0, id: 1 } }).batchSize(500);
+    let opened = 0;
+    for await (const { id } of cursor) {
+      await inTransaction((session) => openProductLedger(db, id, session));
+      opened += 1;
+      if (opened % 500 === 0) await lock.renew();
+    }
+  });
+}
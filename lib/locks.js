@@ -0,0 +1,52 @@
+import { v4 as uuidv4 } from 'uuid';
+
+// Locks for maintenance jobs that must not run twice at once when several
+// instances share one database. A lock expires after ttlMs, so a holder that
+// crashes cannot block the job for good; long jobs call renew() as they go.
+export const LOCKS = 'locks';
+
+// One document per finished one-off job.
+export const MIGRATIONS = 'migrations';
+
+// Returns { renew, release } or null when another holder has the lock.
+export async function acquireLock(db, name, ttlMs) {
+  const locks = db.collection(LOCKS);
+  const owner = uuidv4();
+  const expiry = () => new Date(Date.now() + ttlMs);
+
+  try {
+    await locks.insertOne({ _id: name, owner, acquiredAt: new Date(), expiresAt: expiry() });
+  } catch (error) {
+    if (error?.code !== 11000) throw error;
+    // Held; take it over only if the holder let it expire
+    const taken = await locks.findOneAndUpdate(
+      { _id: name, expiresAt: { $lt: new Date() } },
+      { $set: { owner, acquiredAt: new Date(), expiresAt: expiry() } }
+    );
+    if (!taken) return null;
+  }
+
+  return {
+    renew: () => locks.updateOne({ _id: name, owner }, { $set: { expiresAt: expiry() } }),
+    release: () => locks.deleteOne({ _id: name, owner }),
+  };
+}
+
+// Runs fn(lock) once per database: skipped when it has finished before or
+// another holder is running it. Returns true when this call ran it.
+export async function runOnce(db, name, ttlMs, fn) {
+  const migrations = db.collection(MIGRATIONS);
+  if (await migrations.findOne({ _id: name })) return false;
+
+  const lock = await acquireLock(db, name, ttlMs);
+  if (!lock) return false;
+  try {
+    // It may have finished between the check and taking the lock
+    if (await migrations.findOne({ _id: name })) return false;
+    await fn(lock);
+    await migrations.insertOne({ _id: name, completedAt: new Date() });
+    return true;
+  } finally {
+    await lock.release();
+  }
+}
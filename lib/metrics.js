@@ -0,0 +1,180 @@
+import { AsyncLocalStorage } from 'async_hooks';
+
+// In-process request metrics: latency histograms per API route, per MongoDB
+// command and per named span inside the handlers. Served in Prometheus text
+// format from GET /api/metrics; each response also carries a Server-Timing
+// header with its own breakdown. Values are per process and reset on restart.
+
+// Bucket upper bounds in seconds.
+const BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10];
+
+class Histogram {
+  constructor(name, help, labelNames) {
+    this.name = name;
+    this.help = help;
+    this.labelNames = labelNames;
+    this.series = new Map();
+  }
+
+  observe(labels, seconds) {
+    const key = this.labelNames.map((label) => labels[label] ?? '').join('\u0000');
+    let series = this.series.get(key);
+    if (!series) {
+      series = { labels, counts: new Array(BUCKETS.length).fill(0), sum: 0, count: 0 };
+      this.series.set(key, series);
+    }
+    for (let i = 0; i < BUCKETS.length; i++) {
+      if (seconds <= BUCKETS[i]) series.counts[i] += 1;
+    }
+    series.sum += seconds;
+    series.count += 1;
+  }
+
+  render() {
+    const lines = [`# HELP ${this.name} ${this.help}`, `# TYPE ${this.name} histogram`];
+    for (const { labels, counts, sum, count } of this.series.values()) {
+      const base = this.labelNames.map((label) => `${label}="${escapeLabel(labels[label])}"`);
+      BUCKETS.forEach((bound, i) => {
+        lines.push(`${this.name}_bucket{${[...base, `le="${bound}"`].join(',')}} ${counts[i]}`);
+      });
+      lines.push(`${this.name}_bucket{${[...base, 'le="+Inf"'].join(',')}} ${count}`);
+      lines.push(`${this.name}_sum{${base.join(',')}} ${sum}`);
+      lines.push(`${this.name}_count{${base.join(',')}} ${count}`);
+    }
+    return lines.join('\n');
+  }
+}
+
+function escapeLabel(value) {
+  return String(value ?? '').replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n');
+}
+
+const requestDuration = new Histogram(
+  'pos_http_request_duration_seconds',
+  'API request latency until the response headers are ready.',
+  ['method', 'route', 'status']
+);
+const mongoDuration = new Histogram(
+  'pos_mongo_command_duration_seconds',
+  'MongoDB command latency from driver command monitoring.',
+  ['command', 'collection', 'outcome']
+);
+const spanDuration = new Histogram(
+  'pos_span_duration_seconds',
+  'Duration of named steps inside the API handlers.',
+  ['span']
+);
+
+// Per-request timings, collected for the Server-Timing header.
+const requestContext = new AsyncLocalStorage();
+
+// Path segments that are part of a route rather than an id, code or number.
+// Everything else is reported as :param to keep the label set small.
+const ROUTE_SEGMENTS = new Set([
+  'products', 'invoices', 'settings', 'reports', 'barcodes', 'customers', 'scan', 'system', 'metrics',
+  'barcode', 'batch', 'export', 'import', 'rebuild', 'sales', 'sheet', 'shop', 'stats', 'summary', 'sync',
+  'whatsapp', 'pdf-a4', 'pdf-thermal', 'stock', 'stock-movements', 'movements',
+]);
+
+export function routeLabel(path) {
+  if (path.length === 0) return '/';
+  return `/${path.map((segment) => (ROUTE_SEGMENTS.has(segment) ? segment : ':param')).join('/')}`;
+}
+
+function recordTiming(name, ms) {
+  spanDuration.observe({ span: name }, ms / 1000);
+  const context = requestContext.getStore();
+  if (context) {
+    context.spans.set(name, (context.spans.get(name) || 0) + ms);
+  }
+}
+
+// Times fn as a named span of the current request.
+export async function span(name, fn) {
+  const started = performance.now();
+  try {
+    return await fn();
+  } finally {
+    recordTiming(name, performance.now() - started);
+  }
+}
+
+// For work that outlives the handler (streamed bodies): call the returned
+// function when it finishes.
+export function startSpan(name) {
+  const started = performance.now();
+  return () => recordTiming(name, performance.now() - started);
+}
+
+function serverTiming(context, totalMs) {
+  const entries = [`total;dur=${totalMs.toFixed(1)}`];
+  if (context.mongoCount > 0) {
+    entries.push(`mongo;dur=${context.mongoMs.toFixed(1)};desc="${context.mongoCount} commands"`);
+  }
+  for (const [name, ms] of context.spans) {
+    entries.push(`${name};dur=${ms.toFixed(1)}`);
+  }
+  return entries.join(', ');
+}
+
+// Wraps a route export: times the request, labels it by route template and
+// adds a Server-Timing header to the response.
+export function withRequestMetrics(method, handler) {
+  return (request, context) => {
+    const timings = { spans: new Map(), mongoMs: 0, mongoCount: 0 };
+    return requestContext.run(timings, async () => {
+      const started = performance.now();
+      let status = 500;
+      try {
+        const response = await handler(request, context);
+        status = response.status;
+        try {
+          response.headers.set('Server-Timing', serverTiming(timings, performance.now() - started));
+        } catch (error) {
+          // Immutable headers (e.g. redirects); the histogram still records it
+        }
+        return response;
+      } finally {
+        requestDuration.observe(
+          { method, route: routeLabel(context?.params?.path || []), status: String(status) },
+          (performance.now() - started) / 1000
+        );
+      }
+    });
+  };
+}
+
+// Subscribes to the driver's command monitoring events. The client must be
+// created with monitorCommands: true.
+export function monitorCommands(client) {
+  const collections = new Map();
+  client.on('commandStarted', (event) => {
+    // getMore names its collection separately; the command field is the cursor id
+    const target = event.commandName === 'getMore' ? event.command?.collection : event.command?.[event.commandName];
+    if (typeof target === 'string') collections.set(event.requestId, target);
+  });
+
+  const finish = (event, outcome) => {
+    const collection = collections.get(event.requestId) || '';
+    collections.delete(event.requestId);
+    mongoDuration.observe({ command: event.commandName, collection, outcome }, event.duration / 1000);
+    const context = requestContext.getStore();
+    if (context) {
+      context.mongoMs += event.duration;
+      context.mongoCount += 1;
+    }
+  };
+  client.on('commandSucceeded', (event) => finish(event, 'ok'));
+  client.on('commandFailed', (event) => finish(event, 'error'));
+}
+
+// Prometheus exposition of the histograms plus point-in-time gauges given as
+// [{ name, help, value }].
+export function renderMetrics(gauges = []) {
+  const sections = [requestDuration, mongoDuration, spanDuration].map((histogram) => histogram.render());
+  for (const { name, help, value } of gauges) {
+    if (typeof value !== 'number' || Number.isNaN(value)) continue;
+    sections.push(`# HELP ${name} ${help}\n# TYPE ${name} gauge\n${name} ${value}`);
+  }
+  return `${sections.join('\n')}\n`;
+}
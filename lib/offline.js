@@ -0,0 +1,264 @@
+// Browser-side product snapshot and invoice outbox for the billing counter.
+// The catalogue is mirrored into IndexedDB and kept current with deltas from
+// GET /api/products/sync, so scans and searches do not wait on the uplink.
+// Sales rung up while offline are queued and replayed through
+// POST /api/invoices/batch, keyed by idempotency key, once the connection returns.
+// Bills the server refuses move to a separate store until someone at the
+// counter retries or discards them, so they are not resent on every flush.
+
+const DB_NAME = 'jewelry-pos';
+const DB_VERSION = 3;
+const PRODUCTS = 'products';
+const META = 'meta';
+const OUTBOX = 'outbox';
+const FAILED = 'failed_invoices';
+
+let dbPromise = null;
+
+function tokenize(text) {
+  return String(text || '').toLowerCase().split(/[^\p{L}\p{N}]+/u).filter(Boolean);
+}
+
+// Products are stored with lower-cased copies of the fields search reads, so
+// lookups walk an index range instead of loading the whole catalogue.
+function withSearchFields(product) {
+  return {
+    ...product,
+    _code: (product.code || '').toLowerCase(),
+    _name: (product.name || '').toLowerCase(),
+    _words: [...new Set(tokenize(`${product.name || ''} ${product.code || ''} ${product.category || ''}`))],
+  };
+}
+
+function withoutSearchFields({ _code, _name, _words, ...product }) {
+  return product;
+}
+
+function promisify(request) {
+  return new Promise((resolve, reject) => {
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+function openDb() {
+  if (!dbPromise) {
+    dbPromise = new Promise((resolve, reject) => {
+      const request = indexedDB.open(DB_NAME, DB_VERSION);
+      request.onupgradeneeded = (event) => {
+        const db = request.result;
+        if (event.oldVersion < 1) {
+          const products = db.createObjectStore(PRODUCTS, { keyPath: 'id' });
+          products.createIndex('barcode', 'barcode', { unique: false });
+          db.createObjectStore(META, { keyPath: 'key' });
+          db.createObjectStore(OUTBOX, { keyPath: 'idempotencyKey' });
+        }
+        if (event.oldVersion < 2) {
+          db.createObjectStore(FAILED, { keyPath: 'idempotencyKey' });
+        }
+        if (event.oldVersion < 3) {
+          const products = request.transaction.objectStore(PRODUCTS);
+          products.createIndex('code_lower', '_code', { unique: false });
+          products.createIndex('name_lower', '_name', { unique: false });
+          products.createIndex('words', '_words', { unique: false, multiEntry: true });
+          // Snapshots from before the search fields get them in place
+          products.openCursor().onsuccess = (cursorEvent) => {
+            const cursor = cursorEvent.target.result;
+            if (!cursor) return;
+            cursor.update(withSearchFields(cursor.value));
+            cursor.continue();
+          };
+        }
+      };
+      request.onsuccess = () => resolve(request.result);
+      request.onerror = () => reject(request.error);
+    });
+  }
+  return dbPromise;
+}
+
+function transactionDone(tx) {
+  return new Promise((resolve, reject) => {
+    tx.oncomplete = () => resolve();
+    tx.onerror = () => reject(tx.error);
+    tx.onabort = () => reject(tx.error);
+  });
+}
+
+export function isOfflineStoreAvailable() {
+  return typeof indexedDB !== 'undefined';
+}
+
+// Pulls changes since the last sync and applies them in one transaction.
+// Returns the number of products in the delta.
+export async function syncProducts() {
+  const db = await openDb();
+  const meta = await promisify(db.transaction(META).objectStore(META).get('productsToken'));
+  const since = meta?.value ? `?since=${encodeURIComponent(meta.value)}` : '';
+
+  const response = await fetch(`/api/products/sync${since}`);
+  if (!response.ok) throw new Error(`Product sync failed: ${response.status}`);
+  const { full, products, deleted, token } = await response.json();
+
+  const tx = db.transaction([PRODUCTS, META], 'readwrite');
+  const store = tx.objectStore(PRODUCTS);
+  if (full) store.clear();
+  for (const product of products) store.put(withSearchFields(product));
+  for (const id of deleted) store.delete(id);
+  tx.objectStore(META).put({ key: 'productsToken', value: token });
+  await transactionDone(tx);
+  return products.length;
+}
+
+export async function countLocalProducts() {
+  const db = await openDb();
+  return promisify(db.transaction(PRODUCTS).objectStore(PRODUCTS).count());
+}
+
+export async function findLocalByBarcode(barcode) {
+  const db = await openDb();
+  const index = db.transaction(PRODUCTS).objectStore(PRODUCTS).index('barcode');
+  const product = await promisify(index.get(barcode));
+  return product ? withoutSearchFields(product) : null;
+}
+
+// Walks the index entries starting with prefix, in key order, until visit
+// returns false.
+function scanPrefix(index, prefix, visit) {
+  return new Promise((resolve, reject) => {
+    const request = index.openCursor(IDBKeyRange.bound(prefix, `${prefix}\uffff`));
+    request.onsuccess = () => {
+      const cursor = request.result;
+      if (!cursor || visit(cursor.value) === false) {
+        resolve();
+        return;
+      }
+      cursor.continue();
+    };
+    request.onerror = () => reject(request.error);
+  });
+}
+
+// Same matching rules as the server search: every query word must prefix a
+// word of the name, code or category. Exact and prefix code matches come
+// first, then name prefixes, then the rest. Each tier is an index range scan
+// that stops once limit products are found, so the cost follows the limit
+// rather than the catalogue; within the last tier the products found first
+// (by their longest query word) are the ones returned, sorted by name.
+export async function searchLocalProducts(query, limit = 50) {
+  const words = tokenize(query);
+  if (words.length === 0) return [];
+  const needle = query.trim().toLowerCase();
+
+  const db = await openDb();
+  const store = db.transaction(PRODUCTS).objectStore(PRODUCTS);
+  const found = new Map();
+  const collect = (rankOf) => (product) => {
+    if (!found.has(product.id) && words.every((word) => product._words.some((candidate) => candidate.startsWith(word)))) {
+      found.set(product.id, { product, rank: rankOf(product) });
+    }
+    return found.size < limit;
+  };
+
+  await scanPrefix(store.index('code_lower'), needle, collect((product) => (product._code === needle ? 0 : 1)));
+  if (found.size < limit) await scanPrefix(store.index('name_lower'), needle, collect(() => 2));
+  if (found.size < limit) {
+    const longest = words.reduce((a, b) => (b.length > a.length ? b : a));
+    await scanPrefix(store.index('words'), longest, collect(() => 3));
+  }
+
+  return [...found.values()]
+    .sort((a, b) => a.rank - b.rank || (a.product.name || '').localeCompare(b.product.name || ''))
+    .map(({ product }) => withoutSearchFields(product));
+}
+
+export async function queueInvoice(invoiceData) {
+  const db = await openDb();
+  const tx = db.transaction(OUTBOX, 'readwrite');
+  tx.objectStore(OUTBOX).put({ ...invoiceData, queuedAt: new Date().toISOString() });
+  await transactionDone(tx);
+}
+
+export async function countQueuedInvoices() {
+  const db = await openDb();
+  return promisify(db.transaction(OUTBOX).objectStore(OUTBOX).count());
+}
+
+// Bills sent per POST /api/invoices/batch request while replaying the outbox.
+const REPLAY_BATCH_SIZE = 100;
+
+// Bills the server refused, oldest first, each with its lastError.
+export async function listFailedInvoices() {
+  const db = await openDb();
+  const failed = await promisify(db.transaction(FAILED).objectStore(FAILED).getAll());
+  return failed.sort((a, b) => a.queuedAt.localeCompare(b.queuedAt));
+}
+
+// Puts a refused bill back in the outbox, e.g. once its stock has been
+// corrected. The next flush sends it again under the same idempotency key.
+export async function retryFailedInvoice(idempotencyKey) {
+  const db = await openDb();
+  const tx = db.transaction([FAILED, OUTBOX], 'readwrite');
+  const failed = tx.objectStore(FAILED);
+  const invoice = await promisify(failed.get(idempotencyKey));
+  if (invoice) {
+    const { lastError, ...invoiceData } = invoice;
+    tx.objectStore(OUTBOX).put(invoiceData);
+    failed.delete(idempotencyKey);
+  }
+  await transactionDone(tx);
+}
+
+export async function discardFailedInvoice(idempotencyKey) {
+  const db = await openDb();
+  const tx = db.transaction(FAILED, 'readwrite');
+  tx.objectStore(FAILED).delete(idempotencyKey);
+  await transactionDone(tx);
+}
+
+// Replays queued invoices oldest first through POST /api/invoices/batch. Stops
+// at the first network failure and leaves the rest queued. Returns
+// { sent, rejected }, where rejected lists invoices the server refused (e.g.
+// recorded stock ran out) with the reason. Refused invoices move out of the
+// outbox into the failed store, so each is reported once and waits for
+// retryFailedInvoice or discardFailedInvoice; the sale itself has already happened.
+export async function flushInvoiceOutbox() {
+  const db = await openDb();
+  const queued = await promisify(db.transaction(OUTBOX).objectStore(OUTBOX).getAll());
+  queued.sort((a, b) => a.queuedAt.localeCompare(b.queuedAt));
+
+  let sent = 0;
+  const rejected = [];
+  for (let start = 0; start < queued.length; start += REPLAY_BATCH_SIZE) {
+    const chunk = queued.slice(start, start + REPLAY_BATCH_SIZE);
+    const bills = chunk.map(({ queuedAt, lastError, ...invoiceData }) => invoiceData);
+
+    let results;
+    try {
+      const response = await fetch('/api/invoices/batch', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ invoices: bills }),
+      });
+      if (!response.ok) break;
+      ({ results } = await response.json());
+    } catch (error) {
+      break;
+    }
+
+    const tx = db.transaction([OUTBOX, FAILED], 'readwrite');
+    const store = tx.objectStore(OUTBOX);
+    const failed = tx.objectStore(FAILED);
+    results.forEach((result, i) => {
+      if (result.status === 'created' || result.status === 'duplicate') {
+        sent += 1;
+      } else {
+        rejected.push({ invoice: bills[i], error: result });
+        failed.put({ ...chunk[i], lastError: result });
+      }
+      store.delete(chunk[i].idempotencyKey);
+    });
+    await transactionDone(tx);
+  }
+  return { sent, rejected };
+}
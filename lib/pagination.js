@@ -0,0 +1,30 @@
+// Opaque cursors for keyset pagination. The payload is whatever sort key the
+// caller needs to resume from; clients should treat the token as a black box.
+export function encodeCursor(values) {
+  return Buffer.from(JSON.stringify(values)).toString('base64url');
+}
+
+export function decodeCursor(cursor) {
+  if (!cursor) return null;
+  try {
+    return JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'));
+  } catch (error) {
+    return null;
+  }
+}
+
+export function parseLimit(value, fallback = 50, max = 200) {
+  const limit = parseInt(value, 10);
+  if (Number.isNaN(limit) || limit <= 0) return fallback;
+  return Math.min(limit, max);
+}
+
+// Keyset condition for a (date, id) descending sort, resuming after `after`.
+export function afterDateIdCursor(after) {
+  return {
+    $or: [
+      { date: { $lt: after.d } },
+      { date: after.d, id: { $lt: after.i } },
+    ],
+  };
+}
@@ -0,0 +1,126 @@
+import { promises as fs } from 'fs';
+import path from 'path';
+import { LRUCache } from '@/lib/cache';
+import { TEMPLATE_VERSION } from '@/lib/pdf-templates.mjs';
+
+// Rendered invoice PDFs. Invoices never change once written, so a PDF is fully
+// determined by (invoice id, template, layout version, shop-settings version);
+// the versions are part of the key and the whole cache is dropped when the
+// settings change. The directory is kept under PDF_CACHE_DISK_MAX_MB by
+// deleting the least recently used files.
+const CACHE_DIR = process.env.PDF_CACHE_DIR || path.join(process.cwd(), '.cache', 'pdfs');
+const DISK_MAX_SIZE = parseInt(process.env.PDF_CACHE_DISK_MAX_MB || '512', 10) * 1024 * 1024;
+
+const memoryCache = new LRUCache({
+  maxEntries: 2000,
+  maxSize: parseInt(process.env.PDF_CACHE_MAX_MB || '64', 10) * 1024 * 1024,
+  sizeOf: (pdf) => pdf.length,
+});
+
+export function pdfCacheKey(invoiceId, template, settingsVersion) {
+  return `${invoiceId}-${template}-t${TEMPLATE_VERSION}-v${settingsVersion || 0}`;
+}
+
+function fileFor(key) {
+  // Invoice ids are uuids; anything else is reduced to safe characters.
+  return path.join(CACHE_DIR, `${key.replace(/[^A-Za-z0-9_-]/g, '_')}.pdf`);
+}
+
+// File name -> size of the files on disk, in least-recently-used order
+// (Map keeps insertion order; a hit moves the file to the end). Seeded from
+// the directory, oldest first by mtime, on the first write.
+let diskFiles = null;
+let diskSize = 0;
+let diskIndexLoading = null;
+
+async function loadDiskIndex() {
+  diskFiles = new Map();
+  diskSize = 0;
+  let names = [];
+  try {
+    names = (await fs.readdir(CACHE_DIR)).filter((name) => name.endsWith('.pdf'));
+  } catch (error) {
+    return;
+  }
+  const files = [];
+  for (const name of names) {
+    try {
+      const { size, mtimeMs } = await fs.stat(path.join(CACHE_DIR, name));
+      files.push({ name, size, mtimeMs });
+    } catch (error) {
+      // Removed meanwhile
+    }
+  }
+  files.sort((a, b) => a.mtimeMs - b.mtimeMs);
+  for (const { name, size } of files) {
+    diskFiles.set(name, size);
+    diskSize += size;
+  }
+}
+
+function touchDiskFile(file) {
+  const name = path.basename(file);
+  if (!diskFiles?.has(name)) return;
+  const size = diskFiles.get(name);
+  diskFiles.delete(name);
+  diskFiles.set(name, size);
+}
+
+async function recordDiskFile(file, size) {
+  if (!diskFiles) {
+    diskIndexLoading ??= loadDiskIndex().finally(() => {
+      diskIndexLoading = null;
+    });
+    await diskIndexLoading;
+  }
+  const name = path.basename(file);
+  diskSize += size - (diskFiles.get(name) || 0);
+  diskFiles.delete(name);
+  diskFiles.set(name, size);
+
+  for (const [oldest, oldestSize] of diskFiles) {
+    if (diskSize <= DISK_MAX_SIZE) break;
+    diskFiles.delete(oldest);
+    diskSize -= oldestSize;
+    await fs.rm(path.join(CACHE_DIR, oldest), { force: true }).catch(() => {});
+  }
+}
+
+export async function getCachedPdf(key) {
+  const cached = memoryCache.get(key);
+  if (cached) return cached;
+
+  try {
+    const file = fileFor(key);
+    const pdf = await fs.readFile(file);
+    memoryCache.set(key, pdf);
+    touchDiskFile(file);
+    return pdf;
+  } catch (error) {
+    return null;
+  }
+}
+
+export async function setCachedPdf(key, pdf) {
+  memoryCache.set(key, pdf);
+  try {
+    await fs.mkdir(CACHE_DIR, { recursive: true });
+    const tmpFile = `${fileFor(key)}.${process.pid}.tmp`;
+    await fs.writeFile(tmpFile, pdf);
+    await fs.rename(tmpFile, fileFor(key));
+    await recordDiskFile(fileFor(key), pdf.length);
+  } catch (error) {
+    console.error('PDF cache write error:', error);
+  }
+}
+
+export async function clearPdfCache() {
+  memoryCache.clear();
+  diskFiles = null;
+  diskSize = 0;
+  try {
+    await fs.rm(CACHE_DIR, { recursive: true, force: true });
+  } catch (error) {
+    console.error('PDF cache clear error:', error);
+  }
+}
@@ -0,0 +1,290 @@
+import { Worker } from 'worker_threads';
+import os from 'os';
+import { createA4InvoiceBatch, renderTemplate } from './pdf-templates.mjs';
+
+// PDF layout is synchronous CPU work. Running it on a small pool of worker
+// threads keeps the request thread free for scans and checkouts while a batch
+// of invoices is being rendered.
+const POOL_SIZE = parseInt(process.env.PDF_WORKERS ?? String(Math.max(1, Math.min(4, os.cpus().length - 1))), 10);
+const QUEUE_LIMIT = parseInt(process.env.PDF_QUEUE_LIMIT || '200', 10);
+const RENDER_TIMEOUT_MS = parseInt(process.env.PDF_RENDER_TIMEOUT_MS || '30000', 10);
+const BATCH_LIMIT = parseInt(process.env.PDF_BATCH_LIMIT || '2', 10);
+
+// Number of recent render durations kept for percentiles.
+const SAMPLE_SIZE = 500;
+
+// Raised when the queue is full; callers should answer 503 and let the client retry.
+export class PdfPoolBusyError extends Error {
+  constructor() {
+    super('PDF renderer is busy, try again shortly');
+    this.name = 'PdfPoolBusyError';
+  }
+}
+
+class PdfWorkerPool {
+  constructor({ size, queueLimit }) {
+    this.size = size;
+    this.queueLimit = queueLimit;
+    this.idle = [];
+    this.workers = new Set();
+    this.queue = [];
+    this.nextId = 1;
+    // Consecutive worker deaths with no successful render in between. If
+    // workers cannot start at all the pool gives up and renders inline.
+    this.crashes = 0;
+    this.broken = false;
+    this.metrics = { completed: 0, failed: 0, rejected: 0, samples: [] };
+  }
+
+  spawn() {
+    const worker = new Worker(new URL('./pdf-worker.mjs', import.meta.url));
+    worker.job = null;
+
+    worker.on('message', ({ id, pdf, chunk, error }) => {
+      const job = worker.job;
+      if (!job || job.id !== id) return;
+      if (chunk) {
+        try {
+          job.onChunk(Buffer.from(chunk.buffer, chunk.byteOffset, chunk.byteLength));
+        } catch (error) {
+          // A consumer that cannot take more output must not kill the listener;
+          // the render still finishes and frees the worker
+          console.error('PDF chunk consumer failed:', error);
+        }
+        return;
+      }
+      this.finish(worker, job, error ? new Error(error) : null, pdf);
+    });
+
+    worker.on('error', (error) => {
+      console.error('PDF worker error:', error);
+      this.replace(worker, error);
+    });
+
+    worker.on('exit', (code) => {
+      if (this.workers.has(worker)) {
+        this.replace(worker, new Error(`PDF worker exited with code ${code}`));
+      }
+    });
+
+    this.workers.add(worker);
+    this.idle.push(worker);
+  }
+
+  // Drops a dead or stuck worker, fails its job and starts a fresh one.
+  replace(worker, error) {
+    if (!this.workers.has(worker)) return;
+    this.workers.delete(worker);
+    this.idle = this.idle.filter((w) => w !== worker);
+    const job = worker.job;
+    worker.job = null;
+    worker.terminate().catch(() => {});
+    if (job) this.settle(job, error);
+
+    this.crashes += 1;
+    if (this.crashes > this.size * 2) {
+      console.error('PDF workers keep failing, rendering on the main thread instead');
+      this.broken = true;
+      for (const queued of this.queue.splice(0)) {
+        renderTemplate(queued.template, queued.args, queued.onChunk).then(queued.resolve, queued.reject);
+      }
+      return;
+    }
+    this.spawn();
+    this.dispatch();
+  }
+
+  isSaturated() {
+    return !this.broken && this.queue.length >= this.queueLimit;
+  }
+
+  run(template, args, onChunk, { reserved = false } = {}) {
+    if (this.broken) {
+      return renderTemplate(template, args, onChunk);
+    }
+    if (this.workers.size === 0) {
+      for (let i = 0; i < this.size; i++) this.spawn();
+    }
+    if (!reserved && this.isSaturated()) {
+      this.metrics.rejected += 1;
+      return Promise.reject(new PdfPoolBusyError());
+    }
+
+    return new Promise((resolve, reject) => {
+      this.queue.push({ id: this.nextId++, template, args, onChunk, resolve, reject });
+      this.dispatch();
+    });
+  }
+
+  dispatch() {
+    while (this.idle.length > 0 && this.queue.length > 0) {
+      const worker = this.idle.pop();
+      const job = this.queue.shift();
+      job.startedAt = Date.now();
+      job.timer = setTimeout(() => {
+        this.replace(worker, new Error('PDF render timed out'));
+      }, RENDER_TIMEOUT_MS);
+      worker.job = job;
+      worker.postMessage({ id: job.id, template: job.template, args: job.args, stream: Boolean(job.onChunk) });
+    }
+  }
+
+  finish(worker, job, error, pdf) {
+    worker.job = null;
+    this.idle.push(worker);
+    this.settle(job, error, pdf);
+    this.dispatch();
+  }
+
+  settle(job, error, pdf) {
+    clearTimeout(job.timer);
+    if (error) {
+      this.metrics.failed += 1;
+      job.reject(error);
+      return;
+    }
+    this.crashes = 0;
+    this.metrics.completed += 1;
+    this.record(Date.now() - job.startedAt);
+    job.resolve(pdf ? Buffer.from(pdf.buffer, pdf.byteOffset, pdf.byteLength) : undefined);
+  }
+
+  record(durationMs) {
+    const { samples } = this.metrics;
+    samples.push(durationMs);
+    if (samples.length > SAMPLE_SIZE) samples.shift();
+  }
+
+  stats() {
+    const sorted = [...this.metrics.samples].sort((a, b) => a - b);
+    const percentile = (p) => (sorted.length ? sorted[Math.min(sorted.length - 1, Math.floor(p * sorted.length))] : 0);
+    return {
+      workers: this.workers.size,
+      busy: this.workers.size - this.idle.length,
+      queueDepth: this.queue.length,
+      queueLimit: this.queueLimit,
+      completed: this.metrics.completed,
+      failed: this.metrics.failed,
+      rejected: this.metrics.rejected,
+      renderMs: {
+        p50: percentile(0.5),
+        p95: percentile(0.95),
+        max: sorted.length ? sorted[sorted.length - 1] : 0,
+      },
+    };
+  }
+}
+
+const pool = POOL_SIZE > 0 ? new PdfWorkerPool({ size: POOL_SIZE, queueLimit: QUEUE_LIMIT }) : null;
+
+// Renders a template on the pool, or inline when PDF_WORKERS=0. With onChunk
+// the PDF is delivered piecewise and the promise resolves when it is complete.
+// reserved jobs belong to a response that passed assertPdfCapacity before its
+// headers went out; they queue past the limit instead of failing mid-body, so
+// callers must bound how many they have queued at once.
+export function renderPdf(template, args, onChunk, { reserved = false } = {}) {
+  if (!pool) return renderTemplate(template, args, onChunk);
+  return pool.run(template, args, onChunk, { reserved });
+}
+
+// Multi-page documents cannot be split across pool workers, so each one gets a
+// worker of its own for its lifetime, at most PDF_BATCH_LIMIT at a time.
+let openBatches = 0;
+
+// Lays pages out on the calling thread when workers are off or failing.
+function inlineBatch(shopInfo, onChunk) {
+  const batch = createA4InvoiceBatch(shopInfo, onChunk);
+  return {
+    async add(invoice) {
+      batch.add(invoice);
+      await new Promise((resolve) => setImmediate(resolve));
+    },
+    end: () => batch.end(),
+    abort() {},
+  };
+}
+
+// Opens a multi-page A4 document. add(invoice) resolves once that page's
+// output has been passed to onChunk, so callers can add one page per read.
+// Throws PdfPoolBusyError when PDF_BATCH_LIMIT documents are already open.
+export function openBatchRender(shopInfo, onChunk) {
+  if (!pool || pool.broken) return inlineBatch(shopInfo, onChunk);
+  if (openBatches >= BATCH_LIMIT) {
+    pool.metrics.rejected += 1;
+    throw new PdfPoolBusyError();
+  }
+
+  openBatches += 1;
+  const worker = new Worker(new URL('./pdf-worker.mjs', import.meta.url));
+  let pending = null;
+  let closed = false;
+
+  const close = () => {
+    if (closed) return;
+    closed = true;
+    openBatches -= 1;
+    worker.terminate().catch(() => {});
+  };
+  const fail = (error) => {
+    const step = pending;
+    pending = null;
+    close();
+    if (step) {
+      clearTimeout(step.timer);
+      step.reject(error);
+    }
+  };
+
+  worker.on('message', ({ chunk, done, error }) => {
+    if (chunk) {
+      try {
+        onChunk(Buffer.from(chunk.buffer, chunk.byteOffset, chunk.byteLength));
+      } catch (consumerError) {
+        console.error('PDF chunk consumer failed:', consumerError);
+      }
+      return;
+    }
+    if (error) {
+      fail(new Error(error));
+      return;
+    }
+    if (done && pending) {
+      const step = pending;
+      pending = null;
+      clearTimeout(step.timer);
+      step.resolve();
+    }
+  });
+  worker.on('error', fail);
+  worker.on('exit', (code) => fail(new Error(`PDF worker exited with code ${code}`)));
+
+  const send = (message) => new Promise((resolve, reject) => {
+    if (closed) {
+      reject(new Error('PDF document is closed'));
+      return;
+    }
+    const timer = setTimeout(() => fail(new Error('PDF render timed out')), RENDER_TIMEOUT_MS);
+    pending = { resolve, reject, timer };
+    worker.postMessage({ id: 1, ...message });
+  });
+
+  worker.postMessage({ id: 1, step: 'start', args: [shopInfo] });
+  return {
+    add: (invoice) => send({ step: 'add', invoice }),
+    end: () => send({ step: 'end' }).finally(close),
+    abort: close,
+  };
+}
+
+// Checked before a streamed response is started, since a 503 can no longer be
+// sent once the body is under way.
+export function assertPdfCapacity() {
+  if (pool?.isSaturated()) {
+    pool.metrics.rejected += 1;
+    throw new PdfPoolBusyError();
+  }
+}
+
+export function getPdfPoolStats() {
+  return pool ? { ...pool.stats(), batches: openBatches } : { workers: 0, inline: true };
+}
@@ -0,0 +1,344 @@
+import PDFDocument from '@foliojs-fork/pdfkit';
+import { formatRupees, invoiceTotals, lineTotalPaise, toPaise } from './pricing.mjs';
+
+// PDF layouts. These run inside the worker pool (lib/pdf-worker.mjs) and are
+// loaded directly by Node there, so this file must only use relative imports.
+
+// Part of every cached PDF's key and ETag. Bump it with any change to how a
+// page looks, so PDFs rendered by the previous layout are not served again.
+export const TEMPLATE_VERSION = 2;
+
+// Wires a document's output either to onChunk (streaming; resolves with no
+// value) or to a buffer that the promise resolves with.
+function collect(doc, resolve, reject, onChunk) {
+  const chunks = [];
+  doc.on('data', (chunk) => (onChunk ? onChunk(chunk) : chunks.push(chunk)));
+  doc.on('end', () => resolve(onChunk ? undefined : Buffer.concat(chunks)));
+  doc.on('error', reject);
+}
+
+// Lays one invoice out on the current page of an A4 document.
+function drawA4Invoice(doc, invoice, shopInfo) {
+  // Header
+  doc.fontSize(20).text(shopInfo.name || 'Jewelry Store', { align: 'center' });
+  doc.fontSize(10).text(shopInfo.address || '', { align: 'center' });
+  doc.text(`Phone: ${shopInfo.phone || ''} | GST: ${shopInfo.gst || ''}`, { align: 'center' });
+  doc.moveDown();
+
+  // Invoice details
+  doc.fontSize(12).text(`Invoice #: ${invoice.id}`, { align: 'left' });
+  doc.text(`Date: ${new Date(invoice.date).toLocaleDateString()}`);
+  doc.text(`Customer: ${invoice.customer?.name || 'Walk-in'}`);
+  if (invoice.customer?.whatsapp) {
+    doc.text(`WhatsApp: ${invoice.customer.whatsapp}`);
+  }
+  doc.moveDown();
+
+  // Table header
+  const tableTop = doc.y;
+  doc.fontSize(10).text('Item', 50, tableTop, { width: 200 });
+  doc.text('Qty', 250, tableTop, { width: 50 });
+  doc.text('Price', 300, tableTop, { width: 100 });
+  doc.text('Total', 400, tableTop, { width: 100 });
+  doc.moveTo(50, tableTop + 15).lineTo(550, tableTop + 15).stroke();
+
+  // Items
+  let y = tableTop + 25;
+  invoice.items.forEach((item) => {
+    doc.text(item.name, 50, y, { width: 200 });
+    doc.text(item.qty.toString(), 250, y, { width: 50 });
+    doc.text(`₹${formatRupees(toPaise(item.price))}`, 300, y, { width: 100 });
+    doc.text(`₹${formatRupees(lineTotalPaise(item.price, item.qty))}`, 400, y, { width: 100 });
+    y += 20;
+  });
+
+  doc.moveDown();
+  y = doc.y + 10;
+
+  // Totals
+  const totals = invoiceTotals(invoice);
+  doc.moveTo(50, y).lineTo(550, y).stroke();
+  y += 10;
+  doc.text(`Subtotal:`, 350, y);
+  doc.text(`₹${totals.subTotal.toFixed(2)}`, 450, y);
+  y += 20;
+
+  if (invoice.discountPercent > 0) {
+    doc.text(`Discount (${invoice.discountPercent}%):`, 350, y);
+    doc.text(`-₹${totals.discount.toFixed(2)}`, 450, y);
+    y += 20;
+  }
+  
+  if (invoice.gstPercent > 0) {
+    doc.text(`GST (${invoice.gstPercent}%):`, 350, y);
+    doc.text(`+₹${totals.gst.toFixed(2)}`, 450, y);
+    y += 20;
+  }
+
+  doc.fontSize(12).text(`Grand Total:`, 350, y);
+  doc.text(`₹${totals.grandTotal.toFixed(2)}`, 450, y);
+}
+
+export function generateA4Invoice(invoice, shopInfo, onChunk) {
+  return new Promise((resolve, reject) => {
+    try {
+      const doc = new PDFDocument({ size: 'A4', margin: 50 });
+      collect(doc, resolve, reject, onChunk);
+      drawA4Invoice(doc, invoice, shopInfo);
+      doc.end();
+    } catch (error) {
+      console.error('PDF Generation Error:', error);
+      reject(error);
+    }
+  });
+}
+
+// Many invoices in one A4 document, one invoice per page, for period exports.
+// Pages are added as invoices arrive and the output goes to onChunk as it is
+// produced, so the caller never holds more than the current page.
+export function createA4InvoiceBatch(shopInfo, onChunk) {
+  const doc = new PDFDocument({ size: 'A4', margin: 50, autoFirstPage: false });
+  const done = new Promise((resolve, reject) => collect(doc, resolve, reject, onChunk));
+
+  return {
+    add(invoice) {
+      doc.addPage();
+      drawA4Invoice(doc, invoice, shopInfo);
+    },
+    end() {
+      doc.end();
+      return done;
+    },
+  };
+}
+
+export function generateThermalInvoice(invoice = {}, shopInfo = {}, onChunk) {
+  return new Promise((resolve, reject) => {
+    try {
+      // Page / layout
+      const pageWidth = 226.8; // 80mm in points
+      const margin = 8;
+      const doc = new PDFDocument({ size: [pageWidth, 600], margin, bufferPages: true });
+      collect(doc, resolve, reject, onChunk);
+
+      // Content area
+      const contentLeft = margin;
+      const contentRight = pageWidth - margin;
+      const contentWidth = contentRight - contentLeft;
+
+      // Column widths (tuned to match image)
+      const snWidth = 12;
+      const qtyWidth = 20;
+      const priceWidth = 50;
+      const amtWidth = 50;
+      // compute X positions from right so totals line up
+      const amtX = contentRight - amtWidth;
+      const priceX = amtX - 6 - priceWidth;
+      const qtyX = priceX - 6 - qtyWidth;
+      const itemX = contentLeft + snWidth + 6; // leave a small gap after SN
+      const itemWidth = qtyX - 6 - itemX;
+
+      // small helpers
+      const drawSeparator = (y) => {
+        doc.save();
+        doc.moveTo(contentLeft, y).lineTo(contentRight, y).stroke();
+        doc.restore();
+      };
+
+      // Fonts & header
+      doc.font('Helvetica-Bold').fontSize(13).text(shopInfo.name || 'BUSINESS NAME', { align: 'center' });
+      doc.font('Helvetica').fontSize(8);
+      (shopInfo.address || 'Address Line 1\nCity, State, ZIP').split('\n').forEach(line => {
+        doc.text(line.trim(), { align: 'center' });
+      });
+      if (shopInfo.phone) doc.text(`PHONE: ${shopInfo.phone}`, { align: 'center' });
+      if (shopInfo.gst) doc.text(`GSTIN: ${shopInfo.gst}`, { align: 'center' });
+
+      doc.moveDown(0.4);
+
+      // Bill No (left) and Date (right) on same Y
+      const billDateY = doc.y;
+      const halfWidth = contentWidth / 2;
+      doc.font('Helvetica').fontSize(8);
+      doc.text(`Bill No: ${invoice.id || 'IN-XXXX'}`, contentLeft, billDateY, { width: halfWidth, align: 'left' });
+      const dateStr = invoice.date ? new Date(invoice.date).toLocaleDateString('en-IN') : '';
+      doc.text(`Date: ${dateStr}`, contentLeft + halfWidth, billDateY, { width: halfWidth, align: 'right' });
+
+      doc.moveDown(0.4);
+
+      // Customer name (if any)
+      if (invoice.customer?.name) {
+        doc.text(`Customer: ${invoice.customer.name}`, { align: 'left' });
+        doc.moveDown(0.2);
+      }
+
+      // separator (drawn)
+      drawSeparator(doc.y + 2);
+      doc.moveDown(0.5);
+
+      // Table header
+      doc.font('Helvetica-Bold').fontSize(8);
+      const headerY = doc.y;
+      doc.text('SN', contentLeft, headerY, { width: snWidth, align: 'left' });
+      doc.text('Item', itemX, headerY, { width: itemWidth, align: 'left' });
+      doc.text('Qty', qtyX, headerY, { width: qtyWidth, align: 'right' });
+      doc.text('Price', priceX, headerY, { width: priceWidth, align: 'right' });
+      doc.text('Amt', amtX, headerY, { width: amtWidth, align: 'right' });
+
+      doc.font('Helvetica').fontSize(8);
+      doc.moveDown(0.5);
+
+      // Items
+      (invoice.items || []).forEach((item, idx) => {
+        const y = doc.y;
+        const total = (typeof item.totalWithTax === 'number') ? item.totalWithTax : lineTotalPaise(item.price, item.qty) / 100;
+        doc.text(String(idx + 1), contentLeft, y, { width: snWidth, align: 'left' });
+
+        // item name allowed to wrap inside itemWidth
+        doc.text(item.name || '', itemX, y, { width: itemWidth, align: 'left' });
+
+        // qty / price / amt must be on same Y (first line)
+        doc.text(String(item.qty || 0), qtyX, y, { width: qtyWidth, align: 'right' });
+        doc.text(formatRupees(toPaise(item.price)), priceX, y, { width: priceWidth, align: 'right' });
+        doc.text(Number(total).toFixed(2), amtX, y, { width: amtWidth, align: 'right' });
+
+        // move down consistently (wraps are handled by PDFKit)
+        doc.moveDown(0.6);
+      });
+
+      // separator line
+      drawSeparator(doc.y + 2);
+      doc.moveDown(0.4);
+
+      // Totals area (right aligned amounts to amt column)
+      const totals = invoiceTotals(invoice);
+      const currentY = doc.y;
+      // Subtotal label left, value right aligned in amt column
+      doc.font('Helvetica').fontSize(8);
+      doc.text('Subtotal:', contentLeft, currentY, { width: contentWidth - amtWidth - 6, align: 'left' });
+      doc.text(totals.subTotal.toFixed(2), amtX, currentY, { width: amtWidth, align: 'right' });
+
+      // Discount (if any)
+      let yPos = doc.y + 8;
+      const discountPercent = Number(invoice.discountPercent || 0);
+      if (discountPercent > 0) {
+        doc.text(`Discount (${discountPercent}%):`, contentLeft, yPos, { width: contentWidth - amtWidth - 6, align: 'left' });
+        doc.text(`-${totals.discount.toFixed(2)}`, amtX, yPos, { width: amtWidth, align: 'right' });
+        yPos += 10;
+      }
+
+      // GST (single line)
+      const gstPercent = Number(invoice.gstPercent || 0);
+      doc.text(`GST (${gstPercent}%):`, contentLeft, yPos, { width: contentWidth - amtWidth - 6, align: 'left' });
+      doc.text(totals.gst.toFixed(2), amtX, yPos, { width: amtWidth, align: 'right' });
+
+      doc.moveDown(2);
+
+      // Draw separator before TOTAL
+      drawSeparator(doc.y + 2);
+      doc.moveDown(0.6);
+
+      // Grand total (bold)
+      doc.font('Helvetica-Bold').fontSize(10);
+      doc.text('TOTAL:', contentLeft, doc.y, { width: contentWidth - amtWidth - 6, align: 'left' });
+      doc.text(totals.grandTotal.toFixed(2), amtX, doc.y, { width: amtWidth, align: 'right' });
+
+      doc.moveDown(0.6);
+      drawSeparator(doc.y + 2);
+      doc.moveDown(1);
+
+      // Footer
+      doc.font('Helvetica-Bold').fontSize(9).text('Thank You!', { align: 'center' });
+
+      doc.end();
+    } catch (err) {
+      reject(err);
+   }
+ });
+}
+const MM = 72 / 25.4; // PDF points per millimetre
+
+// Label sheet for the barcode printer. Defaults match the 100mm x 15mm
+// two-part jewellery tag: name and code on the left flap, barcode and price on
+// the right, with a black tail for the printer's gap sensor. Each label is a
+// { product, image } pair where image indexes into `images`, so every copy of
+// a barcode shares one embedded PNG.
+export function generateLabelSheet(labels, images, layout = {}, onChunk) {
+  return new Promise((resolve, reject) => {
+    try {
+      const labelWidth = (layout.labelWidth || 100) * MM;
+      const labelHeight = (layout.labelHeight || 15) * MM;
+      const columns = Math.max(1, layout.columns || 1);
+      const rows = Math.max(1, layout.rows || 1);
+      const perPage = columns * rows;
+
+      const doc = new PDFDocument({ size: [labelWidth * columns, labelHeight * rows], margin: 0, autoFirstPage: false });
+      collect(doc, resolve, reject, onChunk);
+
+      const embedded = new Map();
+      const flapWidth = labelWidth * 0.48;
+      const padding = 2 * MM;
+
+      labels.forEach(({ product, image }, index) => {
+        if (index % perPage === 0) doc.addPage();
+        const slot = index % perPage;
+        const x = (slot % columns) * labelWidth;
+        const y = Math.floor(slot / columns) * labelHeight;
+
+        if (!embedded.has(image)) embedded.set(image, doc.openImage(images[image]));
+
+        // Left flap - name and code
+        doc.font('Helvetica-Bold').fontSize(8)
+          .text(String(product.name || '').substring(0, 30), x + padding, y + padding, { width: flapWidth - 2 * padding, height: 8 * MM, lineGap: 0 });
+        doc.font('Helvetica').fontSize(7)
+          .text(`Code: ${product.code || ''}`, x + padding, y + labelHeight - padding - 8, { width: flapWidth - 2 * padding });
+
+        // Perforation
+        doc.save()
+          .moveTo(x + flapWidth, y + MM).lineTo(x + flapWidth, y + labelHeight - MM)
+          .dash(2, { space: 2 }).lineWidth(0.5).strokeColor('#999999').stroke()
+          .restore();
+
+        // Right flap - barcode and price
+        const rightX = x + labelWidth - flapWidth;
+        doc.image(embedded.get(image), rightX + (flapWidth - 40 * MM) / 2, y + padding, { fit: [40 * MM, 8 * MM], align: 'center', valign: 'center' });
+        doc.font('Helvetica-Bold').fontSize(9)
+          .text(`Rs. ${product.sellPrice ?? ''}`, rightX, y + padding + 8 * MM + 1, { width: flapWidth, align: 'center' });
+
+        // Tail
+        doc.rect(x + labelWidth - 3 * MM, y, 3 * MM, labelHeight).fill('#000000');
+        doc.fillColor('#000000');
+      });
+
+      doc.end();
+    } catch (error) {
+      console.error('Label Sheet Generation Error:', error);
+      reject(error);
+    }
+  });
+}
+
+// Buffers lose their prototype when posted to a worker; PDFKit needs real ones.
+function toBuffer(data) {
+  return Buffer.isBuffer(data) ? data : Buffer.from(data.buffer, data.byteOffset, data.byteLength);
+}
+
+// onChunk, when given, receives the document as it is produced.
+export function renderTemplate(template, args, onChunk) {
+  switch (template) {
+    case 'a4': {
+      const [invoice, shopInfo] = args;
+      return generateA4Invoice(invoice, shopInfo, onChunk);
+    }
+    case 'thermal': {
+      const [invoice, shopInfo] = args;
+      return generateThermalInvoice(invoice, shopInfo, onChunk);
+    }
+    case 'labels': {
+      const [labels, images, layout] = args;
+      return generateLabelSheet(labels, images.map(toBuffer), layout, onChunk);
+    }
+    default:
+      return Promise.reject(new Error(`Unknown PDF template: ${template}`));
+  }
+}
@@ -0,0 +1,42 @@
+import { parentPort } from 'worker_threads';
+import { createA4InvoiceBatch, renderTemplate } from './pdf-templates.mjs';
+
+// One render at a time per worker; the pool only hands a worker its next job
+// after this one has replied. Streaming jobs post each chunk as PDFKit emits it
+// and finish with { done: true }; others reply once with the whole PDF.
+// A worker opened for a multi-page document instead gets batch messages:
+// 'start' once, then 'add' per invoice and 'end', each but 'start' answered
+// with { done: true } after its output has been posted.
+let batch = null;
+
+parentPort.on('message', async ({ id, template, args, stream, step, invoice }) => {
+  try {
+    if (step === 'start') {
+      const [shopInfo] = args;
+      batch = createA4InvoiceBatch(shopInfo, (chunk) => parentPort.postMessage({ id, chunk }));
+      return;
+    }
+    if (step === 'add') {
+      batch.add(invoice);
+      // Let PDFKit emit the page before acknowledging it
+      await new Promise((resolve) => setImmediate(resolve));
+      parentPort.postMessage({ id, done: true });
+      return;
+    }
+    if (step === 'end') {
+      await batch.end();
+      parentPort.postMessage({ id, done: true });
+      return;
+    }
+
+    if (stream) {
+      await renderTemplate(template, args, (chunk) => parentPort.postMessage({ id, chunk }));
+      parentPort.postMessage({ id, done: true });
+    } else {
+      const pdf = await renderTemplate(template, args);
+      parentPort.postMessage({ id, pdf });
+    }
+  } catch (error) {
+    parentPort.postMessage({ id, error: error.message || 'PDF generation failed' });
+  }
+});
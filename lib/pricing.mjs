@@ -0,0 +1,72 @@
+// Bill arithmetic. Prices and totals are stored in rupees, but every sum here
+// is done in integer paise and rounded once per step (discount, then GST), so
+// the billing screen, the stored invoice, the PDFs and the WhatsApp text all
+// show the same figures. Used by the PDF worker too, so it has no imports.
+
+export function toPaise(rupees) {
+  const value = Number(rupees);
+  if (!Number.isFinite(value)) return 0;
+  // toFixed first so 1.005 * 100 = 100.49999... still rounds to 101
+  return Math.round(Number((value * 100).toFixed(4)));
+}
+
+export function fromPaise(paise) {
+  return paise / 100;
+}
+
+// "1234.50" for 123450 paise.
+export function formatRupees(paise) {
+  return (paise / 100).toFixed(2);
+}
+
+export function lineTotalPaise(price, qty) {
+  return toPaise(price) * (qty || 0);
+}
+
+function percentOf(paise, percent) {
+  return Math.round((paise * (Number(percent) || 0)) / 100);
+}
+
+// Discount, taxable amount, GST and grand total for a subtotal, all in paise.
+export function totalsFromSubTotal(subTotal, discountPercent = 0, gstPercent = 0) {
+  const discount = percentOf(subTotal, discountPercent);
+  const taxable = subTotal - discount;
+  const gst = percentOf(taxable, gstPercent);
+  return { subTotal, discount, taxable, gst, grandTotal: taxable + gst };
+}
+
+// Totals for a list of { price, qty } lines, in paise.
+export function priceLines(items, discountPercent = 0, gstPercent = 0) {
+  const subTotal = (items || []).reduce((sum, item) => sum + lineTotalPaise(item.price, item.qty), 0);
+  return totalsFromSubTotal(subTotal, discountPercent, gstPercent);
+}
+
+// Returns an error message for invoice lines and percentages the server
+// cannot price, or null.
+export function validatePricing({ items, discountPercent = 0, gstPercent = 0 }) {
+  if (!Array.isArray(items) || items.length === 0) return 'items must be a non-empty array';
+  for (const item of items) {
+    if (!Number.isInteger(item?.qty) || item.qty < 1) return 'qty must be a whole number of 1 or more';
+    const price = Number(item.price);
+    if (!Number.isFinite(price) || price < 0) return 'price must be a number of 0 or more';
+  }
+  for (const [name, value] of [['discountPercent', discountPercent], ['gstPercent', gstPercent]]) {
+    const percent = Number(value || 0);
+    if (!Number.isFinite(percent) || percent < 0 || percent > 100) return `${name} must be between 0 and 100`;
+  }
+  return null;
+}
+
+// Rupee totals to show for a stored invoice. Invoices priced before the
+// server computed totals keep the grand total they were charged.
+export function invoiceTotals(invoice) {
+  const totals = totalsFromSubTotal(toPaise(invoice.subTotal), invoice.discountPercent, invoice.gstPercent);
+  if (typeof invoice.grandTotal === 'number') totals.grandTotal = toPaise(invoice.grandTotal);
+  return {
+    subTotal: fromPaise(totals.subTotal),
+    discount: fromPaise(totals.discount),
+    taxable: fromPaise(totals.taxable),
+    gst: fromPaise(totals.gst),
+    grandTotal: fromPaise(totals.grandTotal),
+  };
+}
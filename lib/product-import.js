@@ -0,0 +1,202 @@
+import { v4 as uuidv4 } from 'uuid';
+import { createCodeSequence } from '@/lib/barcode';
+import { parseCsv, splitLines, toCsvRow } from '@/lib/csv';
+import { buildSearchKeys } from '@/lib/search';
+
+// Bulk product import and export. Both directions stream: the import reads the
+// request body a chunk at a time and writes every IMPORT_CHUNK_SIZE valid rows
+// with one insertMany, and the export pages through a cursor. Exported files
+// use the import columns, so a catalogue can be moved between branches.
+
+export const PRODUCT_COLUMNS = ['code', 'barcode', 'name', 'category', 'stock', 'mrp', 'sellPrice'];
+
+export const PRODUCT_FILE_FORMATS = {
+  csv: { contentType: 'text/csv; charset=utf-8', extension: 'csv' },
+  ndjson: { contentType: 'application/x-ndjson', extension: 'ndjson' },
+};
+
+const IMPORT_CHUNK_SIZE = 1000;
+const MAX_NAME_LENGTH = 200;
+
+// Yields { row, record } per data row (1-based, header excluded), or
+// { row, error } when the row cannot be read at all.
+async function* readRecords(body, format) {
+  const text = body.pipeThrough(new TextDecoderStream());
+  let row = 0;
+
+  if (format === 'ndjson') {
+    for await (const line of splitLines(text)) {
+      if (!line.trim()) continue;
+      row += 1;
+      try {
+        yield { row, record: JSON.parse(line) };
+      } catch (error) {
+        yield { row, error: 'Invalid JSON' };
+      }
+    }
+    return;
+  }
+
+  let header = null;
+  for await (const fields of parseCsv(text)) {
+    if (fields.every((field) => field.trim() === '')) continue;
+    if (!header) {
+      header = fields.map((name) => name.trim());
+      continue;
+    }
+    row += 1;
+    yield { row, record: Object.fromEntries(header.map((name, i) => [name, fields[i]])) };
+  }
+}
+
+function readNumber(value, { integer = false } = {}) {
+  if (value === undefined || value === null || String(value).trim() === '') return 0;
+  const number = Number(value);
+  if (!Number.isFinite(number) || number < 0 || (integer && !Number.isInteger(number))) return null;
+  return number;
+}
+
+function readText(value) {
+  return value === undefined || value === null ? '' : String(value).trim();
+}
+
+// Returns { product } or { error } for one import record. Codes are assigned
+// later, in bulk.
+export function validateProductRecord(record) {
+  if (!record || typeof record !== 'object' || Array.isArray(record)) {
+    return { error: 'Row must be an object' };
+  }
+  const name = readText(record.name);
+  if (!name) return { error: 'name is required' };
+  if (name.length > MAX_NAME_LENGTH) return { error: `name is longer than ${MAX_NAME_LENGTH} characters` };
+
+  const stock = readNumber(record.stock, { integer: true });
+  if (stock === null) return { error: 'stock must be a whole number of 0 or more' };
+  const mrp = readNumber(record.mrp);
+  if (mrp === null) return { error: 'mrp must be a number of 0 or more' };
+  const sellPrice = readNumber(record.sellPrice);
+  if (sellPrice === null) return { error: 'sellPrice must be a number of 0 or more' };
+
+  return {
+    product: {
+      code: readText(record.code) || null,
+      barcode: readText(record.barcode) || null,
+      name,
+      category: readText(record.category) || 'General',
+      stock,
+      mrp,
+      sellPrice,
+    },
+  };
+}
+
+function duplicateKeyMessage(writeError) {
+  const fields = Object.keys(writeError.err?.keyValue || writeError.errInfo?.keyValue || {});
+  return fields.length > 0 ? `Duplicate ${fields.join(', ')}` : 'Duplicate code or barcode';
+}
+
+// Inserts one chunk; returns the products written and { row, error } for the
+// rows the unique indexes refused.
+async function writeChunk(products, rows) {
+  try {
+    await products.insertMany(rows.map(({ doc }) => doc), { ordered: false });
+    return { inserted: rows, errors: [] };
+  } catch (error) {
+    if (!error?.writeErrors) throw error;
+    const failed = new Map(error.writeErrors.map((writeError) => [writeError.index, writeError]));
+    return {
+      inserted: rows.filter((_, i) => !failed.has(i)),
+      errors: [...failed].map(([i, writeError]) => ({
+        row: rows[i].row,
+        error: writeError.code === 11000 ? duplicateKeyMessage(writeError) : writeError.errmsg,
+      })),
+    };
+  }
+}
+
+// Runs an import and yields events for the client as it goes:
+// { type: 'error', row, error } for each refused row, { type: 'progress', ... }
+// after each chunk is written and a final { type: 'done', ... }. onInserted is
+// called (and awaited) with the products of each written chunk.
+export async function* importProducts(db, body, format, { onInserted } = {}) {
+  const products = db.collection('products');
+  const nextCode = createCodeSequence();
+  const counts = { processed: 0, inserted: 0, failed: 0 };
+  let pending = [];
+
+  const flush = async function* () {
+    const { inserted, errors } = await writeChunk(products, pending);
+    pending = [];
+    counts.inserted += inserted.length;
+    counts.failed += errors.length;
+    for (const error of errors) yield { type: 'error', ...error };
+    if (inserted.length > 0 && onInserted) {
+      await onInserted(inserted.map(({ doc: { searchKeys, _id, ...product } }) => product));
+    }
+    yield { type: 'progress', ...counts };
+  };
+
+  for await (const { row, record, error } of readRecords(body, format)) {
+    counts.processed += 1;
+    const result = error ? { error } : validateProductRecord(record);
+    if (result.error) {
+      counts.failed += 1;
+      yield { type: 'error', row, error: result.error };
+      continue;
+    }
+
+    const { product } = result;
+    const code = product.code || nextCode();
+    const now = new Date().toISOString();
+    const doc = {
+      id: uuidv4(),
+      ...product,
+      code,
+      barcode: product.barcode || code,
+      createdAt: now,
+      updatedAt: now,
+    };
+    doc.searchKeys = buildSearchKeys(doc);
+    pending.push({ row, doc });
+
+    if (pending.length >= IMPORT_CHUNK_SIZE) {
+      yield* flush();
+    }
+  }
+  if (pending.length > 0) {
+    yield* flush();
+  }
+  yield { type: 'done', ...counts };
+}
+
+// Streams the catalogue as CSV or NDJSON, in code order.
+export function productExportStream(db, format) {
+  const encoder = new TextEncoder();
+  const cursor = db.collection('products')
+    .find({}, { projection: { _id: 0, ...Object.fromEntries(PRODUCT_COLUMNS.map((column) => [column, 1])) } })
+    .sort({ code: 1 })
+    .batchSize(1000);
+  let headerSent = format !== 'csv';
+
+  return new ReadableStream({
+    async pull(controller) {
+      let text = headerSent ? '' : toCsvRow(PRODUCT_COLUMNS);
+      headerSent = true;
+      for (let i = 0; i < 500; i++) {
+        const product = await cursor.next();
+        if (!product) {
+          if (text) controller.enqueue(encoder.encode(text));
+          controller.close();
+          return;
+        }
+        text += format === 'csv'
+          ? toCsvRow(PRODUCT_COLUMNS.map((column) => product[column]))
+          : `${JSON.stringify(product)}\n`;
+      }
+      controller.enqueue(encoder.encode(text));
+    },
+    cancel() {
+      return cursor.close();
+    },
+  });
+}
@@ -0,0 +1,106 @@
+// Sales reporting. Buckets are computed in the shop's timezone so that a sale at
+// 11pm lands on the day the shopkeeper expects.
+export const REPORT_TIMEZONE = process.env.REPORT_TIMEZONE || 'Asia/Kolkata';
+
+export const GROUP_BY_OPTIONS = ['day', 'week', 'month', 'paymentMode', 'category', 'product'];
+
+// Maps in the daily_sales documents that can be broken down by key.
+const BREAKDOWN_FIELDS = { paymentMode: 'paymentModes', category: 'categories', product: 'products' };
+
+function bucketKey(groupBy) {
+  switch (groupBy) {
+    case 'week':
+      return {
+        $dateToString: {
+          format: '%Y-%m-%d',
+          date: { $dateTrunc: { date: { $dateFromString: { dateString: '$date' } }, unit: 'week', startOfWeek: 'monday' } },
+        },
+      };
+    case 'month':
+      return { $substrCP: ['$date', 0, 7] };
+    default:
+      return '$date';
+  }
+}
+
+function seriesStages(groupBy) {
+  const field = BREAKDOWN_FIELDS[groupBy];
+  if (field) {
+    return [
+      { $project: { entry: { $objectToArray: { $ifNull: [`$${field}`, {}] } } } },
+      { $unwind: '$entry' },
+      {
+        $group: {
+          _id: '$entry.k',
+          name: { $last: '$entry.v.name' },
+          sales: { $sum: '$entry.v.sales' },
+          quantity: { $sum: '$entry.v.quantity' },
+          count: { $sum: '$entry.v.count' },
+        },
+      },
+      { $project: { _id: 0, key: '$_id', name: 1, sales: 1, quantity: 1, count: 1 } },
+      { $sort: groupBy === 'paymentMode' ? { count: -1 } : { sales: -1 } },
+    ];
+  }
+
+  return [
+    {
+      $group: {
+        _id: bucketKey(groupBy),
+        sales: { $sum: '$sales' },
+        discount: { $sum: '$discount' },
+        count: { $sum: '$invoices' },
+      },
+    },
+    { $project: { _id: 0, key: '$_id', sales: 1, discount: 1, count: 1 } },
+    { $sort: { key: 1 } },
+  ];
+}
+
+export function dateRangeFilter(from, to) {
+  const range = {};
+  if (from) range.$gte = from.toISOString();
+  if (to) range.$lt = to.toISOString();
+  return Object.keys(range).length > 0 ? { date: range } : {};
+}
+
+// Runs against the daily_sales rollups, so cost depends on the number of days
+// in the range rather than the number of invoices. Ranges are widened to whole
+// days in the report timezone.
+export function buildSalesPipeline({ fromDay, toDay, groupBy }) {
+  const range = {};
+  if (fromDay) range.$gte = fromDay;
+  if (toDay) range.$lte = toDay;
+
+  return [
+    { $match: Object.keys(range).length > 0 ? { date: range } : {} },
+    {
+      $facet: {
+        totals: [
+          {
+            $group: {
+              _id: null,
+              sales: { $sum: '$sales' },
+              subTotal: { $sum: '$subTotal' },
+              discount: { $sum: '$discount' },
+              invoices: { $sum: '$invoices' },
+              discountedInvoices: { $sum: '$discountedInvoices' },
+            },
+          },
+          { $project: { _id: 0 } },
+        ],
+        series: seriesStages(groupBy),
+      },
+    },
+  ];
+}
+
+export const EMPTY_TOTALS = { sales: 0, subTotal: 0, discount: 0, invoices: 0, discountedInvoices: 0 };
+
+// Accepts ISO 8601 timestamps or dates; returns null for missing values and
+// undefined for values that do not parse.
+export function parseReportDate(value) {
+  if (!value) return null;
+  const date = new Date(value);
+  return Number.isNaN(date.getTime()) ? undefined : date;
+}
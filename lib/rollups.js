@@ -0,0 +1,195 @@
+import { REPORT_TIMEZONE } from '@/lib/reports';
+import { invoiceTotals, lineTotalPaise } from '@/lib/pricing.mjs';
+import { acquireLock } from '@/lib/locks';
+
+// Pre-aggregated daily sales. Every invoice bumps counters on the document for
+// its local day, so reports read a handful of small documents no matter how
+// many invoices the shop has written.
+export const DAILY_SALES = 'daily_sales';
+
+const dayFormatter = new Intl.DateTimeFormat('en-CA', {
+  timeZone: REPORT_TIMEZONE,
+  year: 'numeric',
+  month: '2-digit',
+  day: '2-digit',
+});
+
+// YYYY-MM-DD in the report timezone.
+export function localDay(date) {
+  return dayFormatter.format(new Date(date));
+}
+
+// Payment modes, categories and product ids become field names, which must not
+// contain '.' or start with '$'.
+function fieldKey(value) {
+  return String(value || 'Unknown').replace(/\./g, '_').replace(/^\$/, '_');
+}
+
+function add(target, path, amount) {
+  target[path] = (target[path] || 0) + amount;
+}
+
+// Flat $inc/$set documents describing one invoice's contribution to its day.
+export function buildRollupUpdate(invoice) {
+  const inc = {};
+  const set = {};
+
+  const { subTotal, discount, gst, grandTotal: sales } = invoiceTotals(invoice);
+  const mode = fieldKey(invoice.paymentMode || 'Cash');
+
+  add(inc, 'sales', sales);
+  add(inc, 'subTotal', subTotal);
+  add(inc, 'discount', discount);
+  add(inc, 'gst', gst);
+  add(inc, 'invoices', 1);
+  add(inc, 'discountedInvoices', (invoice.discountPercent || 0) > 0 ? 1 : 0);
+  add(inc, `paymentModes.${mode}.sales`, sales);
+  add(inc, `paymentModes.${mode}.count`, 1);
+
+  const categories = new Set();
+  for (const item of invoice.items || []) {
+    const qty = Number(item.qty) || 0;
+    const lineTotal = lineTotalPaise(item.price, qty) / 100;
+    const category = fieldKey(item.category || 'General');
+    categories.add(category);
+    add(inc, `categories.${category}.sales`, lineTotal);
+    add(inc, `categories.${category}.quantity`, qty);
+
+    if (item.productId) {
+      const product = fieldKey(item.productId);
+      add(inc, `products.${product}.sales`, lineTotal);
+      add(inc, `products.${product}.quantity`, qty);
+      set[`products.${product}.name`] = item.name || '';
+    }
+  }
+  for (const category of categories) {
+    add(inc, `categories.${category}.count`, 1);
+  }
+
+  return { inc, set };
+}
+
+function toUpdate({ inc, set }) {
+  const update = { $inc: inc };
+  if (Object.keys(set).length > 0) update.$set = set;
+  return update;
+}
+
+export async function recordDailySales(db, invoice, session) {
+  await db.collection(DAILY_SALES).updateOne(
+    { date: localDay(invoice.date) },
+    toUpdate(buildRollupUpdate(invoice)),
+    { upsert: true, session: session || undefined }
+  );
+}
+
+// Batch form of recordDailySales: contributions are merged per day so a batch
+// of bills costs one upsert per day touched.
+export async function recordDailySalesMany(db, invoices, session) {
+  const days = new Map();
+  for (const invoice of invoices) {
+    const day = localDay(invoice.date);
+    const { inc, set } = buildRollupUpdate(invoice);
+    const merged = days.get(day) || { inc: {}, set: {} };
+    for (const [path, amount] of Object.entries(inc)) add(merged.inc, path, amount);
+    Object.assign(merged.set, set);
+    days.set(day, merged);
+  }
+  if (days.size === 0) return;
+
+  await db.collection(DAILY_SALES).bulkWrite(
+    [...days].map(([date, update]) => ({
+      updateOne: { filter: { date }, update: toUpdate(update), upsert: true },
+    })),
+    { ordered: false, session: session || undefined }
+  );
+}
+
+// Long enough for a rebuild over years of invoices; renewed while it runs.
+const REBUILD_LOCK_TTL_MS = 10 * 60 * 1000;
+
+const ROLLUP_PROJECTION = { _id: 0, date: 1, subTotal: 1, grandTotal: 1, discountPercent: 1, gstPercent: 1, paymentMode: 1, items: 1 };
+
+// ISO bounds of the UTC days either side of a local day, which hold the whole
+// local day in any timezone.
+function dayWindow(day) {
+  const start = new Date(`${day}T00:00:00Z`);
+  start.setUTCDate(start.getUTCDate() - 1);
+  const end = new Date(`${day}T00:00:00Z`);
+  end.setUTCDate(end.getUTCDate() + 2);
+  return { $gte: start.toISOString(), $lt: end.toISOString() };
+}
+
+// Recomputes one day's rollup from its invoices and replaces it. Checkouts
+// for the day write the same document in their transactions, so one of the
+// two retries and the day counts every invoice exactly once. Returns the
+// number of invoices counted.
+async function rebuildDay(db, day, session) {
+  const pending = { inc: {}, set: {} };
+  let count = 0;
+  const cursor = db.collection('invoices')
+    .find({ date: dayWindow(day) }, { projection: ROLLUP_PROJECTION, session: session || undefined })
+    .batchSize(500);
+  for await (const invoice of cursor) {
+    if (localDay(invoice.date) !== day) continue;
+    const { inc, set } = buildRollupUpdate(invoice);
+    for (const [path, amount] of Object.entries(inc)) add(pending.inc, path, amount);
+    Object.assign(pending.set, set);
+    count += 1;
+  }
+
+  const rollups = db.collection(DAILY_SALES);
+  await rollups.deleteOne({ date: day }, { session: session || undefined });
+  if (count > 0) {
+    await rollups.updateOne({ date: day }, toUpdate(pending), { upsert: true, session: session || undefined });
+  }
+  return count;
+}
+
+// Recomputes every rollup from raw invoices, one day per transaction
+// (inTransaction is withTransaction from lib/db). Each day is replaced whole
+// and is exact even while checkouts run; readers see every day either as it
+// was or as rebuilt. Rollups of days that no longer have invoices are
+// removed. Only one rebuild runs at a time across instances (returns null if
+// another holds the lock). Without transactions (a standalone server) a sale
+// committed during its day's rebuild can be missed, as with other multi-step
+// writes there.
+export async function rebuildDailySales(db, inTransaction) {
+  const lock = await acquireLock(db, 'daily-sales-rebuild', REBUILD_LOCK_TTL_MS);
+  if (!lock) return null;
+
+  try {
+    const days = new Set();
+    const dates = db.collection('invoices').find({}, { projection: { _id: 0, date: 1 } }).batchSize(1000);
+    for await (const { date } of dates) {
+      if (date) days.add(localDay(date));
+    }
+    const rollupDays = await db.collection(DAILY_SALES).distinct('date');
+    for (const day of rollupDays) days.add(day);
+
+    let rebuilt = 0;
+    let invoiceCount = 0;
+    const sortedDays = [...days].sort();
+    for (const [index, day] of sortedDays.entries()) {
+      const count = await inTransaction((session) => rebuildDay(db, day, session));
+      if (count > 0) rebuilt += 1;
+      invoiceCount += count;
+      if ((index + 1) % 100 === 0) await lock.renew();
+    }
+
+    return { days: rebuilt, invoices: invoiceCount };
+  } finally {
+    await lock.release();
+  }
+}
+
+// Databases that predate the rollups get them built once, at startup.
+export async function ensureDailySales(db, inTransaction) {
+  const [rollupDays, invoiceCount] = await Promise.all([
+    db.collection(DAILY_SALES).estimatedDocumentCount(),
+    db.collection('invoices').estimatedDocumentCount(),
+  ]);
+  if (rollupDays === 0 && invoiceCount > 0) {
+    await rebuildDailySales(db, inTransaction);
+  }
+}
@@ -0,0 +1,166 @@
+import { connectToDatabase } from '@/lib/db';
+
+// Barcode -> product map for the scanner at the billing counter. The whole
+// catalogue is loaded once, so a scan is a Map lookup with no database round
+// trip. The map is kept current three ways:
+// - the product and invoice routes on this instance apply their own writes;
+// - a change stream on products applies writes made by other instances;
+// - where change streams are unavailable, the map is reloaded every
+//   SCAN_INDEX_RELOAD_MS.
+// Stock sold is never subtracted locally: the stream or reload may already
+// have applied it, so sales re-read the stored stock instead.
+const RELOAD_MS = parseInt(process.env.SCAN_INDEX_RELOAD_MS || '60000', 10);
+
+const SCAN_PROJECTION = { searchKeys: 0 };
+
+let byBarcode = new Map();
+let barcodeById = new Map();
+let loaded = false;
+let loading = null;
+let changeStream = null;
+let reloadTimer = null;
+
+// Entries keep the ObjectId as a string so change-stream deletes can be matched.
+// Search keys are dropped whichever way the product arrived, so scans answer
+// the same shape as every other product read.
+function entry({ _id, searchKeys, ...product }) {
+  return _id ? { ...product, _oid: String(_id) } : product;
+}
+
+function put(product) {
+  const previous = barcodeById.get(product.id);
+  if (previous && previous !== product.barcode) byBarcode.delete(previous);
+  if (!product.barcode) return;
+  byBarcode.set(product.barcode, entry(product));
+  barcodeById.set(product.id, product.barcode);
+}
+
+function remove(id) {
+  const barcode = barcodeById.get(id);
+  if (barcode) byBarcode.delete(barcode);
+  barcodeById.delete(id);
+}
+
+async function load(db) {
+  const nextByBarcode = new Map();
+  const nextBarcodeById = new Map();
+  const cursor = db.collection('products').find({}, { projection: SCAN_PROJECTION });
+  for await (const product of cursor) {
+    if (!product.barcode) continue;
+    nextByBarcode.set(product.barcode, entry(product));
+    nextBarcodeById.set(product.id, product.barcode);
+  }
+  byBarcode = nextByBarcode;
+  barcodeById = nextBarcodeById;
+  loaded = true;
+}
+
+function startReloading(db) {
+  if (reloadTimer) return;
+  reloadTimer = setInterval(() => {
+    load(db).catch((error) => console.error('Scan index reload error:', error));
+  }, RELOAD_MS);
+  reloadTimer.unref?.();
+}
+
+function watchProducts(db) {
+  try {
+    changeStream = db.collection('products').watch([], { fullDocument: 'updateLookup' });
+  } catch (error) {
+    startReloading(db);
+    return;
+  }
+
+  changeStream.on('change', (change) => {
+    if (change.operationType === 'delete') {
+      // Delete events only carry the ObjectId
+      for (const product of byBarcode.values()) {
+        if (product._oid === String(change.documentKey._id)) {
+          remove(product.id);
+          break;
+        }
+      }
+      return;
+    }
+    if (change.fullDocument) {
+      put(change.fullDocument);
+    }
+  });
+
+  changeStream.on('error', (error) => {
+    console.error('Products change stream closed, reloading scan index periodically:', error.message);
+    changeStream.close().catch(() => {});
+    startReloading(db);
+  });
+}
+
+async function ensureLoaded() {
+  if (loaded) return;
+  if (!loading) {
+    loading = (async () => {
+      const { db } = await connectToDatabase();
+      await load(db);
+      watchProducts(db);
+    })().finally(() => {
+      loading = null;
+    });
+  }
+  await loading;
+}
+
+// Returns the product for a barcode, or null. A miss is checked against the
+// database once, in case a product created elsewhere has not arrived yet.
+export async function lookupBarcode(barcode) {
+  await ensureLoaded();
+  const hit = byBarcode.get(barcode);
+  if (hit) return publicProduct(hit);
+
+  const { db } = await connectToDatabase();
+  const product = await db.collection('products').findOne({ barcode }, { projection: SCAN_PROJECTION });
+  if (!product) return null;
+  put(product);
+  return publicProduct(byBarcode.get(barcode));
+}
+
+function publicProduct({ _oid, ...product }) {
+  return product;
+}
+
+// Loads the index ahead of the first scan.
+export function warmScanIndex() {
+  return ensureLoaded();
+}
+
+export function indexProduct(product) {
+  if (!loaded) return;
+  const existing = byBarcode.get(barcodeById.get(product.id));
+  put({ ...product, _oid: existing?._oid });
+}
+
+export function unindexProduct(id) {
+  if (!loaded) return;
+  remove(id);
+}
+
+// Brings stock up to date after committed sales (lines from
+// aggregateStockLines). A live change stream delivers the new values itself;
+// otherwise the stored stock is read back and set, so applying it twice is
+// harmless.
+export async function refreshStock(lines) {
+  if (!loaded || lines.length === 0) return;
+  if (changeStream && !reloadTimer) return;
+
+  const { db } = await connectToDatabase();
+  const cursor = db.collection('products').find(
+    { id: { $in: lines.map((line) => line.productId) } },
+    { projection: { id: 1, stock: 1 } }
+  );
+  for await (const { id, stock } of cursor) {
+    const product = byBarcode.get(barcodeById.get(id));
+    if (product) product.stock = stock;
+  }
+}
+
+export function getScanIndexStats() {
+  return { loaded, products: byBarcode.size, live: Boolean(changeStream) && !reloadTimer };
+}
@@ -0,0 +1,136 @@
+import { encodeCursor, decodeCursor } from '@/lib/pagination';
+
+// Longest prefix stored per word. Queries longer than this are truncated, which
+// only widens the match slightly.
+const MAX_PREFIX_LENGTH = 20;
+
+export function tokenize(text) {
+  return String(text || '')
+    .toLowerCase()
+    .split(/[^\p{L}\p{N}]+/u)
+    .filter(Boolean);
+}
+
+// False for queries with no searchable words (e.g. "--"), which should be
+// answered by the plain product list rather than a search.
+export function isSearchQuery(query) {
+  return tokenize(query).length > 0;
+}
+
+// Edge n-grams of every word in name, code and category. A multikey index on
+// this array turns "starts with" matches into index lookups instead of the
+// unanchored case-insensitive $regex scans we used to run.
+export function buildSearchKeys({ name, code, category }) {
+  const keys = new Set();
+  for (const token of tokenize(`${name || ''} ${code || ''} ${category || ''}`)) {
+    const word = token.substring(0, MAX_PREFIX_LENGTH);
+    for (let i = 1; i <= word.length; i++) {
+      keys.add(word.substring(0, i));
+    }
+  }
+  return [...keys];
+}
+
+// Rank of matches that are not a code or name prefix; most matches land here.
+const OTHER_RANK = 3;
+
+// Aggregation pipeline for GET /api/products?query=. Results are ordered by
+// relevance (exact code, code prefix, name prefix, anything else) and paged
+// with a keyset cursor over (rank, name, id). `filter` narrows the matches
+// further (category, stock range). Call only when isSearchQuery(query).
+//
+// The rank is computed, so it cannot come from an index: while paging through
+// the first three ranks every page ranks all matches. Once the cursor reaches
+// the last rank, everything still to come sorts after it by (name, id), so
+// earlier names are dropped in the first $match on the search_keys_name_id
+// index and later pages get cheaper rather than dearer.
+export function buildSearchPipeline(query, { limit, cursor, filter = {} }) {
+  const tokens = tokenize(query).map((token) => token.substring(0, MAX_PREFIX_LENGTH));
+  const upper = String(query).trim().toUpperCase();
+  const lower = String(query).trim().toLowerCase();
+  const after = decodeCursor(cursor);
+
+  const match = { searchKeys: { $all: tokens }, ...filter };
+  if (after && after.r === OTHER_RANK) {
+    match.$and = [
+      ...(match.$and || []),
+      { $or: [{ name: { $gt: after.n } }, { name: after.n, id: { $gt: after.i } }] },
+    ];
+  }
+
+  const pipeline = [
+    { $match: match },
+    {
+      $addFields: {
+        _rank: {
+          $switch: {
+            branches: [
+              { case: { $eq: ['$code', upper] }, then: 0 },
+              { case: { $eq: [{ $indexOfCP: ['$code', upper] }, 0] }, then: 1 },
+              { case: { $eq: [{ $indexOfCP: [{ $toLower: '$name' }, lower] }, 0] }, then: 2 },
+            ],
+            default: OTHER_RANK,
+          },
+        },
+      },
+    },
+  ];
+
+  if (after) {
+    pipeline.push({
+      $match: {
+        $or: [
+          { _rank: { $gt: after.r } },
+          { _rank: after.r, name: { $gt: after.n } },
+          { _rank: after.r, name: after.n, id: { $gt: after.i } },
+        ],
+      },
+    });
+  }
+
+  pipeline.push(
+    { $sort: { _rank: 1, name: 1, id: 1 } },
+    { $limit: limit + 1 },
+  );
+
+  return pipeline;
+}
+
+// Splits the limit+1 rows fetched by buildSearchPipeline into the page and the
+// cursor for the next one.
+export function paginateSearchResults(rows, limit) {
+  const page = rows.slice(0, limit);
+  let nextCursor = null;
+  if (rows.length > limit) {
+    const last = page[page.length - 1];
+    nextCursor = encodeCursor({ r: last._rank, n: last.name, i: last.id });
+  }
+  const items = page.map(({ _rank, searchKeys, ...product }) => product);
+  return { items, nextCursor };
+}
+
+// Products created before search keys existed are indexed on first connect.
+export async function backfillSearchKeys(db) {
+  const products = db.collection('products');
+  const cursor = products.find(
+    { searchKeys: { $exists: false } },
+    { projection: { id: 1, name: 1, code: 1, category: 1 } }
+  );
+
+  let ops = [];
+  for await (const product of cursor) {
+    ops.push({
+      updateOne: {
+        filter: { _id: product._id },
+        update: { $set: { searchKeys: buildSearchKeys(product) } },
+      },
+    });
+    if (ops.length === 500) {
+      await products.bulkWrite(ops, { ordered: false });
+      ops = [];
+    }
+  }
+  if (ops.length > 0) {
+    await products.bulkWrite(ops, { ordered: false });
+  }
+}
@@ -0,0 +1,76 @@
+import { connectToDatabase } from '@/lib/db';
+
+// Shop info is read by every PDF download and every checkout with a WhatsApp
+// number but changes a handful of times a year, so it is served from memory.
+// PUT /api/settings/shop invalidates this instance directly; other instances
+// hear about the change through a change stream. Where change streams are not
+// available (standalone mongod) entries expire after SETTINGS_CACHE_TTL_MS.
+const TTL_MS = parseInt(process.env.SETTINGS_CACHE_TTL_MS || '60000', 10);
+
+export const DEFAULT_SHOP_INFO = {
+  id: 'shop',
+  name: 'Jewelry Store',
+  phone: '',
+  address: '',
+  gst: '',
+};
+
+let cached = null;
+let loadedAt = 0;
+let loading = null;
+// Bumped on every invalidation so a load that started before a change does not
+// store what it read.
+let generation = 0;
+let changeStream = null;
+
+function watchSettings(db) {
+  if (changeStream) return;
+  try {
+    changeStream = db.collection('settings').watch();
+  } catch (error) {
+    return;
+  }
+  changeStream.on('change', () => invalidateShopInfo());
+  changeStream.on('error', (error) => {
+    console.error('Settings change stream closed, falling back to TTL:', error.message);
+    changeStream.close().catch(() => {});
+    // Leave the sentinel in place so a standalone server is not retried on every read
+    changeStream = { closed: true };
+    invalidateShopInfo();
+  });
+}
+
+function isWatching() {
+  return Boolean(changeStream) && !changeStream.closed;
+}
+
+async function loadShopInfo() {
+  const startedAt = generation;
+  const { db } = await connectToDatabase();
+  watchSettings(db);
+  const shopInfo = (await db.collection('settings').findOne({ id: 'shop' })) || DEFAULT_SHOP_INFO;
+  if (startedAt === generation) {
+    cached = shopInfo;
+    loadedAt = Date.now();
+  }
+  return shopInfo;
+}
+
+export async function getShopInfo() {
+  if (cached && (isWatching() || Date.now() - loadedAt < TTL_MS)) {
+    return cached;
+  }
+  if (!loading) {
+    const promise = loadShopInfo().finally(() => {
+      if (loading === promise) loading = null;
+    });
+    loading = promise;
+  }
+  return loading;
+}
+
+export function invalidateShopInfo() {
+  generation += 1;
+  cached = null;
+  loading = null;
+}
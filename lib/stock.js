@@ -0,0 +1,138 @@
+// Raised when one or more invoice lines ask for more stock than is on hand.
+// `shortages` is filled in by describeShortages once the write has been undone.
+export class StockConflictError extends Error {
+  constructor(shortages = []) {
+    super('Insufficient stock');
+    this.name = 'StockConflictError';
+    this.shortages = shortages;
+  }
+}
+
+// Collapses invoice lines into one requested quantity per product, so a bill
+// that lists the same ring twice is checked against stock once.
+export function aggregateStockLines(items = []) {
+  const lines = new Map();
+  for (const item of items) {
+    if (!item.productId) continue;
+    const qty = Number(item.qty) || 0;
+    if (qty <= 0) continue;
+    const line = lines.get(item.productId) || { productId: item.productId, name: item.name, qty: 0 };
+    line.qty += qty;
+    lines.set(item.productId, line);
+  }
+  return [...lines.values()];
+}
+
+function decrementOp(line) {
+  return {
+    updateOne: {
+      filter: { id: line.productId, stock: { $gte: line.qty } },
+      update: { $inc: { stock: -line.qty }, $set: { updatedAt: new Date().toISOString() } },
+    },
+  };
+}
+
+// Decrements stock for every line, guarded by stock >= qty. With a session the
+// whole batch goes out as one bulkWrite and a short count aborts the
+// transaction. Without one (standalone mongod) lines are applied one by one and
+// already-applied lines are put back if a later one fails.
+export async function decrementStock(products, lines, session) {
+  if (lines.length === 0) return;
+
+  if (session) {
+    const result = await products.bulkWrite(lines.map(decrementOp), { session, ordered: false });
+    if (result.matchedCount !== lines.length) {
+      throw new StockConflictError();
+    }
+    return;
+  }
+
+  const applied = [];
+  for (const line of lines) {
+    const { filter, update } = decrementOp(line).updateOne;
+    const result = await products.updateOne(filter, update);
+    if (result.matchedCount === 0) {
+      await restoreStock(products, applied);
+      throw new StockConflictError();
+    }
+    applied.push(line);
+  }
+}
+
+// Puts back stock taken by decrementStock. Only needed without a session; a
+// transaction undoes the decrement on abort.
+export async function restoreStock(products, lines) {
+  if (lines.length === 0) return;
+  await products.bulkWrite(
+    lines.map((line) => ({
+      updateOne: {
+        filter: { id: line.productId },
+        update: { $inc: { stock: line.qty }, $set: { updatedAt: new Date().toISOString() } },
+      },
+    })),
+    { ordered: false }
+  );
+}
+
+// Reads current stock for the requested lines and lists the ones that cannot be
+// filled. Called after the failed write has been rolled back.
+export async function describeShortages(products, lines) {
+  const current = await products
+    .find({ id: { $in: lines.map((line) => line.productId) } }, { projection: { id: 1, stock: 1 } })
+    .toArray();
+  const stockById = new Map(current.map((product) => [product.id, product.stock || 0]));
+
+  return lines
+    .filter((line) => (stockById.get(line.productId) ?? 0) < line.qty)
+    .map((line) => ({
+      productId: line.productId,
+      name: line.name,
+      requested: line.qty,
+      available: stockById.get(line.productId) ?? 0,
+    }));
+}
+
+export async function readStock(products, productIds, session) {
+  const current = await products
+    .find({ id: { $in: productIds } }, { projection: { id: 1, stock: 1 }, session: session || undefined })
+    .toArray();
+  return new Map(current.map((product) => [product.id, product.stock || 0]));
+}
+
+// Allocates stock to a batch of bills in order. A bill whose lines no longer
+// fit after the bills before it is refused with its shortages; the rest are
+// merged into one line per product for a single guarded decrement.
+export function planStockAllocation(stockById, bills) {
+  const remaining = new Map(stockById);
+  const accepted = [];
+  const rejected = [];
+
+  for (const bill of bills) {
+    const shortages = bill.lines
+      .filter((line) => (remaining.get(line.productId) ?? 0) < line.qty)
+      .map((line) => ({
+        productId: line.productId,
+        name: line.name,
+        requested: line.qty,
+        available: remaining.get(line.productId) ?? 0,
+      }));
+    if (shortages.length > 0) {
+      rejected.push({ bill, shortages });
+      continue;
+    }
+    for (const line of bill.lines) {
+      remaining.set(line.productId, remaining.get(line.productId) - line.qty);
+    }
+    accepted.push(bill);
+  }
+
+  const combined = new Map();
+  for (const bill of accepted) {
+    for (const line of bill.lines) {
+      const total = combined.get(line.productId) || { productId: line.productId, name: line.name, qty: 0 };
+      total.qty += line.qty;
+      combined.set(line.productId, total);
+    }
+  }
+  return { accepted, rejected, lines: [...combined.values()] };
+}
@@ -0,0 +1,64 @@
+import { decodeCursor, encodeCursor } from '@/lib/pagination';
+
+// Delta sync for the billing counter's offline product snapshot.
+//
+// Every product write stamps `updatedAt`; deletes leave a tombstone that
+// expires after SYNC_TOMBSTONE_TTL_DAYS. A sync token records when the previous
+// sync was served. The next sync returns everything changed since then, minus
+// SYNC_OVERLAP_MS, so a write whose stamp was taken just before a sync but
+// committed just after it is not missed. The client applies deltas as upserts,
+// so a change delivered twice is harmless.
+export const PRODUCT_TOMBSTONES = 'product_tombstones';
+
+const OVERLAP_MS = parseInt(process.env.SYNC_OVERLAP_MS || '60000', 10);
+export const TOMBSTONE_TTL_SECONDS = parseInt(process.env.SYNC_TOMBSTONE_TTL_DAYS || '30', 10) * 24 * 60 * 60;
+
+const SYNC_PROJECTION = { _id: 0, searchKeys: 0 };
+
+export function recordProductDeletion(db, id) {
+  return db.collection(PRODUCT_TOMBSTONES).insertOne({ id, deletedAt: new Date() });
+}
+
+// Returns { full, products, deleted, token }. Without a usable token, or when
+// the token is older than the tombstones reach back, the whole catalogue is
+// sent and the client replaces its snapshot.
+export async function buildProductDelta(db, sinceToken) {
+  const servedAt = Date.now();
+  const since = decodeCursor(sinceToken);
+  const token = encodeCursor({ t: servedAt });
+  const products = db.collection('products');
+
+  if (!since || typeof since.t !== 'number' || servedAt - since.t > TOMBSTONE_TTL_SECONDS * 1000) {
+    return {
+      full: true,
+      products: await products.find({}, { projection: SYNC_PROJECTION }).toArray(),
+      deleted: [],
+      token,
+    };
+  }
+
+  const from = new Date(since.t - OVERLAP_MS);
+  const [changed, tombstones] = await Promise.all([
+    products.find({ updatedAt: { $gte: from.toISOString() } }, { projection: SYNC_PROJECTION }).toArray(),
+    db.collection(PRODUCT_TOMBSTONES)
+      .find({ deletedAt: { $gte: from } }, { projection: { _id: 0, id: 1 } })
+      .toArray(),
+  ]);
+
+  // A product deleted and re-created under the same id is live again
+  const live = new Set(changed.map((product) => product.id));
+  return {
+    full: false,
+    products: changed,
+    deleted: tombstones.map((tombstone) => tombstone.id).filter((id) => !live.has(id)),
+    token,
+  };
+}
+
+// Products written before updatedAt existed get one, so deltas can see them.
+export async function backfillUpdatedAt(db) {
+  await db.collection('products').updateMany(
+    { updatedAt: { $exists: false } },
+    [{ $set: { updatedAt: { $ifNull: ['$createdAt', new Date().toISOString()] } } }]
+  );
+}
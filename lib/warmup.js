@@ -0,0 +1,58 @@
+import { connectToDatabase, withTransaction } from '@/lib/db';
+import { backfillCustomerStats } from '@/lib/customers';
+import { backfillStockLedger } from '@/lib/ledger';
+import { ensureDailySales } from '@/lib/rollups';
+import { getShopInfo } from '@/lib/settings';
+import { warmScanIndex } from '@/lib/scan-index';
+
+// One-off data migrations, awaited by instrumentation.js before the server
+// takes requests so they never race live checkouts. Each is a no-op once done
+// and safe against other instances starting at the same time. If MongoDB is
+// unreachable they are skipped until the next start.
+export async function runStartupMigrations() {
+  let db;
+  try {
+    ({ db } = await connectToDatabase());
+  } catch (error) {
+    console.error('Startup migrations skipped, database connection failed:', error.message);
+    return;
+  }
+
+  try {
+    await ensureDailySales(db, withTransaction);
+  } catch (error) {
+    console.error('Daily sales rebuild failed:', error);
+  }
+  try {
+    await backfillStockLedger(db, withTransaction);
+  } catch (error) {
+    console.error('Stock ledger backfill failed:', error);
+  }
+  try {
+    await backfillCustomerStats(db);
+  } catch (error) {
+    console.error('Customer stats backfill failed:', error);
+  }
+}
+
+// Startup warm-up, run from instrumentation.js when the server boots: connect
+// (which also creates indexes), then load the shop info and barcode index so
+// the first checkout does not pay for any of it. Failures are logged only;
+// requests connect on demand as before.
+export async function warmUp() {
+  const started = Date.now();
+  try {
+    await connectToDatabase();
+  } catch (error) {
+    console.error('Warm-up: database connection failed:', error.message);
+    return;
+  }
+
+  const results = await Promise.allSettled([getShopInfo(), warmScanIndex()]);
+  for (const result of results) {
+    if (result.status === 'rejected') {
+      console.error('Warm-up step failed:', result.reason);
+    }
+  }
+  console.log(`Warm-up finished in ${Date.now() - started}ms`);
+}
@@ -0,0 +1,116 @@
+import { LRUCache } from '@/lib/cache';
+import { REPORT_TIMEZONE } from '@/lib/reports';
+import { formatRupees, invoiceTotals, lineTotalPaise } from '@/lib/pricing.mjs';
+
+// WhatsApp bill messages. Everything that depends only on the shop settings
+// (greeting, address block, footer) is compiled and URL-encoded once per
+// settings version; a bill then only encodes its own lines. encodeURIComponent
+// works per code point, so encoding the pieces separately gives the same
+// result as encoding the whole message.
+
+const RULE = '━━━━━━━━━━━━━━━━━━━';
+
+const dateFormatter = new Intl.DateTimeFormat('en-IN', {
+  timeZone: REPORT_TIMEZONE,
+  day: '2-digit',
+  month: '2-digit',
+  year: 'numeric',
+});
+
+// Compiled templates by settings version; old versions age out.
+const templates = new LRUCache({ maxEntries: 4 });
+
+// Links of recently created or shared bills, so re-sharing needs no lookup.
+const recentLinks = new LRUCache({ maxEntries: 1000 });
+
+function compileTemplate(shopInfo) {
+  const name = shopInfo.name || 'Jewelry Store';
+  const phone = shopInfo.phone || '+91-9876543210';
+  const header = `🙏 Thank you for shopping with ${name}! 🙏
+
+🏪 ${name}
+📍 ${shopInfo.address || '123 Main Street'}
+📞 ${phone}
+
+${RULE}
+🧾 INVOICE DETAILS
+${RULE}
+`;
+  const footer = `
+${RULE}
+🌟 We appreciate your trust and loyalty!
+💬 For queries, contact us at ${phone}.`;
+
+  return { header: encodeURIComponent(header), footer: encodeURIComponent(footer) };
+}
+
+function templateFor(shopInfo) {
+  const key = String(shopInfo.version || 0);
+  let template = templates.get(key);
+  if (!template) {
+    template = compileTemplate(shopInfo);
+    templates.set(key, template);
+  }
+  return template;
+}
+
+// Digits only, with country code: 10-digit Indian mobiles get 91 prepended and
+// leading zeros (landlines) are dropped.
+export function normalizeWhatsappNumber(whatsapp) {
+  let phone = String(whatsapp || '').replace(/\D/g, '');
+  if (/^[6-9]\d{9}$/.test(phone)) phone = `91${phone}`;
+  return phone.replace(/^0+/, '');
+}
+
+function billBody(invoice) {
+  const totals = invoiceTotals(invoice);
+
+  const itemsList = (invoice.items || []).map((item, idx) =>
+    `${idx + 1}. 💍 *${item.name}* (${item.qty}) – ₹${formatRupees(lineTotalPaise(item.price, item.qty))}`
+  ).join('\n');
+
+  let text = `📄 Invoice No: ${String(invoice.id || '').substring(0, 8)}
+📅 Date: ${dateFormatter.format(new Date(invoice.date))}
+👤 Customer: ${invoice.customer?.name || 'Walk-in Customer'}
+${RULE}
+
+💎 ITEMS PURCHASED
+${itemsList}
+
+${RULE}
+💰 BILLING SUMMARY
+${RULE}
+💵 Subtotal: ₹${totals.subTotal.toFixed(2)}`;
+
+  if ((invoice.discountPercent || 0) > 0) {
+    text += `\n💸 *Discount (${invoice.discountPercent}%):* -₹${totals.discount.toFixed(2)}`;
+  }
+  if ((invoice.gstPercent || 0) > 0) {
+    text += `\n🧮 *GST (${invoice.gstPercent}%):* +₹${totals.gst.toFixed(2)}`;
+  }
+
+  text += `
+
+💳 Payment Mode: ${invoice.paymentMode || 'Cash'}
+💰 Grand Total: ₹${totals.grandTotal.toFixed(2)}
+`;
+  return text;
+}
+
+// Share link for a bill, or null when the customer gave no WhatsApp number.
+export function buildWhatsappLink(invoice, shopInfo) {
+  if (!invoice.customer?.whatsapp) return null;
+  const { header, footer } = templateFor(shopInfo);
+  const text = `${header}${encodeURIComponent(billBody(invoice))}${footer}`;
+  const link = `https://api.whatsapp.com/send?phone=${normalizeWhatsappNumber(invoice.customer.whatsapp)}&text=${text}`;
+  recentLinks.set(invoice.id, link);
+  return link;
+}
+
+export function getRecentWhatsappLink(invoiceId) {
+  return recentLinks.get(invoiceId);
+}
+
+export function rememberWhatsappLink(invoiceId, link) {
+  recentLinks.set(invoiceId, link);
+}
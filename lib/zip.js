@@ -0,0 +1,134 @@
+import zlib from 'zlib';
+
+// Minimal streaming ZIP writer. Entries are stored uncompressed (PDFs are
+// already compressed) and emitted one at a time, so only the central directory
+// (a few dozen bytes per entry) is held in memory. Archives of 4 GB and more
+// switch to ZIP64 offsets; an archive is still limited to 65,535 entries and
+// each entry to under 4 GB.
+export const MAX_ZIP_ENTRIES = 0xffff;
+
+// Largest value a 32-bit ZIP field holds; it also marks "see the ZIP64 record".
+const UINT32_MAX = 0xffffffff;
+
+let crcTable = null;
+
+function crc32(data) {
+  if (zlib.crc32) return zlib.crc32(data);
+  if (!crcTable) {
+    crcTable = new Uint32Array(256);
+    for (let n = 0; n < 256; n++) {
+      let c = n;
+      for (let k = 0; k < 8; k++) c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1;
+      crcTable[n] = c >>> 0;
+    }
+  }
+  let crc = 0xffffffff;
+  for (let i = 0; i < data.length; i++) crc = crcTable[(crc ^ data[i]) & 0xff] ^ (crc >>> 8);
+  return (crc ^ 0xffffffff) >>> 0;
+}
+
+function dosDateTime(date) {
+  const time = (date.getHours() << 11) | (date.getMinutes() << 5) | Math.floor(date.getSeconds() / 2);
+  const day = ((date.getFullYear() - 1980) << 9) | ((date.getMonth() + 1) << 5) | date.getDate();
+  return { time, day };
+}
+
+export class ZipWriter {
+  constructor() {
+    this.offset = 0;
+    this.directory = [];
+  }
+
+  // Returns the bytes for one entry (local header followed by the data).
+  addFile(name, data, modified = new Date()) {
+    if (this.directory.length >= MAX_ZIP_ENTRIES) {
+      throw new Error(`ZIP archives are limited to ${MAX_ZIP_ENTRIES} entries`);
+    }
+    if (data.length >= UINT32_MAX) {
+      throw new Error('ZIP entries are limited to 4 GB');
+    }
+
+    const fileName = Buffer.from(name, 'utf8');
+    const crc = crc32(data);
+    const { time, day } = dosDateTime(modified);
+
+    const header = Buffer.alloc(30);
+    header.writeUInt32LE(0x04034b50, 0);
+    header.writeUInt16LE(20, 4); // version needed
+    header.writeUInt16LE(0x0800, 6); // UTF-8 names
+    header.writeUInt16LE(0, 8); // stored
+    header.writeUInt16LE(time, 10);
+    header.writeUInt16LE(day, 12);
+    header.writeUInt32LE(crc, 14);
+    header.writeUInt32LE(data.length, 18);
+    header.writeUInt32LE(data.length, 22);
+    header.writeUInt16LE(fileName.length, 26);
+    header.writeUInt16LE(0, 28);
+
+    // Entries starting past 4 GB keep their offset in a ZIP64 extra field
+    const zip64 = this.offset >= UINT32_MAX;
+    let extra = Buffer.alloc(0);
+    if (zip64) {
+      extra = Buffer.alloc(12);
+      extra.writeUInt16LE(0x0001, 0);
+      extra.writeUInt16LE(8, 2);
+      extra.writeBigUInt64LE(BigInt(this.offset), 4);
+    }
+
+    const entry = Buffer.alloc(46);
+    entry.writeUInt32LE(0x02014b50, 0);
+    entry.writeUInt16LE(zip64 ? 45 : 20, 4); // version made by
+    entry.writeUInt16LE(zip64 ? 45 : 20, 6); // version needed
+    entry.writeUInt16LE(0x0800, 8);
+    entry.writeUInt16LE(0, 10);
+    entry.writeUInt16LE(time, 12);
+    entry.writeUInt16LE(day, 14);
+    entry.writeUInt32LE(crc, 16);
+    entry.writeUInt32LE(data.length, 20);
+    entry.writeUInt32LE(data.length, 24);
+    entry.writeUInt16LE(fileName.length, 28);
+    entry.writeUInt16LE(extra.length, 30);
+    entry.writeUInt32LE(zip64 ? UINT32_MAX : this.offset, 42);
+    this.directory.push(Buffer.concat([entry, fileName, extra]));
+
+    const bytes = Buffer.concat([header, fileName, data]);
+    this.offset += bytes.length;
+    return bytes;
+  }
+
+  // Returns the central directory and end-of-archive record, preceded by the
+  // ZIP64 end record and locator when the directory starts past 4 GB.
+  finish() {
+    const directory = Buffer.concat(this.directory);
+    const count = this.directory.length;
+    const zip64 = this.offset >= UINT32_MAX || directory.length >= UINT32_MAX;
+    const parts = [directory];
+
+    if (zip64) {
+      const record = Buffer.alloc(56);
+      record.writeUInt32LE(0x06064b50, 0);
+      record.writeBigUInt64LE(44n, 4); // size of the rest of the record
+      record.writeUInt16LE(45, 12); // version made by
+      record.writeUInt16LE(45, 14); // version needed
+      record.writeBigUInt64LE(BigInt(count), 24);
+      record.writeBigUInt64LE(BigInt(count), 32);
+      record.writeBigUInt64LE(BigInt(directory.length), 40);
+      record.writeBigUInt64LE(BigInt(this.offset), 48);
+
+      const locator = Buffer.alloc(20);
+      locator.writeUInt32LE(0x07064b50, 0);
+      locator.writeBigUInt64LE(BigInt(this.offset + directory.length), 8);
+      locator.writeUInt32LE(1, 16); // total disks
+      parts.push(record, locator);
+    }
+
+    const end = Buffer.alloc(22);
+    end.writeUInt32LE(0x06054b50, 0);
+    end.writeUInt16LE(count, 8);
+    end.writeUInt16LE(count, 10);
+    end.writeUInt32LE(zip64 ? UINT32_MAX : directory.length, 12);
+    end.writeUInt32LE(zip64 ? UINT32_MAX : this.offset, 16);
+    parts.push(end);
+    return Buffer.concat(parts);
+  }
+}
@@ -6,6 +6,8 @@ const nextConfig = {
   experimental: {
     // Remove if not using Server Components
     serverComponentsExternalPackages: ['mongodb', '@foliojs-fork/pdfkit'],
+    // Enables instrumentation.js, which warms up the database connection at startup
+    instrumentationHook: true,
   },
   webpack(config, { dev }) {
     if (dev) {
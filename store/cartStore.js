@@ -1,14 +1,20 @@
 import { create } from 'zustand';
+import { fromPaise, toPaise, totalsFromSubTotal } from '@/lib/pricing.mjs';
 
+// The subtotal is kept in paise and adjusted by each add, quantity change and
+// removal, so reading it never walks the cart.
 const useCartStore = create((set) => ({
   items: [],
+  subTotalPaise: 0,
   customer: { name: '', whatsapp: '' },
   discountPercent: 0,
 
   addItem: (product) => set((state) => {
     const existingItem = state.items.find(item => item.id === product.id);
     if (existingItem) {
+      // Another unit of a line already in the cart is billed at that line's price
       return {
+        subTotalPaise: state.subTotalPaise + toPaise(existingItem.sellPrice),
         items: state.items.map(item =>
           item.id === product.id
             ? { ...item, qty: item.qty + 1 }
@@ -17,35 +23,43 @@ const useCartStore = create((set) => ({
       };
     }
     return {
+      subTotalPaise: state.subTotalPaise + toPaise(product.sellPrice),
       items: [...state.items, { ...product, qty: 1 }]
     };
   }),
 
-  updateQuantity: (id, qty) => set((state) => ({
-    items: state.items.map(item =>
-      item.id === id ? { ...item, qty: Math.max(1, qty) } : item
-    )
-  })),
+  updateQuantity: (id, qty) => set((state) => {
+    const existingItem = state.items.find(item => item.id === id);
+    if (!existingItem) return {};
+    const newQty = Math.max(1, qty);
+    return {
+      subTotalPaise: state.subTotalPaise + toPaise(existingItem.sellPrice) * (newQty - existingItem.qty),
+      items: state.items.map(item =>
+        item.id === id ? { ...item, qty: newQty } : item
+      )
+    };
+  }),
 
-  removeItem: (id) => set((state) => ({
-    items: state.items.filter(item => item.id !== id)
-  })),
+  removeItem: (id) => set((state) => {
+    const existingItem = state.items.find(item => item.id === id);
+    if (!existingItem) return {};
+    return {
+      subTotalPaise: state.subTotalPaise - toPaise(existingItem.sellPrice) * existingItem.qty,
+      items: state.items.filter(item => item.id !== id)
+    };
+  }),
 
   setCustomer: (customer) => set({ customer }),
 
   setDiscount: (discount) => set({ discountPercent: Math.max(0, Math.min(100, discount)) }),
 
-  clearCart: () => set({ items: [], customer: { name: '', whatsapp: '' }, discountPercent: 0 }),
+  clearCart: () => set({ items: [], subTotalPaise: 0, customer: { name: '', whatsapp: '' }, discountPercent: 0 }),
 
-  getSubTotal: () => {
-    const state = useCartStore.getState();
-    return state.items.reduce((total, item) => total + (item.sellPrice * item.qty), 0);
-  },
+  getSubTotal: () => fromPaise(useCartStore.getState().subTotalPaise),
 
   getGrandTotal: () => {
     const state = useCartStore.getState();
-    const subTotal = state.getSubTotal();
-    return subTotal - (subTotal * state.discountPercent / 100);
+    return fromPaise(totalsFromSubTotal(state.subTotalPaise, state.discountPercent).grandTotal);
   },
 }));
 
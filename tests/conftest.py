@@ -0,0 +1,224 @@
+"""
+Fixtures for the isolated backend suite
+Every test creates the data it needs, so tests can run in any order and across
+pytest-xdist workers. Unless BASE_URL is set, each worker starts its own
+server from the production build on its own port with its own DB_NAME, so
+workers never see each other's products, settings or caches.
+
+    npm run build
+    pytest -n auto
+"""
+
+import os
+import shlex
+import shutil
+import subprocess
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+ROOT = Path(__file__).resolve().parent.parent
+SERVER_START_TIMEOUT = float(os.environ.get("TEST_SERVER_START_TIMEOUT", "60"))
+PORT_BASE = int(os.environ.get("TEST_SERVER_PORT_BASE", "3100"))
+DB_PREFIX = os.environ.get("TEST_DB_PREFIX", "jewelry_pos_test")
+
+
+class ApiClient:
+    """Thin wrapper over a pooled requests.Session bound to one API base URL"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=4))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=4))
+
+    def request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", 30)
+        return self.session.request(method, f"{self.base_url}{endpoint}", **kwargs)
+
+    def get(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("POST", endpoint, **kwargs)
+
+    def put(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("PUT", endpoint, **kwargs)
+
+    def delete(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", endpoint, **kwargs)
+
+
+def _worker_index(worker_id: str) -> int:
+    # xdist names workers gw0, gw1, ...; a plain run is "master"
+    return int(worker_id[2:]) if worker_id.startswith("gw") else 0
+
+
+def _server_command(port: int) -> Optional[List[str]]:
+    custom = os.environ.get("TEST_SERVER_COMMAND")
+    if custom:
+        return shlex.split(custom.format(port=port))
+    standalone = ROOT / ".next" / "standalone" / "server.js"
+    if standalone.exists():
+        return ["node", str(standalone)]
+    if (ROOT / ".next" / "BUILD_ID").exists() and shutil.which("npx"):
+        return ["npx", "next", "start", "-p", str(port)]
+    return None
+
+
+def _wait_until_ready(base_url: str, process: subprocess.Popen):
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Test server exited with code {process.returncode}")
+        try:
+            # Reading settings needs the database, so this also waits for MongoDB
+            if requests.get(f"{base_url}/settings/shop", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Test server not ready after {SERVER_START_TIMEOUT:.0f}s")
+
+
+def _drop_database(db_name: str):
+    try:
+        import pymongo
+    except ImportError:
+        return
+    client = pymongo.MongoClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    try:
+        client.drop_database(db_name)
+    finally:
+        client.close()
+
+
+@pytest.fixture(scope="session")
+def worker_id(request) -> str:
+    # Provided by pytest-xdist when installed; a plain run is "master"
+    return getattr(request.config, "workerinput", {}).get("workerid", "master")
+
+
+@pytest.fixture(scope="session")
+def api_base_url(worker_id, tmp_path_factory):
+    """Base URL of the server this worker talks to"""
+    if os.environ.get("BASE_URL"):
+        yield os.environ["BASE_URL"].rstrip("/")
+        return
+
+    port = PORT_BASE + _worker_index(worker_id)
+    command = _server_command(port)
+    if not command:
+        pytest.skip("No production build found; run `npm run build` or set BASE_URL")
+
+    db_name = f"{DB_PREFIX}_{worker_id}"
+    cache_dir = tmp_path_factory.mktemp("cache")
+    env = {
+        **os.environ,
+        "PORT": str(port),
+        "HOSTNAME": "127.0.0.1",
+        "DB_NAME": db_name,
+        "BARCODE_CACHE_DIR": str(cache_dir / "barcodes"),
+        "PDF_CACHE_DIR": str(cache_dir / "pdfs"),
+        # Several servers share the machine; one PDF worker each is plenty
+        "PDF_WORKERS": os.environ.get("PDF_WORKERS", "1"),
+    }
+    _drop_database(db_name)
+    log = open(cache_dir / "server.log", "wb")
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}/api"
+    try:
+        _wait_until_ready(base_url, process)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+        _drop_database(db_name)
+
+
+@pytest.fixture(scope="session")
+def api(api_base_url) -> ApiClient:
+    return ApiClient(api_base_url)
+
+
+@pytest.fixture
+def unique() -> str:
+    """Short random token for names and codes that must not collide"""
+    return uuid.uuid4().hex[:8].upper()
+
+
+@pytest.fixture
+def make_product(api, unique):
+    """Factory creating products that are deleted after the test"""
+    created = []
+
+    def make(**fields) -> Dict:
+        body = {
+            "name": f"Test Ring {unique} {len(created)}",
+            "category": "Rings",
+            "stock": 10,
+            "mrp": 45000,
+            "sellPrice": 42000,
+            **fields,
+        }
+        response = api.post("/products", json=body)
+        assert response.status_code == 201, response.text
+        product = response.json()
+        created.append(product["id"])
+        return product
+
+    yield make
+    for product_id in created:
+        api.delete(f"/products/{product_id}")
+
+
+@pytest.fixture
+def product(make_product) -> Dict:
+    return make_product()
+
+
+def build_invoice_body(products: List[Dict], qty: int = 1, **fields) -> Dict:
+    items = [{"productId": p["id"], "name": p["name"], "qty": qty, "price": p["sellPrice"]} for p in products]
+    sub_total = sum(item["qty"] * item["price"] for item in items)
+    return {
+        "customer": {"name": "Rajesh Kumar", "whatsapp": "+919876543210"},
+        "items": items,
+        "discountPercent": 0,
+        "gstPercent": 0,
+        "subTotal": sub_total,
+        "grandTotal": sub_total,
+        "paymentMode": "Cash",
+        **fields,
+    }
+
+
+@pytest.fixture
+def invoice_body():
+    """Builds a POST /api/invoices body selling qty of each product"""
+    return build_invoice_body
+
+
+@pytest.fixture
+def make_invoice(api):
+    """Factory creating invoices through POST /api/invoices; returns the response body"""
+
+    def make(products: List[Dict], qty: int = 1, **fields) -> Dict:
+        response = api.post("/invoices", json=build_invoice_body(products, qty, **fields))
+        assert response.status_code == 201, response.text
+        return response.json()
+
+    return make
+
+
+@pytest.fixture
+def invoice(make_invoice, product) -> Dict:
+    return make_invoice([product])["invoice"]
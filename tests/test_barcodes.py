@@ -0,0 +1,55 @@
+"""Barcode images, label sheets and scanner lookups"""
+
+
+def test_product_barcode_png(api, product):
+    """Test GET /api/products/:id/barcode"""
+    response = api.get(f"/products/{product['id']}/barcode")
+    assert response.status_code == 200
+    assert "image/png" in response.headers["Content-Type"]
+    assert len(response.content) > 100
+
+
+def test_barcode_by_text_revalidates(api, unique):
+    """Test GET /api/barcodes/:text - ETag revalidation answers 304"""
+    first = api.get(f"/barcodes/JWL{unique}")
+    assert first.status_code == 200 and first.headers.get("ETag")
+    second = api.get(f"/barcodes/JWL{unique}", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
+
+
+def test_barcode_by_text_rejects_bad_input(api):
+    """Test GET /api/barcodes/:text - oversize renders and unencodable text answer 400"""
+    assert api.get("/barcodes/JWL1", params={"scale": 50}).status_code == 400
+    assert api.get("/barcodes/NOTDIGITS", params={"format": "ean13"}).status_code == 400
+
+
+def test_label_sheet_pdf(api, make_product):
+    """Test POST /api/barcodes/sheet - many labels in one PDF"""
+    products = [make_product(), make_product()]
+    payload = {
+        "items": [{"productId": p["id"], "copies": 50} for p in products],
+        "layout": {"labelWidth": 100, "labelHeight": 15},
+    }
+    response = api.post("/barcodes/sheet", json=payload)
+    assert response.status_code == 200
+    assert response.content[:4] == b"%PDF"
+
+
+def test_label_sheet_rejects_bad_layout(api, product):
+    """Test POST /api/barcodes/sheet - layouts and copies out of range answer 400"""
+    item = {"productId": product["id"]}
+    for layout in ({"columns": 0}, {"rows": 1000}, {"labelWidth": -5}, {"labelHeight": "tall"}):
+        assert api.post("/barcodes/sheet", json={"items": [item], "layout": layout}).status_code == 400
+    assert api.post("/barcodes/sheet", json={"items": [{**item, "copies": 2.5}]}).status_code == 400
+
+
+def test_scan_reflects_latest_update(api, product):
+    """Test GET /api/scan/:barcode - the index follows product updates"""
+    api.put(f"/products/{product['id']}", json={**product, "stock": 7})
+    scanned = api.get(f"/scan/{product['barcode']}").json()
+    assert scanned["id"] == product["id"] and scanned["stock"] == 7
+
+
+def test_scan_unknown_barcode(api, unique):
+    """Test GET /api/scan/:barcode - 404 for unknown codes"""
+    assert api.get(f"/scan/NO-SUCH-{unique}").status_code == 404
@@ -0,0 +1,132 @@
+"""Invoices API: checkout, idempotency, batches, listing and WhatsApp links"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+
+def test_create_invoice_decrements_stock(api, make_product, make_invoice):
+    """Test POST /api/invoices - stock drops by the quantity sold"""
+    ring, chain = make_product(stock=5), make_product(stock=5)
+    body = make_invoice([ring, chain], qty=2)
+
+    assert body["invoice"]["id"]
+    assert "api.whatsapp.com/send?phone=" in body["whatsappLink"]
+    assert api.get(f"/products/{ring['id']}").json()["stock"] == 3
+    assert api.get(f"/products/{chain['id']}").json()["stock"] == 3
+
+
+def test_oversell_rejected_with_shortages(api, make_product, invoice_body):
+    """Test POST /api/invoices - more than is in stock answers 409 and changes nothing"""
+    product = make_product(stock=2)
+    response = api.post("/invoices", json=invoice_body([product], qty=3))
+
+    assert response.status_code == 409
+    assert response.json()["shortages"]
+    assert api.get(f"/products/{product['id']}").json()["stock"] == 2
+
+
+def test_idempotent_replay(api, product, invoice_body):
+    """Test POST /api/invoices - a repeated idempotency key returns the original invoice"""
+    body = invoice_body([product], idempotencyKey=str(uuid.uuid4()))
+    first = api.post("/invoices", json=body).json()
+    second = api.post("/invoices", json=body).json()
+
+    assert second["replayed"] and second["invoice"]["id"] == first["invoice"]["id"]
+    assert api.get(f"/products/{product['id']}").json()["stock"] == product["stock"] - 1
+
+
+def test_batch_reports_each_bill(api, product, invoice_body):
+    """Test POST /api/invoices/batch - created, duplicate within the batch, rejected; resend is a duplicate"""
+    ok_bill = invoice_body([product], idempotencyKey=str(uuid.uuid4()))
+    oversell = invoice_body([product], qty=product["stock"] + 100, idempotencyKey=str(uuid.uuid4()))
+
+    results = api.post("/invoices/batch", json={"invoices": [ok_bill, dict(ok_bill), oversell]}).json()["results"]
+    assert [r["status"] for r in results] == ["created", "duplicate", "rejected"]
+
+    resent = api.post("/invoices/batch", json={"invoices": [ok_bill]}).json()["results"]
+    assert resent[0]["status"] == "duplicate"
+
+
+def test_totals_priced_by_server(api, make_product, invoice_body):
+    """Test POST /api/invoices - totals come from the lines in paise, not from the client"""
+    product = make_product(sellPrice=333.33)
+    body = invoice_body([product], qty=3, discountPercent=7.5, gstPercent=3, subTotal=1, grandTotal=1)
+    invoice = api.post("/invoices", json=body).json()["invoice"]
+
+    # 999.99 - 75.00 discount + 27.75 GST
+    assert invoice["subTotal"] == 999.99
+    assert invoice["grandTotal"] == 952.74
+
+
+def test_unpriceable_invoice_rejected(api, product, invoice_body):
+    """Test POST /api/invoices - zero quantities and out-of-range percentages answer 400"""
+    assert api.post("/invoices", json=invoice_body([product], qty=0)).status_code == 400
+    assert api.post("/invoices", json=invoice_body([product], gstPercent=150)).status_code == 400
+    assert api.get(f"/products/{product['id']}").json()["stock"] == product["stock"]
+
+
+def test_client_sale_dates_are_bounded(api, make_product, invoice_body):
+    """Test sale dates - only batch replays keep a recent client date; old or online dates are replaced"""
+    product = make_product(stock=10)
+    now = datetime.now(timezone.utc)
+    yesterday = (now - timedelta(days=1)).isoformat()
+    years_ago = (now - timedelta(days=1000)).isoformat()
+
+    online = api.post("/invoices", json=invoice_body([product], idempotencyKey=str(uuid.uuid4()), date=yesterday)).json()
+    assert online["invoice"]["date"] > (now - timedelta(minutes=5)).isoformat()
+
+    recent = invoice_body([product], idempotencyKey=str(uuid.uuid4()), date=yesterday)
+    stale = invoice_body([product], idempotencyKey=str(uuid.uuid4()), date=years_ago)
+    results = api.post("/invoices/batch", json={"invoices": [recent, stale]}).json()["results"]
+    dates = [api.get(f"/invoices/{r['invoiceId']}").json()["date"] for r in results]
+    assert dates[0][:19] == yesterday[:19]
+    assert dates[1] > (now - timedelta(minutes=5)).isoformat()
+
+
+def test_get_single_invoice(api, invoice):
+    """Test GET /api/invoices/:id"""
+    response = api.get(f"/invoices/{invoice['id']}")
+    assert response.status_code == 200
+    assert response.json()["id"] == invoice["id"]
+
+
+def test_list_pages_without_line_items(api, invoice):
+    """Test GET /api/invoices?limit=1&paymentMode=Cash"""
+    page = api.get("/invoices", params={"limit": 1, "paymentMode": "Cash"}).json()
+    assert len(page) == 1
+    assert "items" not in page[0] and "itemCount" in page[0]
+
+
+def test_whatsapp_link_is_stored(api, invoice):
+    """Test GET /api/invoices/:id/whatsapp - same link as stored with the invoice"""
+    link = api.get(f"/invoices/{invoice['id']}/whatsapp").json()["whatsappLink"]
+    assert "api.whatsapp.com/send?phone=" in link
+    assert api.get(f"/invoices/{invoice['id']}").json()["whatsappLink"] == link
+
+
+def test_customer_profile_totals(api, product, make_invoice, unique):
+    """Test GET /api/customers/:whatsapp - visits, lifetime spend and recent invoices"""
+    whatsapp = f"+9198{int(unique, 16) % 10**8:08d}"
+    for _ in range(2):
+        make_invoice([product], customer={"name": "Priya", "whatsapp": whatsapp})
+
+    profile = api.get(f"/customers/{whatsapp}").json()
+    assert profile["visits"] == 2
+    assert profile["lifetimeSpend"] == 2 * product["sellPrice"]
+    assert len(profile["recentInvoices"]) == 2
+
+
+def test_export_zip_and_csv(api, invoice):
+    """Test GET /api/invoices/export?format=zip|csv"""
+    archive = api.get("/invoices/export", params={"format": "zip"}, timeout=60)
+    assert archive.status_code == 200 and archive.content.startswith(b"PK")
+
+    csv_export = api.get("/invoices/export", params={"format": "csv"}, timeout=60)
+    assert csv_export.status_code == 200
+    assert invoice["id"] in csv_export.text
+
+
+def test_export_pdf_of_empty_period_is_404(api):
+    """Test GET /api/invoices/export?format=pdf - a period with no invoices has no pages to send"""
+    response = api.get("/invoices/export", params={"format": "pdf", "from": "2001-01-01", "to": "2001-01-02"})
+    assert response.status_code == 404
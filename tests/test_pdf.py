@@ -0,0 +1,38 @@
+"""Invoice PDFs"""
+
+import pytest
+
+
+@pytest.mark.parametrize("template", ["pdf-a4", "pdf-thermal"])
+def test_invoice_pdf(api, invoice, template):
+    """Test GET /api/invoices/:id/pdf-a4 and /pdf-thermal"""
+    response = api.get(f"/invoices/{invoice['id']}/{template}")
+    assert response.status_code == 200
+    assert "application/pdf" in response.headers["Content-Type"]
+    assert response.content[:4] == b"%PDF"
+
+
+def test_pdf_revalidates_with_etag(api, invoice):
+    """Test GET /api/invoices/:id/pdf-a4 - a repeat download answers 304"""
+    first = api.get(f"/invoices/{invoice['id']}/pdf-a4")
+    assert first.headers.get("ETag")
+    second = api.get(f"/invoices/{invoice['id']}/pdf-a4", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
+
+
+def test_pdf_of_unknown_invoice_is_404_even_with_etag(api, invoice):
+    """Test GET /api/invoices/:id/pdf-a4 - a matching If-None-Match does not hide a missing invoice"""
+    etag = api.get(f"/invoices/{invoice['id']}/pdf-a4").headers["ETag"]
+    missing = "00000000-0000-0000-0000-000000000000"
+    response = api.get(f"/invoices/{missing}/pdf-a4", headers={"If-None-Match": etag.replace(invoice["id"], missing)})
+    assert response.status_code == 404
+
+
+def test_settings_change_invalidates_pdf(api, invoice, unique):
+    """Test PUT /api/settings/shop - cached PDFs are re-rendered with the new header"""
+    before = api.get(f"/invoices/{invoice['id']}/pdf-a4").headers["ETag"]
+    api.put("/settings/shop", json={"name": f"Golden Jewelry Store {unique}"})
+
+    after = api.get(f"/invoices/{invoice['id']}/pdf-a4", headers={"If-None-Match": before})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != before
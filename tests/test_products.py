@@ -0,0 +1,173 @@
+"""Products API: CRUD, search, filters, import/export and sync"""
+
+import json
+
+
+def test_create_product_generates_code_and_barcode(product):
+    """Test POST /api/products - id, code and barcode are generated"""
+    assert product["id"] and product["code"] and product["barcode"]
+
+
+def test_get_single_product(api, product):
+    """Test GET /api/products/:id"""
+    response = api.get(f"/products/{product['id']}")
+    assert response.status_code == 200
+    assert response.json()["id"] == product["id"]
+
+
+def test_list_includes_new_product(api, product):
+    """Test GET /api/products - the full catalogue"""
+    ids = [p["id"] for p in api.get("/products").json()]
+    assert product["id"] in ids
+
+
+def test_search_by_name(api, make_product, unique):
+    """Test GET /api/products?query= - every word must prefix a word of the product"""
+    created = make_product(name=f"Gold Ring {unique}")
+    results = api.get("/products", params={"query": f"gol {unique[:4]}"}).json()
+    assert [p["id"] for p in results] == [created["id"]]
+
+
+def test_search_exact_code_ranks_first(api, product):
+    """Test GET /api/products?query=<code>&limit=1"""
+    results = api.get("/products", params={"query": product["code"], "limit": 1}).json()
+    assert [p["code"] for p in results] == [product["code"]]
+
+
+def test_search_pages_with_cursor(api, make_product, unique):
+    """Test GET /api/products?query=&limit=&cursor= - search pages cover every match once"""
+    created = {make_product(name=f"Chain {unique} {n}")["id"] for n in range(3)}
+
+    seen, cursor = [], None
+    while True:
+        params = {"query": unique, "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = api.get("/products", params=params)
+        seen += [p["id"] for p in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(created)
+
+
+def test_search_without_words_lists_products(api):
+    """Test GET /api/products?query=-- - a query with no words is not a search"""
+    response = api.get("/products", params={"query": "--", "limit": 1})
+    assert response.status_code == 200
+
+
+def test_search_by_barcode(api, product):
+    """Test GET /api/products?barcode="""
+    results = api.get("/products", params={"barcode": product["barcode"]}).json()
+    assert [p["id"] for p in results] == [product["id"]]
+
+
+def test_update_product(api, product):
+    """Test PUT /api/products/:id"""
+    response = api.put(f"/products/{product['id']}", json={**product, "name": f"{product['name']} Updated", "stock": 8})
+    assert response.status_code == 200
+    assert response.json()["stock"] == 8
+    assert api.get(f"/products/{product['id']}").json()["name"].endswith("Updated")
+
+
+def test_update_without_stock_keeps_stock_and_ledger(api, product):
+    """Test PUT /api/products/:id - an edit that leaves stock out does not touch it"""
+    movements = api.get(f"/products/{product['id']}/movements").json()
+    edit = {k: v for k, v in product.items() if k != "stock"}
+    response = api.put(f"/products/{product['id']}", json={**edit, "name": f"{product['name']} Renamed"})
+    assert response.status_code == 200
+    assert response.json()["stock"] == product["stock"]
+    assert api.get(f"/products/{product['id']}/movements").json() == movements
+
+
+def test_update_rejects_bad_stock(api, product):
+    """Test PUT /api/products/:id - stock must be a whole number of 0 or more"""
+    for stock in (-1, 2.5, "7", None):
+        assert api.put(f"/products/{product['id']}", json={**product, "stock": stock}).status_code == 400
+
+
+def test_delete_product(api, make_product):
+    """Test DELETE /api/products/:id"""
+    product = make_product()
+    assert api.delete(f"/products/{product['id']}").status_code == 200
+    assert api.get(f"/products/{product['id']}").status_code == 404
+
+
+def test_filters_by_category_and_stock(api, make_product, unique):
+    """Test GET /api/products?category=&minStock=&maxStock=&sort=stock"""
+    category = f"Cat{unique}"
+    low = make_product(category=category, stock=2)
+    empty = make_product(category=category, stock=0)
+    make_product(category=category, stock=50)
+
+    results = api.get("/products", params={"category": category, "maxStock": 9, "sort": "stock"}).json()
+    assert [p["id"] for p in results] == [empty["id"], low["id"]]
+
+
+def test_list_pages_with_cursor(api, make_product, unique):
+    """Test GET /api/products?limit=&cursor= - X-Next-Cursor walks every page once"""
+    category = f"Page{unique}"
+    created = {make_product(category=category)["id"] for _ in range(3)}
+
+    seen, cursor = [], None
+    while True:
+        params = {"category": category, "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = api.get("/products", params=params)
+        seen += [p["id"] for p in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(created)
+
+
+def test_unknown_sort_is_rejected(api):
+    """Test GET /api/products?sort= - unknown orders answer 400"""
+    assert api.get("/products", params={"sort": "nope"}).status_code == 400
+
+
+def test_summary_counts_low_and_out_of_stock(api, make_product, unique):
+    """Test GET /api/products/summary"""
+    before = api.get("/products/summary").json()
+    make_product(category=f"Sum{unique}", stock=0)
+    after = api.get("/products/summary").json()
+
+    assert after["total"] == before["total"] + 1
+    assert after["outOfStock"] == before["outOfStock"] + 1
+    assert after["lowStock"] == before["lowStock"] + 1
+    assert {"category": f"Sum{unique}", "count": 1} in after["categories"]
+
+
+def test_import_reports_bad_rows_and_export_round_trips(api, unique):
+    """Test POST /api/products/import and GET /api/products/export"""
+    csv_body = (
+        "name,category,stock,mrp,sellPrice,code\n"
+        f"Import Ring,Rings,3,1500,1200,IMP-{unique}-1\n"
+        "Import Chain,Chains,-2,900,800,\n"
+        f"\"Import Bangle, Gold\",Bangles,1,5000,4500,IMP-{unique}-2\n"
+    )
+    response = api.post("/products/import?format=csv", data=csv_body.encode(), headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+    done = events[-1]
+    assert done["type"] == "done" and done["inserted"] == 2 and done["failed"] == 1
+    assert [e["row"] for e in events if e["type"] == "error"] == [2]
+
+    export = api.get("/products/export", params={"format": "csv"})
+    assert export.text.startswith("code,barcode,name")
+    assert f"IMP-{unique}-2" in export.text
+
+    for code in (f"IMP-{unique}-1", f"IMP-{unique}-2"):
+        for imported in api.get("/products", params={"barcode": code}).json():
+            api.delete(f"/products/{imported['id']}")
+
+
+def test_sync_delta_reports_deletions(api, make_product):
+    """Test GET /api/products/sync - a delete after the snapshot comes back as a tombstone"""
+    snapshot = api.get("/products/sync").json()
+    assert snapshot["full"] and snapshot["token"]
+
+    product = make_product()
+    api.delete(f"/products/{product['id']}")
+
+    delta = api.get("/products/sync", params={"since": snapshot["token"]}).json()
+    assert not delta["full"]
+    assert product["id"] in delta["deleted"]
@@ -0,0 +1,33 @@
+"""Sales and stock reports"""
+
+
+def test_sales_series_adds_up(api, invoice):
+    """Test GET /api/reports/sales?groupBy=paymentMode - series counts add up to the total"""
+    report = api.get("/reports/sales", params={"groupBy": "paymentMode", "recent": 5}).json()
+    assert report["totals"]["invoices"] >= 1
+    assert sum(point["count"] for point in report["series"]) == report["totals"]["invoices"]
+
+
+def test_stock_ledger_matches_counter(api, make_product, make_invoice):
+    """Test GET /api/products/:id/movements and /api/reports/stock* - restock, sale and balance"""
+    product = make_product(stock=10)
+    api.put(f"/products/{product['id']}", json={**product, "stock": 15})
+    make_invoice([product], qty=2)
+
+    movements = api.get(f"/products/{product['id']}/movements").json()
+    assert [(m["type"], m["qty"]) for m in movements] == [("sale", -2), ("restock", 5), ("restock", 10)]
+
+    on_date = api.get("/reports/stock", params={"productId": product["id"]}).json()
+    assert [row["stock"] for row in on_date["products"]] == [13]
+
+    report = api.get("/reports/stock-movements", params={"productId": product["id"]}).json()
+    assert report["products"] == [{
+        "productId": product["id"], "code": product["code"], "name": product["name"], "category": product["category"],
+        "opening": 0, "sale": -2, "restock": 15, "adjustment": 0, "closing": 13,
+    }]
+
+
+def test_stock_report_rejects_bad_dates(api):
+    """Test GET /api/reports/stock-movements - bad and reversed ranges are rejected"""
+    assert api.get("/reports/stock", params={"date": "not-a-date"}).status_code == 400
+    assert api.get("/reports/stock-movements", params={"from": "2024-02-10", "to": "2024-02-01"}).status_code == 400
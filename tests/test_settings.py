@@ -0,0 +1,24 @@
+"""Settings API"""
+
+
+def test_get_shop_settings(api):
+    """Test GET /api/settings/shop - returns defaults when nothing is saved"""
+    response = api.get("/settings/shop")
+    assert response.status_code == 200
+    assert response.json().get("name")
+
+
+def test_update_shop_settings_persists(api, unique):
+    """Test PUT /api/settings/shop - saved values are read back"""
+    settings = {
+        "name": f"Golden Jewelry Store {unique}",
+        "phone": "+91-9876543210",
+        "address": "123 Main Street, Mumbai, Maharashtra 400001",
+        "gst": "27AABCU9603R1ZM",
+    }
+    response = api.put("/settings/shop", json=settings)
+    assert response.status_code == 200
+
+    saved = api.get("/settings/shop").json()
+    assert saved["name"] == settings["name"]
+    assert saved["gst"] == settings["gst"]
@@ -0,0 +1,19 @@
+"""Runtime statistics and metrics"""
+
+
+def test_system_stats(api):
+    """Test GET /api/system/stats - PDF pool, scan index and MongoDB pool"""
+    stats = api.get("/system/stats").json()
+    assert "pdfPool" in stats and "scanIndex" in stats
+    assert stats["mongoPool"]["connected"] and stats["mongoPool"]["open"] >= 1
+
+
+def test_metrics_and_server_timing(api):
+    """Test GET /api/metrics - Prometheus histograms; responses carry Server-Timing"""
+    listing = api.get("/products/summary")
+    assert "total;dur=" in listing.headers.get("Server-Timing", "")
+
+    metrics = api.get("/metrics")
+    assert metrics.headers["Content-Type"].startswith("text/plain")
+    assert 'route="/products/summary"' in metrics.text
+    assert "pos_mongo_command_duration_seconds" in metrics.text